@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Async read path benchmark
+Serves the same database with the threaded server (`python src/main.py`'s
+werkzeug server) and with `uvicorn src.asgi:app`, then holds an increasing
+number of concurrent keep-alive connections open against each, every one
+issuing a read-heavy mix of event detail, listing, trending and message
+requests back to back. Reports tail latency, throughput and failed requests
+(connection errors, timeouts, 5xx) at each connection count.
+
+Usage:
+    python benchmarks/async_reads.py --users 100000
+    python benchmarks/async_reads.py --users 5000 --connections 50 500 --modes async
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from common import BACKEND_DIR, environment_info, print_summary, summarize_latencies, write_results
+from endpoints import SCENARIOS, ensure_dataset
+
+# Scenario from endpoints.SCENARIOS -> share of requests
+REQUEST_MIX = {
+    'event_detail': 0.45,
+    'messages': 0.2,
+    'events_viewer_trending': 0.15,
+    'events_category': 0.1,
+    'events_search': 0.1,
+}
+BACKLOG = 2048
+
+
+def serve_threaded(port):
+    """The threaded werkzeug server `python src/main.py` runs, with the same listen backlog as uvicorn
+
+    Werkzeug closes every connection after its response, so clients reconnect for each request.
+    """
+    from werkzeug.serving import ThreadedWSGIServer, make_server
+    from src.main import app
+
+    ThreadedWSGIServer.request_queue_size = BACKLOG
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    make_server('127.0.0.1', port, app, threaded=True).serve_forever()
+
+
+def server_command(mode, port):
+    if mode == 'threaded':
+        return [sys.executable, os.path.abspath(__file__), '--serve-threaded', '--port', str(port)]
+    return [sys.executable, '-m', 'uvicorn', 'src.asgi:app', '--host', '127.0.0.1', '--port', str(port),
+            '--log-level', 'warning', '--backlog', str(BACKLOG), '--no-access-log']
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_serving(port, process, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server exited with status {process.returncode}')
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/events/categories', timeout=5).read()
+            return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError('Server did not start in time')
+
+
+async def fetch(reader, writer, path):
+    """One HTTP/1.1 GET on an open connection; returns (status, whether the connection can be reused)"""
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: benchmark\r\nAccept-Encoding: gzip\r\n\r\n'.encode('latin-1'))
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError('Connection closed before a response')
+    version, status = status_line.split(b' ', 2)[:2]
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip().lower()
+
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.read()
+        return int(status), False
+    reusable = version == b'HTTP/1.1' and headers.get('connection') != 'close'
+    return int(status), reusable
+
+
+async def run_load(port, connections, users, events, duration, warmup, timeout, seed, think=0):
+    scenarios = list(REQUEST_MIX)
+    weights = [REQUEST_MIX[name] for name in scenarios]
+    measuring_from = time.perf_counter() + warmup
+    stop_at = measuring_from + duration
+    latencies = {name: [] for name in scenarios}
+    errors = {'connect': 0, 'timeout': 0, 'server': 0, 'reset': 0}
+
+    async def client(index):
+        rng = random.Random(f'{seed}-{index}')
+        connection = None
+        reused = False
+        while time.perf_counter() < stop_at:
+            scenario = rng.choices(scenarios, weights)[0]
+            path = SCENARIOS[scenario](rng, users, events)
+            start = time.perf_counter()
+            measured = start >= measuring_from
+            try:
+                if connection is None:
+                    try:
+                        connection = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+                    except (OSError, asyncio.TimeoutError):
+                        if measured:
+                            errors['connect'] += 1
+                        await asyncio.sleep(0.1)
+                        continue
+                    reused = False
+                try:
+                    status, reusable = await asyncio.wait_for(fetch(*connection, path), timeout)
+                except ConnectionError:
+                    if not reused:
+                        raise
+                    # The server dropped an idle keep-alive connection; like a browser, retry once on a new one
+                    connection[1].close()
+                    connection = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+                    reused = False
+                    status, reusable = await asyncio.wait_for(fetch(*connection, path), timeout)
+                if measured:
+                    latencies[scenario].append(time.perf_counter() - start)
+                    if status >= 500:
+                        errors['server'] += 1
+                reused = reusable
+                if not reusable:
+                    connection[1].close()
+                    connection = None
+                if think:
+                    # Like a user reading the page before the next request; a keep-alive connection stays open
+                    await asyncio.sleep(rng.uniform(0.5, 1.5) * think)
+            except asyncio.TimeoutError:
+                if measured:
+                    errors['timeout'] += 1
+                connection[1].close()
+                connection = None
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                if measured:
+                    errors['reset'] += 1
+                if connection is not None:
+                    connection[1].close()
+                connection = None
+        if connection is not None:
+            connection[1].close()
+
+    # Ramp connections up over the warmup rather than opening them all in the same instant
+    tasks = []
+    for index in range(connections):
+        tasks.append(asyncio.create_task(client(index)))
+        await asyncio.sleep(warmup / 2 / connections)
+    await asyncio.gather(*tasks)
+    return latencies, errors
+
+
+def server_resources(pid):
+    """(threads, resident MB) of a process, from /proc where available"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            status = dict(line.split(':', 1) for line in f if ':' in line)
+    except OSError:
+        return None, None
+    return int(status['Threads']), round(int(status['VmRSS'].split()[0]) / 1024, 1)
+
+
+async def sample_resources(pid, samples, interval=0.5):
+    while True:
+        samples.append(server_resources(pid))
+        await asyncio.sleep(interval)
+
+
+async def run_measured(pid, *load_args):
+    samples = []
+    sampler = asyncio.create_task(sample_resources(pid, samples))
+    try:
+        latencies, errors = await run_load(*load_args)
+    finally:
+        sampler.cancel()
+    return latencies, errors, [sample for sample in samples if sample[0] is not None]
+
+
+def measure(server, port, connections, args, num_events):
+    latencies, errors, samples = asyncio.run(run_measured(
+        server.pid, port, connections, args.users, num_events, args.duration, args.warmup_seconds, args.timeout,
+        args.seed, args.think_ms / 1000
+    ))
+    every = [latency for values in latencies.values() for latency in values]
+    results = summarize_latencies(every, args.duration) if every else {'requests': 0}
+    results['scenarios'] = {name: summarize_latencies(values, args.duration)
+                            for name, values in latencies.items() if values}
+    results['errors'] = sum(errors.values())
+    results['error_breakdown'] = errors
+    results['error_rate'] = round(results['errors'] / max(1, results['errors'] + results['requests']), 4)
+    if samples:
+        results['server_threads'] = max(threads for threads, rss in samples)
+        results['server_rss_mb'] = max(rss for threads, rss in samples)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare the threaded server with the async read path under many connections')
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--events-per-user', type=float, default=0.2)
+    parser.add_argument('--connections', type=int, nargs='*', default=[10, 100, 500, 1000],
+                        help='Concurrent keep-alive connections to measure at')
+    parser.add_argument('--modes', nargs='*', choices=['threaded', 'async'], default=['threaded', 'async'])
+    parser.add_argument('--duration', type=float, default=15, help='Seconds measured at each connection count')
+    parser.add_argument('--warmup-seconds', type=float, default=3)
+    parser.add_argument('--think-ms', type=float, default=0,
+                        help='Average pause between a connection\'s requests; 0 sends them back to back')
+    parser.add_argument('--timeout', type=float, default=10, help='Seconds before a request counts as failed')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/async_reads-<revision>.json)')
+    parser.add_argument('--serve-threaded', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve_threaded:
+        serve_threaded(args.port)
+        return
+
+    dataset = ensure_dataset(args.users, args.seed, args.events_per_user)
+    num_events = max(1, int(args.users * args.events_per_user))
+    results = {
+        'environment': environment_info(),
+        'parameters': {key: value for key, value in vars(args).items() if key not in ('serve_threaded', 'port')},
+        'results': {},
+    }
+    scratch = tempfile.mkdtemp(prefix='eventa-async-')
+    try:
+        for mode in args.modes:
+            # Views and impressions are logged, so each mode starts from a fresh copy
+            database = os.path.join(scratch, 'app.db')
+            shutil.copyfile(dataset, database)
+            env = dict(os.environ, EVENTA_DATABASE_URI=f'sqlite:///{database}', EVENTA_RATE_LIMIT='0',
+                       EVENTA_JOBS_MODE='inline', EVENTA_JOBS_DATABASE=os.path.join(scratch, 'jobs.db'),
+                       EVENTA_ARCHIVE_DATABASE=os.path.join(scratch, 'archive.db'))
+            port = free_port()
+            print(f'Starting {mode} server...')
+            server = subprocess.Popen(server_command(mode, port), cwd=BACKEND_DIR, env=env)
+            try:
+                wait_until_serving(port, server)
+                group = results['results'].setdefault(mode, {})
+                for connections in args.connections:
+                    print(f'  {connections} connections...')
+                    group[f'{connections}_connections'] = measure(server, port, connections, args, num_events)
+            finally:
+                server.terminate()
+                server.wait()
+            for name in os.listdir(scratch):
+                os.remove(os.path.join(scratch, name))
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    output_path = write_results(results, args.output, name='async_reads')
+    print_summary(results, metrics=('p50_ms', 'p99_ms', 'max_ms', 'throughput_rps', 'errors'))
+    print(f"\nResults written to {output_path}")
+
+
+if __name__ == '__main__':
+    main()
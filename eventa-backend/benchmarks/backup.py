@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Online backup benchmark
+Keeps a mixed read/RSVP workload running against the API while a snapshot is
+taken with each backup setting, and reports how long the snapshot took and
+the request latency percentiles while it ran, next to the same workload
+with no backup running
+
+Usage:
+    python benchmarks/backup.py --users 100000
+    python benchmarks/backup.py --users 100000 --concurrency 4 --modes no_backup backup_throttled
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from common import environment_info, print_summary, summarize_latencies, write_results
+from endpoints import ensure_dataset
+
+# Mode name -> backup settings, or None for the workload alone
+MODES = {
+    'no_backup': None,
+    'backup_unthrottled': {'BACKUP_METHOD': 'backup', 'BACKUP_PAGES_PER_STEP': -1, 'BACKUP_STEP_SLEEP': 0,
+                           'BACKUP_NICENESS': 0},
+    'backup_throttled': {'BACKUP_METHOD': 'backup', 'BACKUP_PAGES_PER_STEP': 256, 'BACKUP_STEP_SLEEP': 0.01,
+                         'BACKUP_NICENESS': 0},
+    'backup_throttled_niced': {'BACKUP_METHOD': 'backup', 'BACKUP_PAGES_PER_STEP': 256, 'BACKUP_STEP_SLEEP': 0.01,
+                               'BACKUP_NICENESS': 10},
+    'vacuum_into_niced': {'BACKUP_METHOD': 'vacuum', 'BACKUP_NICENESS': 10},
+}
+
+
+def next_request(rng, users, events):
+    roll = rng.random()
+    if roll < 0.2:
+        return 'POST', f'/api/events/{rng.randint(1, events)}/rsvp', {
+            'user_id': rng.randint(1, users), 'status': rng.choice(['going', 'interested'])
+        }
+    if roll < 0.6:
+        return 'GET', f'/api/events/{rng.randint(1, events)}', None
+    if roll < 0.8:
+        return 'GET', f'/api/friends/{rng.randint(1, users)}', None
+    return 'GET', f"/api/events?category={rng.choice(['Music', 'Tech', 'Food', 'Sports'])}", None
+
+
+def run_worker(args):
+    """Run the workload, with a snapshot taken partway through unless the mode has none"""
+    from src.main import app
+    from src.models.event import Event
+    from src.models.user import db
+    from src.services.backup import run_backup
+
+    settings = MODES[args.mode]
+    if settings:
+        app.config.update(settings)
+    with app.app_context():
+        num_events = db.session.query(db.func.max(Event.id)).scalar()
+
+    measuring = threading.Event()
+    stop = threading.Event()
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker(seed):
+        rng = random.Random(seed)
+        client = app.test_client()
+        local = []
+        local_errors = 0
+        while not stop.is_set():
+            method, path, body = next_request(rng, args.users, num_events)
+            start = time.perf_counter()
+            response = client.open(path, method=method, json=body)
+            response.get_data()
+            response.close()
+            if measuring.is_set():
+                local.append(time.perf_counter() - start)
+                if response.status_code >= 400 and response.status_code != 404:
+                    local_errors += 1
+        with lock:
+            latencies.extend(local)
+            errors.append(local_errors)
+
+    threads = [threading.Thread(target=worker, args=(f'{args.seed}-{i}',)) for i in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.warmup_seconds)
+
+    measuring.set()
+    start = time.perf_counter()
+    manifest = None
+    if settings:
+        with app.app_context():
+            manifest = run_backup()
+    else:
+        time.sleep(args.baseline_seconds)
+    wall_time = time.perf_counter() - start
+    measuring.clear()
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    results = summarize_latencies(latencies, wall_time)
+    results['errors'] = sum(errors)
+    if manifest:
+        results['backup_seconds'] = manifest['total_seconds']
+        results['copy_seconds'] = manifest['copy_seconds']
+        results['snapshot_mb'] = round(manifest['size_bytes'] / 1024 / 1024, 1)
+    with open(args.worker_output, 'w') as f:
+        json.dump(results, f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure request latency while the database is snapshotted')
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--events-per-user', type=float, default=0.2)
+    parser.add_argument('--concurrency', type=int, default=4, help='Client threads running the workload')
+    parser.add_argument('--warmup-seconds', type=float, default=2)
+    parser.add_argument('--baseline-seconds', type=float, default=10, help='How long no_backup measures for')
+    parser.add_argument('--modes', nargs='*', choices=list(MODES), help='Only run these modes')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/backup-<revision>.json)')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--mode', help=argparse.SUPPRESS)
+    parser.add_argument('--worker-output', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    dataset = ensure_dataset(args.users, args.seed, args.events_per_user)
+    # Fold any WAL left by earlier benchmark runs into the file copied below
+    conn = sqlite3.connect(dataset)
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    conn.close()
+    results = {
+        'environment': environment_info(),
+        'parameters': {key: value for key, value in vars(args).items() if key not in ('worker', 'mode', 'worker_output')},
+        'results': {'backup': {}},
+    }
+    scratch = tempfile.mkdtemp(prefix='eventa-backup-')
+    try:
+        for mode in args.modes or MODES:
+            # The workload writes RSVPs, so every mode starts from a fresh copy
+            directory = os.path.join(scratch, mode)
+            os.makedirs(directory)
+            database = os.path.join(directory, 'app.db')
+            shutil.copyfile(dataset, database)
+            worker_output = os.path.join(directory, 'results.json')
+            print(f'Running {mode}...')
+            env = dict(os.environ, EVENTA_DATABASE_URI=f'sqlite:///{database}', EVENTA_RATE_LIMIT='0',
+                       EVENTA_JOBS_MODE='inline', EVENTA_JOBS_DATABASE=os.path.join(directory, 'jobs.db'),
+                       EVENTA_BACKUP_DIR=os.path.join(directory, 'backups'))
+            command = [
+                sys.executable, os.path.abspath(__file__), '--worker',
+                '--mode', mode,
+                '--users', str(args.users),
+                '--concurrency', str(args.concurrency),
+                '--warmup-seconds', str(args.warmup_seconds),
+                '--baseline-seconds', str(args.baseline_seconds),
+                '--seed', str(args.seed),
+                '--worker-output', worker_output,
+            ]
+            subprocess.run(command, env=env, check=True)
+            with open(worker_output) as f:
+                results['results']['backup'][mode] = json.load(f)
+            shutil.rmtree(directory)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    output_path = write_results(results, args.output, name='backup')
+    print_summary(results, metrics=('p50_ms', 'p99_ms', 'throughput_rps', 'backup_seconds'))
+    print(f"\nResults written to {output_path}")
+
+
+if __name__ == '__main__':
+    main()
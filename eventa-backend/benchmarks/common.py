@@ -0,0 +1,97 @@
+"""
+Shared helpers for the Eventa benchmark scripts
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARKS_DIR)
+DATA_DIR = os.path.join(BENCHMARKS_DIR, 'data')
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, 'results')
+
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize_latencies(latencies, wall_time):
+    """Latency percentiles in milliseconds plus throughput for one scenario"""
+    ordered = sorted(latencies)
+    return {
+        'requests': len(ordered),
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3),
+        'throughput_rps': round(len(ordered) / wall_time, 2) if wall_time > 0 else None,
+    }
+
+
+def git_revision():
+    try:
+        revision = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, text=True).strip()
+        dirty = subprocess.call(['git', 'diff', '--quiet', 'HEAD'], cwd=BACKEND_DIR) != 0
+        return f'{revision}-dirty' if dirty else revision
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def environment_info():
+    return {
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': datetime.utcnow().isoformat(),
+    }
+
+
+def write_results(results, output_path=None, name='results'):
+    """Write benchmark results as JSON, defaulting to results/<name>-<revision>.json"""
+    if output_path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output_path = os.path.join(RESULTS_DIR, f"{name}-{results['environment']['git_revision']}.json")
+    with open(output_path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    return output_path
+
+
+def compare_results(baseline, current, metrics=('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps')):
+    """Print per-scenario metric deltas between two result files with the same layout"""
+    print(f"Comparing {baseline['environment']['git_revision']} -> {current['environment']['git_revision']}")
+    for group, scenarios in current['results'].items():
+        base_scenarios = baseline['results'].get(group, {})
+        print(f"\n[{group}]")
+        print(f"{'scenario':<28}" + ''.join(f'{metric:>26}' for metric in metrics))
+        for scenario, stats in scenarios.items():
+            base = base_scenarios.get(scenario)
+            cells = []
+            for metric in metrics:
+                value = stats.get(metric)
+                if base is None or base.get(metric) in (None, 0) or value is None:
+                    cells.append(f'{value!s:>26}')
+                else:
+                    change = (value - base[metric]) / base[metric] * 100
+                    cells.append(f'{base[metric]:>9} -> {value:<9} {change:+5.1f}%')
+            print(f'{scenario:<28}' + ''.join(cells))
+
+
+def print_summary(results, metrics=('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps')):
+    for group, scenarios in results['results'].items():
+        print(f"\n[{group}]")
+        print(f"{'scenario':<28}" + ''.join(f'{metric:>20}' for metric in metrics))
+        for scenario, stats in scenarios.items():
+            print(f'{scenario:<28}' + ''.join(f'{stats.get(metric)!s:>20}' for metric in metrics))
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Digest generation benchmark
+Generates every user's weekly digest for a synthetic dataset with one worker
+process and with a process pool, and reports run time, per-range time and
+throughput (digests are written to a temporary outbox)
+
+Usage:
+    python benchmarks/digests.py --users 1000000 --as-of 2025-07-01
+    python benchmarks/digests.py --users 100000 --workers 1,2,4 --chunk-size 10000
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from datetime import date
+
+from common import environment_info, write_results
+from endpoints import ensure_dataset
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark bulk digest generation')
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--events-per-user', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--as-of', type=date.fromisoformat, default=date(2025, 7, 1),
+                        help='Period end date; the synthetic events span 2025')
+    parser.add_argument('--frequency', choices=['weekly', 'daily'], default='weekly')
+    parser.add_argument('--workers', default=f'1,{os.cpu_count() or 1}', help='Comma-separated pool sizes to run')
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/digests-<revision>.json)')
+    args = parser.parse_args(argv)
+
+    from src.services.digests import generate_digests
+
+    database = ensure_dataset(args.users, args.seed, args.events_per_user)
+    results = {
+        'environment': environment_info(),
+        'parameters': {
+            'users': args.users,
+            'events_per_user': args.events_per_user,
+            'seed': args.seed,
+            'as_of': args.as_of.isoformat(),
+            'frequency': args.frequency,
+            'chunk_size': args.chunk_size,
+        },
+        'results': {},
+    }
+
+    for workers in sorted({int(count) for count in args.workers.split(',') if count}):
+        outbox = tempfile.mkdtemp(prefix='eventa-outbox-')
+        try:
+            print(f"Generating digests for {args.users} users with {workers} worker(s)...")
+            stats = generate_digests(f'sqlite:///{database}', outbox, as_of=args.as_of, frequency=args.frequency,
+                                     workers=workers, chunk_size=args.chunk_size)
+            stats['outbox_bytes'] = sum(os.path.getsize(os.path.join(stats['outbox'], name))
+                                        for name in os.listdir(stats['outbox']))
+        finally:
+            shutil.rmtree(outbox)
+        del stats['outbox']
+        stats['users_per_second'] = round(stats['users'] / stats['elapsed_seconds'], 1)
+        results['results'][f'workers={workers}'] = stats
+        print(f"  {stats['digests']} digests in {stats['elapsed_seconds']}s "
+              f"({stats['users_per_second']} users/s, slowest range {stats['slowest_range_seconds']}s)",
+              file=sys.stderr)
+
+    output_path = write_results(results, args.output, name='digests')
+    print(f"\nResults written to {output_path}")
+
+
+if __name__ == '__main__':
+    main()
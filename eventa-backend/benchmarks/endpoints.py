@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Endpoint benchmark suite for the Eventa API
+Generates synthetic datasets at several sizes and measures latency percentiles
+and throughput per endpoint through the Flask test client
+
+Usage:
+    python benchmarks/endpoints.py --sizes 1000,10000,100000
+    python benchmarks/endpoints.py --sizes 1000 --compare benchmarks/results/endpoints-abc123.json
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from common import (DATA_DIR, compare_results, environment_info, print_summary,
+                    summarize_latencies, write_results)
+
+# Scenario name -> function(rng, num_users, num_events) returning a request path
+SCENARIOS = {
+    'events_list': lambda rng, users, events: '/api/events',
+    'events_search': lambda rng, users, events: f"/api/events?search={rng.choice(['jazz', 'sydney', 'workshop', 'market'])}",
+    'events_category': lambda rng, users, events: f"/api/events?category={rng.choice(['Music', 'Tech', 'Food', 'Sports'])}",
+    'events_price_range': lambda rng, users, events: f"/api/events?min_price={rng.choice([0, 10, 20])}&max_price={rng.choice([25, 50])}&sort=price",
+    'events_facets': lambda rng, users, events: f"/api/events?facets=1&category={rng.choice(['Music', 'Tech', 'Food', 'Sports'])}",
+    'events_viewer_list': lambda rng, users, events: f'/api/events?viewer_id={rng.randint(1, users)}',
+    'events_viewer_search': lambda rng, users, events: f"/api/events?viewer_id={rng.randint(1, users)}&search={rng.choice(['jazz', 'sydney', 'workshop', 'market'])}",
+    'events_trending': lambda rng, users, events: '/api/events/trending',
+    'events_viewer_trending': lambda rng, users, events: f'/api/events/trending?viewer_id={rng.randint(1, users)}',
+    'suggest': lambda rng, users, events: f"/api/suggest?q={rng.choice(['j', 'ja', 'jaz', 's', 'sy', 'syd', 'wor', 'mar'])}",
+    'event_detail': lambda rng, users, events: f'/api/events/{rng.randint(1, events)}',
+    'event_rsvps': lambda rng, users, events: f'/api/events/{rng.randint(1, min(events, 50))}/rsvps',
+    'friends': lambda rng, users, events: f'/api/friends/{rng.randint(1, users)}',
+    'friend_requests': lambda rng, users, events: f'/api/friends/requests/{rng.randint(1, users)}',
+    'messages': lambda rng, users, events: f'/api/messages/{rng.randint(1, users)}',
+    'bookmarks': lambda rng, users, events: f'/api/bookmarks/{rng.randint(1, users)}',
+    'profile': lambda rng, users, events: f'/api/profile/{rng.randint(1, users)}',
+    'calendar_going': lambda rng, users, events: f'/api/calendar/{rng.randint(1, min(users, 50))}/going.ics',
+    'calendar_bookmarks': lambda rng, users, events: f'/api/calendar/{rng.randint(1, min(users, 50))}/bookmarks.ics',
+    'profile_viewer': lambda rng, users, events: f'/api/profile/{rng.randint(1, users)}?viewer_id={rng.randint(1, users)}',
+}
+
+
+def dataset_path(users, seed):
+    return os.path.join(DATA_DIR, f'eventa-u{users}-s{seed}.db')
+
+
+def ensure_dataset(users, seed, events_per_user):
+    """Generate (or reuse a cached) synthetic database for the given size"""
+    from src.generate_data import SyntheticDataGenerator, create_bulk_engine
+
+    path = dataset_path(users, seed)
+    if os.path.exists(path):
+        return path
+    os.makedirs(DATA_DIR, exist_ok=True)
+    print(f"Generating dataset with {users} users...")
+    partial = path + '.partial'
+    if os.path.exists(partial):
+        os.remove(partial)
+    engine = create_bulk_engine(partial)
+    SyntheticDataGenerator(users=users, events_per_user=events_per_user, seed=seed).generate(engine)
+    with engine.connect() as conn:
+        conn.exec_driver_sql('PRAGMA wal_checkpoint(TRUNCATE)')
+    engine.dispose()
+    os.replace(partial, path)
+    return path
+
+
+def run_worker(args):
+    """Benchmark every scenario against the app configured through EVENTA_DATABASE_URI"""
+    from src.main import app
+
+    num_events = max(1, int(args.users * args.events_per_user))
+    scenarios = [name for name in SCENARIOS if not args.scenarios or name in args.scenarios]
+    results = {}
+    for name in scenarios:
+        make_path = SCENARIOS[name]
+        rng = random.Random(f'{args.seed}-{name}')
+        paths = [make_path(rng, args.users, num_events) for _ in range(args.requests + args.warmup)]
+
+        client = app.test_client()
+        for path in paths[:args.warmup]:
+            client.get(path).close()
+
+        measured = paths[args.warmup:]
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+
+        def worker(worker_paths):
+            worker_client = app.test_client()
+            local = []
+            local_errors = 0
+            for path in worker_paths:
+                start = time.perf_counter()
+                response = worker_client.get(path)
+                # Streamed listings only finish (and release their request context) once read and closed
+                response.get_data()
+                response.close()
+                local.append(time.perf_counter() - start)
+                # Hidden profiles (403) and missing rows (404) are expected answers, not failures
+                if response.status_code >= 400 and response.status_code not in (403, 404):
+                    local_errors += 1
+            with lock:
+                latencies.extend(local)
+                errors.append(local_errors)
+
+        threads = [threading.Thread(target=worker, args=(measured[i::args.concurrency],)) for i in range(args.concurrency)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall_time = time.perf_counter() - start
+
+        results[name] = summarize_latencies(latencies, wall_time)
+        results[name]['errors'] = sum(errors)
+        print(f"  {name:<20} p50={results[name]['p50_ms']}ms p99={results[name]['p99_ms']}ms "
+              f"{results[name]['throughput_rps']} req/s", file=sys.stderr)
+
+    with open(args.worker_output, 'w') as f:
+        json.dump(results, f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark Eventa API endpoints at several data sizes')
+    parser.add_argument('--sizes', default='1000,10000', help='Comma-separated user counts to benchmark')
+    parser.add_argument('--events-per-user', type=float, default=0.2)
+    parser.add_argument('--requests', type=int, default=200, help='Measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=1, help='Client threads per scenario')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--scenarios', nargs='*', help='Only run these scenarios')
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/endpoints-<revision>.json)')
+    parser.add_argument('--compare', help='Previous result file to compare against')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--users', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--worker-output', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    results = {
+        'environment': environment_info(),
+        'parameters': {
+            'sizes': sizes,
+            'events_per_user': args.events_per_user,
+            'requests': args.requests,
+            'warmup': args.warmup,
+            'concurrency': args.concurrency,
+            'seed': args.seed,
+        },
+        'results': {},
+    }
+
+    for users in sizes:
+        database = ensure_dataset(users, args.seed, args.events_per_user)
+        print(f"Benchmarking {users} users ({database})...")
+        # Each size runs in a fresh interpreter so the app binds to that size's database
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as handle:
+            worker_output = handle.name
+        command = [
+            sys.executable, os.path.abspath(__file__), '--worker',
+            '--users', str(users),
+            '--events-per-user', str(args.events_per_user),
+            '--requests', str(args.requests),
+            '--warmup', str(args.warmup),
+            '--concurrency', str(args.concurrency),
+            '--seed', str(args.seed),
+            '--worker-output', worker_output,
+        ]
+        if args.scenarios:
+            command += ['--scenarios', *args.scenarios]
+        env = dict(os.environ, EVENTA_DATABASE_URI=f'sqlite:///{database}', EVENTA_RATE_LIMIT='0')
+        subprocess.run(command, env=env, check=True)
+        with open(worker_output) as f:
+            results['results'][f'users={users}'] = json.load(f)
+        os.remove(worker_output)
+
+    output_path = write_results(results, args.output, name='endpoints')
+    print_summary(results)
+    print(f"\nResults written to {output_path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare_results(json.load(f), results)
+
+
+if __name__ == '__main__':
+    main()
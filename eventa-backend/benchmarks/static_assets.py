@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Static asset serving benchmark
+Compares the original os.path.exists + send_from_directory catch-all against the
+indexed, precompressed static layer on a synthetic Vite-style build
+
+Usage:
+    python benchmarks/static_assets.py --requests 2000
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import string
+import tempfile
+import time
+
+from common import environment_info, print_summary, summarize_latencies, write_results, compare_results
+
+from flask import Flask, send_from_directory
+
+from src.middleware.static_files import init_static
+
+SCENARIOS = {
+    'index_html': '/',
+    'js_bundle': '/assets/index-Bx7f3k9Q.js',
+    'css_bundle': '/assets/index-D4e8Lm2P.css',
+    'logo_png': '/assets/eventa-logo-C9q2Wk1R.png',
+    'spa_route': '/events/42',
+}
+
+
+def build_fake_dist(root, seed):
+    """Write an index.html plus JS/CSS/PNG bundles shaped like a Vite production build"""
+    rng = random.Random(seed)
+    os.makedirs(os.path.join(root, 'assets'), exist_ok=True)
+    identifiers = [''.join(rng.choices(string.ascii_letters, k=rng.randint(3, 12))) for _ in range(2000)]
+    js = ''.join(f'function {rng.choice(identifiers)}(a,b){{return a.{rng.choice(identifiers)}(b)||"{rng.choice(identifiers)}"}}\n'
+                 for _ in range(12000))
+    css = ''.join(f'.{rng.choice(identifiers)}{{margin:{rng.randint(0, 32)}px;color:#{rng.randrange(16 ** 6):06x}}}\n'
+                  for _ in range(6000))
+    with open(os.path.join(root, 'assets', 'index-Bx7f3k9Q.js'), 'w') as f:
+        f.write(js)
+    with open(os.path.join(root, 'assets', 'index-D4e8Lm2P.css'), 'w') as f:
+        f.write(css)
+    with open(os.path.join(root, 'assets', 'eventa-logo-C9q2Wk1R.png'), 'wb') as f:
+        f.write(rng.randbytes(48 * 1024))
+    with open(os.path.join(root, 'index.html'), 'w') as f:
+        f.write('<!doctype html><html><head><script type="module" src="/assets/index-Bx7f3k9Q.js"></script>'
+                '<link rel="stylesheet" href="/assets/index-D4e8Lm2P.css"></head><body><div id="root"></div></body></html>')
+
+
+def legacy_app(static_folder):
+    """The catch-all route as it was before the static index was introduced"""
+    app = Flask(__name__, static_folder=static_folder)
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        static_folder_path = app.static_folder
+        if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
+            return send_from_directory(static_folder_path, path)
+        index_path = os.path.join(static_folder_path, 'index.html')
+        if os.path.exists(index_path):
+            return send_from_directory(static_folder_path, 'index.html')
+        return "index.html not found", 404
+
+    return app
+
+
+def indexed_app(static_folder):
+    app = Flask(__name__, static_folder=static_folder)
+    init_static(app)
+    return app
+
+
+def run_scenarios(app, requests, warmup, headers):
+    client = app.test_client()
+    results = {}
+    for name, path in SCENARIOS.items():
+        for _ in range(warmup):
+            client.get(path, headers=headers).close()
+        latencies = []
+        transferred = 0
+        start = time.perf_counter()
+        for _ in range(requests):
+            request_start = time.perf_counter()
+            response = client.get(path, headers=headers)
+            transferred += len(response.get_data())
+            response.close()
+            latencies.append(time.perf_counter() - request_start)
+        results[name] = summarize_latencies(latencies, time.perf_counter() - start)
+        results[name]['bytes_per_response'] = transferred // requests
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark static asset serving')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--accept-encoding', default='gzip, deflate, br')
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/static-<revision>.json)')
+    parser.add_argument('--compare', help='Previous result file to compare against')
+    args = parser.parse_args(argv)
+
+    root = tempfile.mkdtemp(prefix='eventa-static-')
+    try:
+        build_fake_dist(root, args.seed)
+        headers = {'Accept-Encoding': args.accept_encoding}
+        results = {
+            'environment': environment_info(),
+            'parameters': vars(args),
+            'results': {
+                'legacy': run_scenarios(legacy_app(root), args.requests, args.warmup, headers),
+                'indexed': run_scenarios(indexed_app(root), args.requests, args.warmup, headers),
+            },
+        }
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    output_path = write_results(results, args.output, name='static')
+    print_summary(results, metrics=('p50_ms', 'p99_ms', 'throughput_rps', 'bytes_per_response'))
+    print('\nSpeedup (throughput indexed / legacy):')
+    for name in SCENARIOS:
+        legacy = results['results']['legacy'][name]['throughput_rps']
+        indexed = results['results']['indexed'][name]['throughput_rps']
+        print(f'  {name:<14} {indexed / legacy:5.2f}x')
+    print(f"\nResults written to {output_path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare_results(json.load(f), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Write-behind buffer benchmark
+Drives concurrent read receipts and RSVPs through the API with the buffer
+disabled (every write in its own transaction) and enabled, and compares
+write throughput; time spent draining the buffer at the end is included
+
+Usage:
+    python benchmarks/write_buffer.py --users 10000 --requests 2000 --concurrency 8
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from common import compare_results, environment_info, print_summary, summarize_latencies, write_results
+from endpoints import ensure_dataset
+
+# Mode name -> EVENTA_WRITE_BUFFER_INTERVAL
+MODES = {
+    'write_through': '0',
+    'buffered': '0.5',
+}
+
+
+def build_operations(rng, count, users, events, messages):
+    operations = []
+    for _ in range(count):
+        if rng.random() < 0.6:
+            operations.append(('PUT', f'/api/messages/{rng.randint(1, messages)}/read', None))
+        else:
+            operations.append(('POST', f'/api/events/{rng.randint(1, events)}/rsvp',
+                               {'user_id': rng.randint(1, users), 'status': rng.choice(['going', 'interested'])}))
+    return operations
+
+
+def run_worker(args):
+    """Replay the write workload against the app configured through the environment"""
+    from src.main import app
+    from src.models.event import Event
+    from src.models.social import Message
+    from src.models.user import db
+
+    with app.app_context():
+        num_events = db.session.query(db.func.max(Event.id)).scalar()
+        num_messages = db.session.query(db.func.max(Message.id)).scalar()
+
+    rng = random.Random(args.seed)
+    operations = build_operations(rng, args.requests, args.users, num_events, num_messages)
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker(worker_operations):
+        client = app.test_client()
+        local = []
+        local_errors = 0
+        for method, path, body in worker_operations:
+            start = time.perf_counter()
+            response = client.open(path, method=method, json=body)
+            local.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                local_errors += 1
+        with lock:
+            latencies.extend(local)
+            errors.append(local_errors)
+
+    threads = [threading.Thread(target=worker, args=(operations[i::args.concurrency],)) for i in range(args.concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    app.extensions['write_buffer'].flush()
+    wall_time = time.perf_counter() - start
+
+    results = summarize_latencies(latencies, wall_time)
+    results['errors'] = sum(errors)
+    with open(args.worker_output, 'w') as f:
+        json.dump(results, f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark buffered against write-through small writes')
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--events-per-user', type=float, default=0.2)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/write_buffer-<revision>.json)')
+    parser.add_argument('--compare', help='Previous result file to compare against')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--worker-output', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    dataset = ensure_dataset(args.users, args.seed, args.events_per_user)
+    results = {
+        'environment': environment_info(),
+        'parameters': {key: value for key, value in vars(args).items() if key not in ('worker', 'worker_output')},
+        'results': {'writes': {}},
+    }
+    scratch = tempfile.mkdtemp(prefix='eventa-writes-')
+    try:
+        for mode, interval in MODES.items():
+            # Writes mutate the database, so every mode starts from a fresh copy
+            database = os.path.join(scratch, f'{mode}.db')
+            shutil.copyfile(dataset, database)
+            worker_output = os.path.join(scratch, f'{mode}.json')
+            print(f'Running {mode}...')
+            env = dict(os.environ, EVENTA_DATABASE_URI=f'sqlite:///{database}', EVENTA_RATE_LIMIT='0',
+                       EVENTA_JOBS_MODE='inline', EVENTA_JOBS_DATABASE=os.path.join(scratch, f'{mode}-jobs.db'),
+                       EVENTA_WRITE_BUFFER_INTERVAL=interval)
+            command = [
+                sys.executable, os.path.abspath(__file__), '--worker',
+                '--users', str(args.users),
+                '--requests', str(args.requests),
+                '--concurrency', str(args.concurrency),
+                '--seed', str(args.seed),
+                '--worker-output', worker_output,
+            ]
+            subprocess.run(command, env=env, check=True)
+            with open(worker_output) as f:
+                results['results']['writes'][mode] = json.load(f)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    output_path = write_results(results, args.output, name='write_buffer')
+    print_summary(results, metrics=('p50_ms', 'p99_ms', 'throughput_rps', 'errors'))
+    writes = results['results']['writes']
+    print(f"\nThroughput buffered / write-through: "
+          f"{writes['buffered']['throughput_rps'] / writes['write_through']['throughput_rps']:.2f}x")
+    print(f"\nResults written to {output_path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare_results(json.load(f), results)
+
+
+if __name__ == '__main__':
+    main()
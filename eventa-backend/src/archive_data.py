@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Move past events and old messages into the archive database
+The web app schedules this as a background job; run it by hand (or from cron)
+when jobs run inline or to archive with different cut-offs
+
+Usage:
+    python src/archive_data.py
+    python src/archive_data.py --event-days 90 --message-days 730
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Archive past events and old messages')
+    parser.add_argument('--event-days', type=int, help='Archive events dated more than this many days ago')
+    parser.add_argument('--message-days', type=int, help='Archive messages older than this many days')
+    args = parser.parse_args(argv)
+
+    # Run the archival here rather than queueing another scheduled run
+    os.environ['EVENTA_JOBS_MODE'] = 'inline'
+    from src.main import app
+    from src.services.archive import archive_history
+
+    if args.event_days is not None:
+        app.config['ARCHIVE_EVENT_DAYS'] = args.event_days
+    if args.message_days is not None:
+        app.config['ARCHIVE_MESSAGE_DAYS'] = args.message_days
+
+    start = time.perf_counter()
+    with app.app_context():
+        counts = archive_history()
+    print(f"Archived into {app.config['ARCHIVE_DATABASE']} in {time.perf_counter() - start:.1f}s: {counts}")
+
+
+if __name__ == '__main__':
+    main()
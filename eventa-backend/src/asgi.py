@@ -0,0 +1,337 @@
+"""
+ASGI entry point: async reads for the hot listing endpoints, the Flask app for the rest
+
+    uvicorn src.asgi:app --host 0.0.0.0 --port 5000
+
+GET /api/events, /api/events/<id>, /api/events/trending and
+/api/messages/<user_id> are answered on the event loop. They read through an
+aiosqlite pool of ASYNC_DB_POOL_SIZE connections, so an open connection
+waiting on the database or on a slow client holds no thread. Every other
+request, including all writes and any read asking for include_past or facets
+(which need the archive database), runs the unchanged Flask app on a pool of
+ASYNC_WSGI_THREADS threads.
+
+The async views run inside a Flask request context, held across awaits for
+the life of the request. Rate limiting, CORS, compression negotiation and
+request profiling come from the same before/after_request hooks as on the
+threaded server, and the views share their queries with the Flask views.
+Responses are the same byte for byte.
+
+Needs aiosqlite and an ASGI server such as uvicorn. Without aiosqlite, or
+with a database other than SQLite, every request goes to the Flask app.
+`python src/main.py` still runs the threaded server.
+"""
+
+import asyncio
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import aiosqlite
+except ImportError:  # optional
+    aiosqlite = None
+
+from flask import Response, abort, current_app, jsonify, request
+from flask_cors import cross_origin
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from src.main import app as flask_app
+from src.middleware.compression import DEFAULT_LEVELS, CompressedStream, JSONArrayWriter
+from src.routes.events import event_detail_response, trending_query, visible_event_query
+from src.routes.social import messages_query
+from src.services.archive import include_past_requested
+from src.services.facets import facets_requested
+from src.services.listing import EventListing
+from src.services.recurrence import generated_occurrences, stored_occurrences_query
+from src.services.visibility import viewer_id_from_request
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_WSGI_THREADS = 16
+
+with_cors_headers = cross_origin()
+
+
+def async_database_uri(uri):
+    """The aiosqlite form of a sqlite:/// URI, or None when the async path can't serve it"""
+    url = make_url(uri)
+    if aiosqlite is None or url.get_backend_name() != 'sqlite' or not url.database or url.database == ':memory:':
+        return None
+    return url.set(drivername='sqlite+aiosqlite')
+
+
+def wsgi_environ(scope, body=b''):
+    """A WSGI environ for an ASGI HTTP scope"""
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    server = scope.get('server') or ('localhost', 80)
+    environ['SERVER_NAME'], environ['SERVER_PORT'] = server[0], str(server[1] or 80)
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else f'HTTP_{name}'
+        if key in environ:
+            value = environ[key] + ('; ' if key == 'HTTP_COOKIE' else ',') + value
+        environ[key] = value
+    return environ
+
+
+class AsyncStream:
+    """A view result whose body is produced by an async iterator of str chunks"""
+
+    def __init__(self, chunks, mimetype='application/json'):
+        self.chunks = chunks
+        self.mimetype = mimetype
+
+
+async def read_ahead(chunks, min_size):
+    """read_ahead from the compression middleware for an async iterator of str chunks"""
+    head = []
+    size = 0
+    async for chunk in chunks:
+        head.append(chunk.encode('utf-8'))
+        size += len(head[-1])
+        if size >= min_size:
+            return b''.join(head), chunks
+    return b''.join(head), None
+
+
+async def merge_occurrences(rows, occurrences, key, descending):
+    """heapq.merge(rows, occurrences) for async rows: both already sorted, rows first on equal keys"""
+    pending = iter(occurrences)
+    occurrence = next(pending, None)
+    async for row in rows:
+        row_key = key(row)
+        while occurrence is not None and (key(occurrence) > row_key if descending else key(occurrence) < row_key):
+            yield occurrence
+            occurrence = next(pending, None)
+        yield row
+    while occurrence is not None:
+        yield occurrence
+        occurrence = next(pending, None)
+
+
+class AsyncReads:
+    """The ASGI application"""
+
+    def __init__(self, app):
+        self.app = app
+        uri = async_database_uri(app.config['SQLALCHEMY_DATABASE_URI'])
+        self.engine = None
+        if uri is not None:
+            # Readers wait for a free connection on the event loop, never in a thread
+            self.engine = create_async_engine(uri, pool_size=app.config.get('ASYNC_DB_POOL_SIZE', DEFAULT_POOL_SIZE),
+                                              max_overflow=0, pool_timeout=30)
+        self.executor = ThreadPoolExecutor(max_workers=app.config.get('ASYNC_WSGI_THREADS', DEFAULT_WSGI_THREADS),
+                                           thread_name_prefix='eventa-wsgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            if not await self.serve_async(scope, send):
+                await self.serve_wsgi(scope, receive, send)
+        else:
+            raise RuntimeError(f"Unsupported ASGI scope type: {scope['type']}")
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.engine is not None:
+                    await self.engine.dispose()
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def session(self):
+        return AsyncSession(self.engine)
+
+    def stream_json_array(self, rows, serialize=lambda item: item.to_dict()):
+        """Like stream_json_array in the compression middleware, for rows(session) yielding asynchronously"""
+        async def generate():
+            writer = JSONArrayWriter(current_app.json.dumps)
+            async with self.session() as session:
+                async for item in rows(session):
+                    chunk = writer.add(serialize(item))
+                    if chunk is not None:
+                        yield chunk
+            yield writer.close()
+
+        return AsyncStream(generate())
+
+    async def serve_async(self, scope, send):
+        """Answer the request on the event loop if it's one of ASYNC_VIEWS; False leaves it to the Flask app"""
+        if self.engine is None or scope['method'] != 'GET':
+            return False
+        ctx = self.app.request_context(wsgi_environ(scope))
+        ctx.push()
+        try:
+            view = ASYNC_VIEWS.get(request.endpoint)
+            if view is None or include_past_requested() or facets_requested():
+                return False
+            await self.dispatch(view, send)
+            return True
+        finally:
+            ctx.pop()
+
+    async def dispatch(self, view, send):
+        """Flask's full_dispatch_request around an async view"""
+        app = self.app
+        chunks = None
+        try:
+            try:
+                rv = app.preprocess_request()
+                if rv is None:
+                    rv = await view(self, **request.view_args)
+                    if isinstance(rv, AsyncStream):
+                        # As on the threaded server, the after_request hooks see the start of the stream and set the
+                        # headers from it; a short body is sent whole, otherwise the rest is sent below
+                        head, chunks = await read_ahead(rv.chunks, app.config.get('COMPRESSION_MIN_SIZE', 0))
+                        rv = Response(head if chunks is None else iter([head]), mimetype=rv.mimetype)
+                    # As @cross_origin() does for the Flask views, ahead of the after_request hooks
+                    rv = with_cors_headers(lambda: rv)()
+            except Exception as error:
+                chunks = None
+                rv = app.handle_user_exception(error)
+            response = app.process_response(app.make_response(rv))
+        except Exception as error:
+            chunks = None
+            response = app.make_response(app.handle_exception(error))
+
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                        for name, value in response.get_wsgi_headers(request.environ).items()],
+        })
+        if chunks is None:
+            await send({'type': 'http.response.body', 'body': response.get_data()})
+            return
+
+        encoding = response.headers.get('Content-Encoding')
+        stream = None
+        if encoding:
+            stream = CompressedStream(encoding, app.config['COMPRESSION_LEVELS'].get(encoding, DEFAULT_LEVELS[encoding]))
+        body = stream.feed(head) if stream else head
+        if body:
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+        async for chunk in chunks:
+            body = stream.feed(chunk) if stream else chunk.encode('utf-8')
+            if body:
+                await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': stream.close() if stream else b''})
+
+    async def serve_wsgi(self, scope, receive, send):
+        """Run the Flask app on the thread pool, streaming its response back through the event loop"""
+        limit = self.app.config.get('MAX_CONTENT_LENGTH')
+        parts = []
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            parts.append(message.get('body', b''))
+            size += len(parts[-1])
+            # Past the limit Flask answers 413 from what it has, so stop buffering
+            if not message.get('more_body') or (limit and size > limit):
+                break
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self._run_wsgi, wsgi_environ(scope, b''.join(parts)), send, loop)
+
+    def _run_wsgi(self, environ, send, loop):
+        def emit(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            started[:] = [int(status.split(' ', 1)[0]),
+                          [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]]
+
+        result = self.app(environ, start_response)
+        try:
+            emit({'type': 'http.response.start', 'status': started[0], 'headers': started[1]})
+            for chunk in result:
+                if chunk:
+                    emit({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            emit({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+
+async def get_events(reads):
+    try:
+        listing = EventListing(request.args, viewer_id_from_request())
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+
+    async def events(session):
+        series = (await session.scalars(listing.series_query())).all()
+        occurrences = []
+        if series:
+            stored = set((await session.execute(
+                stored_occurrences_query(series, listing.window_start, listing.window_end))).tuples())
+            occurrences = listing.sort_occurrences(
+                generated_occurrences(series, stored, listing.window_start, listing.window_end))
+        rows = await session.stream_scalars(listing.events_query())
+        async for event in merge_occurrences(rows, occurrences, listing.merge_key, listing.descending):
+            yield event
+
+    return reads.stream_json_array(events, listing.serializer())
+
+
+async def get_event(reads, event_id):
+    async with reads.session() as session:
+        event = (await session.scalars(visible_event_query(event_id, viewer_id_from_request()))).first()
+    if event is None:
+        abort(404)
+    return event_detail_response(event)
+
+
+async def get_trending_events(reads):
+    async with reads.session() as session:
+        events = (await session.scalars(trending_query(viewer_id_from_request()))).all()
+    return jsonify([event.to_dict() for event in events])
+
+
+async def get_messages(reads, user_id):
+    query = messages_query(user_id, request.args.get('other_user_id'))
+
+    async def messages(session):
+        async for message in await session.stream_scalars(query):
+            yield message
+
+    return reads.stream_json_array(messages)
+
+
+# Flask endpoint -> async view taking the AsyncReads instance and the URL arguments
+ASYNC_VIEWS = {
+    'events.get_events': get_events,
+    'events.get_event': get_event,
+    'events.get_trending_events': get_trending_events,
+    'social.get_messages': get_messages,
+}
+
+app = AsyncReads(flask_app)
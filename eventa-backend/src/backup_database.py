@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Take a verified snapshot of the app and archive databases while the app keeps running
+The web app schedules this as a background job; run it by hand (or from cron)
+when jobs run inline or before risky maintenance
+
+Usage:
+    python src/backup_database.py
+    python src/backup_database.py --method vacuum
+    python src/backup_database.py --pages-per-step 64 --step-sleep 0.05
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Snapshot the app and archive databases')
+    parser.add_argument('--method', choices=['backup', 'vacuum'], help='Online backup API in steps, or VACUUM INTO')
+    parser.add_argument('--pages-per-step', type=int, help='Pages copied per backup step')
+    parser.add_argument('--step-sleep', type=float, help='Seconds to pause between backup steps')
+    parser.add_argument('--backup-dir', help='Directory for snapshots (default: EVENTA_BACKUP_DIR)')
+    args = parser.parse_args(argv)
+
+    # Snapshot here rather than queueing another scheduled run
+    os.environ['EVENTA_JOBS_MODE'] = 'inline'
+    from src.main import app
+    from src.services.backup import run_backup
+
+    for option, key in (('method', 'BACKUP_METHOD'), ('pages_per_step', 'BACKUP_PAGES_PER_STEP'),
+                        ('step_sleep', 'BACKUP_STEP_SLEEP'), ('backup_dir', 'BACKUP_DIR')):
+        if getattr(args, option) is not None:
+            app.config[key] = getattr(args, option)
+
+    with app.app_context():
+        manifest = run_backup()
+    print(f"Wrote {os.path.join(app.config['BACKUP_DIR'], manifest['snapshot'])} "
+          f"({manifest['size_bytes'] / 1024 / 1024:.1f} MB, {sum(manifest['tables'].values())} rows) "
+          f"in {manifest['total_seconds']:.1f}s")
+    if 'archive' in manifest:
+        archive = manifest['archive']
+        print(f"Wrote {os.path.join(app.config['BACKUP_DIR'], archive['snapshot'])} "
+              f"({archive['size_bytes'] / 1024 / 1024:.1f} MB, {sum(archive['tables'].values())} rows)")
+    else:
+        print(f"No archive database at {app.config['ARCHIVE_DATABASE']} yet; only the app database was copied")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Flag near-duplicate events across the whole event table
+Signs every event that has no MinHash signature yet (or every event with
+--rebuild) in vectorized chunks and records similar pairs for review through
+GET /api/duplicates
+
+Usage:
+    python src/dedup_events.py
+    python src/dedup_events.py --rebuild --threshold 0.7 --chunk-size 5000
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Flag near-duplicate events')
+    parser.add_argument('--rebuild', action='store_true', help='Re-sign every event instead of only new ones')
+    parser.add_argument('--threshold', type=float, help='Minimum estimated similarity (default: EVENTA_DEDUP_THRESHOLD)')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='Events signed per batch')
+    args = parser.parse_args(argv)
+
+    os.environ['EVENTA_JOBS_MODE'] = 'inline'
+    from src.main import app
+    from src.services.dedup import scan_duplicates
+
+    with app.app_context():
+        stats = scan_duplicates(threshold=args.threshold, rebuild=args.rebuild, chunk_size=args.chunk_size, log=print)
+    print(json.dumps(stats))
+
+
+if __name__ == '__main__':
+    main()
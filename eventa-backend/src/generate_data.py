@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Synthetic data generator for Eventa
+Produces large, realistically distributed datasets for load testing and benchmarks
+
+Usage:
+    python src/generate_data.py --users 100000 --database /tmp/eventa-100k.db
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import create_engine, event as sa_event, insert, text
+
+from src.models.user import db, User
+from src.models.event import Event, RSVP
+from src.models.social import Friendship, Message, Bookmark, UserProfile
+from src.services.pricing import parse_price
+
+CATEGORIES = ['Social', 'Culture', 'Theatre', 'Education', 'Sports', 'Music', 'Photography', 'Food', 'Wellness', 'Business', 'Tech', 'Art']
+CITIES = [
+    ('Sydney', 30), ('Melbourne', 28), ('Brisbane', 14), ('Perth', 10), ('Adelaide', 8),
+    ('Canberra', 4), ('Hobart', 2), ('Wollongong', 2), ('Newcastle', 2),
+]
+VENUES = ['Town Hall', 'Central Park', 'Innovation Hub', 'Riverside Venue', 'Art Gallery', 'Community Centre', 'Library', 'Stadium', 'Beach Club', 'Warehouse']
+TITLE_ADJECTIVES = ['Late Night', 'Weekend', 'Community', 'Annual', 'Pop-up', 'Sunset', 'Live', 'Beginner', 'Advanced', 'Family']
+TITLE_NOUNS = {
+    'Social': ['Mixer', 'Meetup', 'Picnic', 'Trivia Night'],
+    'Culture': ['Festival', 'Heritage Walk', 'Market'],
+    'Theatre': ['Improv Show', 'Play Reading', 'Comedy Night'],
+    'Education': ['Workshop', 'Lecture', 'Study Group'],
+    'Sports': ['Fun Run', 'Soccer Match', 'Yoga Session', 'Tournament'],
+    'Music': ['Jazz Evening', 'Concert', 'Open Mic', 'DJ Set'],
+    'Photography': ['Photo Walk', 'Exhibition', 'Portrait Session'],
+    'Food': ['Dinner', 'Brunch', 'Cooking Class', 'Food Truck Rally'],
+    'Wellness': ['Retreat', 'Meditation', 'Sound Bath'],
+    'Business': ['Networking Mixer', 'Pitch Night', 'Panel'],
+    'Tech': ['Hackathon', 'Summit', 'Demo Day'],
+    'Art': ['Exhibition', 'Life Drawing', 'Gallery Opening'],
+}
+PRICES = [('Free', 45), ('$10', 12), ('$15', 10), ('$20', 10), ('$25', 8), ('$45', 6), ('$50', 5), ('$85', 3), ('$150', 1)]
+RSVP_STATUSES = [('interested', 55), ('going', 35), ('not_going', 10)]
+MESSAGE_SNIPPETS = [
+    'Are you going this weekend?', 'See you there!', 'Thanks for the invite', 'Running a bit late',
+    'Did you get tickets?', 'That was a great event', 'Want to grab food before?', 'Count me in',
+]
+
+
+def zipf_cum_weights(n, exponent):
+    """Cumulative weights for a Zipf-like popularity distribution over n ranked items"""
+    return list(accumulate(1.0 / (rank ** exponent) for rank in range(1, n + 1)))
+
+
+def weighted_cum_weights(pairs):
+    values = [value for value, _ in pairs]
+    return values, list(accumulate(weight for _, weight in pairs))
+
+
+def lognormal_count(rng, mean, sigma, upper):
+    """Heavy-tailed non-negative count, clipped to upper"""
+    return min(upper, int(rng.lognormvariate(0, sigma) * mean))
+
+
+def chunked_insert(conn, table, rows, chunk_size):
+    """Insert an iterable of row dicts with executemany in fixed-size chunks"""
+    batch = []
+    total = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            conn.execute(insert(table), batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        conn.execute(insert(table), batch)
+        total += len(batch)
+    return total
+
+
+class SyntheticDataGenerator:
+    """Generates users, profiles, events, RSVPs, bookmarks, friendships and messages"""
+
+    def __init__(self, users=10000, events_per_user=0.2, rsvps_per_user=6, bookmarks_per_user=2,
+                 friends_per_user=12, messages_per_user=8, seed=42, start_date=None, chunk_size=10000):
+        self.num_users = users
+        self.num_events = max(1, int(users * events_per_user))
+        self.rsvps_per_user = rsvps_per_user
+        self.bookmarks_per_user = bookmarks_per_user
+        self.friends_per_user = friends_per_user
+        self.messages_per_user = messages_per_user
+        self.seed = seed
+        self.start_date = start_date or datetime(2025, 1, 1)
+        self.chunk_size = chunk_size
+        self.rng = random.Random(seed)
+
+        # Popularity distributions: a few prolific organizers, a few blockbuster events
+        self._organizer_weights = zipf_cum_weights(self.num_users, 1.1)
+        self._event_weights = zipf_cum_weights(self.num_events, 0.9)
+        self._user_weights = zipf_cum_weights(self.num_users, 0.6)
+        self._cities, self._city_weights = weighted_cum_weights(CITIES)
+        self._prices, self._price_weights = weighted_cum_weights(PRICES)
+        self._statuses, self._status_weights = weighted_cum_weights(RSVP_STATUSES)
+
+    def _pick(self, population_size, cum_weights, k=1):
+        return self.rng.choices(range(1, population_size + 1), cum_weights=cum_weights, k=k)
+
+    def _timestamp(self, max_days=365):
+        return self.start_date + timedelta(seconds=self.rng.randrange(max_days * 86400))
+
+    def users(self):
+        for user_id in range(1, self.num_users + 1):
+            yield {'id': user_id, 'username': f'user{user_id}', 'email': f'user{user_id}@example.com'}
+
+    def profiles(self):
+        for user_id in range(1, self.num_users + 1):
+            interests = self.rng.sample(CATEGORIES, self.rng.randint(1, 4))
+            city = self.rng.choices(self._cities, cum_weights=self._city_weights)[0]
+            created = self._timestamp()
+            yield {
+                'user_id': user_id,
+                'display_name': f'User {user_id}',
+                'bio': None,
+                'location': f'{city}, Australia',
+                'interests': ','.join(category.lower() for category in interests),
+                'privacy_level': self.rng.choices(['public', 'friends_only', 'private'], weights=[80, 15, 5])[0],
+                'created_at': created,
+                'updated_at': created,
+            }
+
+    def events(self):
+        organizers = self._pick(self.num_users, self._organizer_weights, k=self.num_events)
+        parsed_prices = {price: parse_price(price) for price in self._prices}
+        for event_id, organizer_id in enumerate(organizers, start=1):
+            category = self.rng.choice(CATEGORIES)
+            city = self.rng.choices(self._cities, cum_weights=self._city_weights)[0]
+            created = self._timestamp()
+            event_date = created + timedelta(days=self.rng.randint(3, 90))
+            hour = self.rng.choice([9, 10, 11, 14, 17, 18, 19, 20])
+            event = {
+                'id': event_id,
+                'title': f'{self.rng.choice(TITLE_ADJECTIVES)} {self.rng.choice(TITLE_NOUNS[category])} #{event_id}',
+                'description': f'A {category.lower()} event in {city}. ' * self.rng.randint(1, 6),
+                'date': event_date.strftime('%Y-%m-%d'),
+                'time': f'{hour:02d}:00',
+                'location': f'{self.rng.choice(VENUES)}, {city}',
+                'price': self.rng.choices(self._prices, cum_weights=self._price_weights)[0],
+                'image_url': None,
+                'category': category,
+                'organizer_id': organizer_id,
+                'organizer_name': f'User {organizer_id}',
+                'attendees_count': 0,
+                'helpers_needed': self.rng.random() < 0.2,
+                'visibility': self.rng.choices(['public', 'private', 'invite-only'], weights=[90, 5, 5])[0],
+                'created_at': created,
+                'updated_at': created,
+            }
+            event['price_cents'], event['currency'] = parsed_prices[event['price']]
+            yield event
+
+    def rsvps(self):
+        for user_id in range(1, self.num_users + 1):
+            count = lognormal_count(self.rng, self.rsvps_per_user, 0.8, self.num_events)
+            for event_id in set(self._pick(self.num_events, self._event_weights, k=count)):
+                yield {
+                    'user_id': user_id,
+                    'event_id': event_id,
+                    'status': self.rng.choices(self._statuses, cum_weights=self._status_weights)[0],
+                    'created_at': self._timestamp(),
+                }
+
+    def bookmarks(self):
+        for user_id in range(1, self.num_users + 1):
+            count = lognormal_count(self.rng, self.bookmarks_per_user, 1.0, self.num_events)
+            for event_id in set(self._pick(self.num_events, self._event_weights, k=count)):
+                yield {'user_id': user_id, 'event_id': event_id, 'created_at': self._timestamp()}
+
+    def friendships(self):
+        # Each unordered pair is generated at most once: user u only befriends users with a higher id
+        for user_id in range(1, self.num_users):
+            remaining = self.num_users - user_id
+            count = min(remaining, lognormal_count(self.rng, self.friends_per_user / 2, 0.9, remaining))
+            friends = set()
+            for _ in range(count * 2):
+                if len(friends) >= count:
+                    break
+                friends.add(user_id + self.rng.randint(1, min(remaining, 5000)))
+            for friend_id in friends:
+                requester, addressee = (user_id, friend_id) if self.rng.random() < 0.5 else (friend_id, user_id)
+                created = self._timestamp()
+                yield {
+                    'requester_id': requester,
+                    'addressee_id': addressee,
+                    'status': self.rng.choices(['accepted', 'pending'], weights=[85, 15])[0],
+                    'created_at': created,
+                    'updated_at': created,
+                }
+
+    def messages(self):
+        total = self.num_users * self.messages_per_user
+        senders = self._pick(self.num_users, self._user_weights, k=min(total, 1000000))
+        for index in range(total):
+            sender_id = senders[index % len(senders)]
+            recipient_id = self.rng.randint(1, self.num_users)
+            if recipient_id == sender_id:
+                recipient_id = recipient_id % self.num_users + 1
+            is_invite = self.rng.random() < 0.1
+            yield {
+                'sender_id': sender_id,
+                'recipient_id': recipient_id,
+                'content': 'You have been invited to an event!' if is_invite else self.rng.choice(MESSAGE_SNIPPETS),
+                'message_type': 'event_invite' if is_invite else 'text',
+                'event_id': self._pick(self.num_events, self._event_weights)[0] if is_invite else None,
+                'is_read': self.rng.random() < 0.7,
+                'created_at': self._timestamp(),
+            }
+
+    def generate(self, engine, log=print):
+        """Create the schema and bulk insert every table, returning row counts"""
+        db.metadata.create_all(engine)
+        phases = [
+            ('users', User.__table__, self.users),
+            ('profiles', UserProfile.__table__, self.profiles),
+            ('events', Event.__table__, self.events),
+            ('rsvps', RSVP.__table__, self.rsvps),
+            ('bookmarks', Bookmark.__table__, self.bookmarks),
+            ('friendships', Friendship.__table__, self.friendships),
+            ('messages', Message.__table__, self.messages),
+        ]
+        counts = {}
+        for name, table, rows in phases:
+            start = time.perf_counter()
+            with engine.begin() as conn:
+                counts[name] = chunked_insert(conn, table, rows(), self.chunk_size)
+            elapsed = time.perf_counter() - start
+            log(f"  {name}: {counts[name]} rows in {elapsed:.1f}s ({counts[name] / max(elapsed, 1e-9):,.0f} rows/s)")
+
+        # Keep the denormalized attendee count consistent with the generated RSVPs
+        with engine.begin() as conn:
+            conn.execute(text(
+                "UPDATE event SET attendees_count = going.total "
+                "FROM (SELECT event_id, COUNT(*) AS total FROM rsvp WHERE status = 'going' GROUP BY event_id) AS going "
+                "WHERE going.event_id = event.id"
+            ))
+        return counts
+
+
+def create_bulk_engine(database_path):
+    """SQLite engine tuned for one-off bulk loading"""
+    engine = create_engine(f'sqlite:///{database_path}')
+
+    @sa_event.listens_for(engine, 'connect')
+    def set_bulk_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=OFF')
+        cursor.execute('PRAGMA cache_size=-200000')
+        cursor.execute('PRAGMA temp_store=MEMORY')
+        cursor.close()
+
+    return engine
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a synthetic Eventa dataset')
+    parser.add_argument('--database', required=True, help='SQLite file to create (must not exist unless --force)')
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--events-per-user', type=float, default=0.2)
+    parser.add_argument('--rsvps-per-user', type=float, default=6)
+    parser.add_argument('--bookmarks-per-user', type=float, default=2)
+    parser.add_argument('--friends-per-user', type=float, default=12)
+    parser.add_argument('--messages-per-user', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--force', action='store_true', help='Overwrite an existing database file')
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.database):
+        if not args.force:
+            parser.error(f'{args.database} already exists (use --force to overwrite)')
+        os.remove(args.database)
+
+    generator = SyntheticDataGenerator(
+        users=args.users,
+        events_per_user=args.events_per_user,
+        rsvps_per_user=args.rsvps_per_user,
+        bookmarks_per_user=args.bookmarks_per_user,
+        friends_per_user=args.friends_per_user,
+        messages_per_user=args.messages_per_user,
+        seed=args.seed,
+        chunk_size=args.chunk_size,
+    )
+    print(f"Generating {args.users} users into {args.database} (seed {args.seed})...")
+    start = time.perf_counter()
+    engine = create_bulk_engine(args.database)
+    counts = generator.generate(engine)
+    engine.dispose()
+    print(f"Done in {time.perf_counter() - start:.1f}s: {counts}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Write personalized event digests for every user to the outbox
+The web app schedules weekly runs as a background job; run it by hand (or from
+cron) when jobs run inline, for daily digests, or to regenerate a past period
+
+Usage:
+    python src/generate_digests.py
+    python src/generate_digests.py --frequency daily --as-of 2025-07-01 --workers 4
+"""
+
+import argparse
+import os
+import sys
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate personalized event digests')
+    parser.add_argument('--as-of', type=date.fromisoformat, help='Period end date, YYYY-MM-DD (default: today)')
+    parser.add_argument('--frequency', choices=['weekly', 'daily'], default='weekly', help='Which digest to generate')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: EVENTA_DIGEST_WORKERS or CPU count)')
+    parser.add_argument('--chunk-size', type=int, help='Users per worker task')
+    parser.add_argument('--outbox', help='Outbox directory (default: EVENTA_DIGEST_OUTBOX)')
+    args = parser.parse_args(argv)
+
+    # Generate here rather than queueing another scheduled run
+    os.environ['EVENTA_JOBS_MODE'] = 'inline'
+    from src.main import app
+    from src.services.digests import run_digests
+
+    if args.workers:
+        app.config['DIGEST_WORKERS'] = args.workers
+    if args.chunk_size:
+        app.config['DIGEST_CHUNK_SIZE'] = args.chunk_size
+    if args.outbox:
+        app.config['DIGEST_OUTBOX'] = args.outbox
+
+    with app.app_context():
+        stats = run_digests(as_of=args.as_of, frequency=args.frequency)
+    print(f"Wrote {stats['digests']} digests for {stats['users']} users to {stats['outbox']} "
+          f"in {stats['elapsed_seconds']:.1f}s ({stats['workers']} workers)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Bulk import pipeline for Eventa
+Streams users or events from CSV / JSON / JSON Lines files in chunks, resolves
+existing rows with one set-based lookup per chunk and writes with executemany
+inside large transactions
+
+Usage:
+    python src/import_data.py users users.csv
+    python src/import_data.py events partner_feed.jsonl --on-conflict update --chunk-size 5000
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import insert, select, update
+
+from src.models.user import db, User
+from src.models.event import Event
+from src.models.schema import upgrade_schema
+from src.services.pricing import DEFAULT_CURRENCY, apply_price
+from src.services.dedup import remove_signatures, scan_duplicates
+
+EVENT_FIELDS = ['title', 'description', 'date', 'time', 'location', 'price', 'image_url', 'category',
+                'organizer_id', 'organizer_name', 'helpers_needed', 'visibility']
+EVENT_REQUIRED_FIELDS = ['title', 'date', 'time', 'location', 'category']
+EVENT_DEFAULTS = {'description': '', 'price': 'Free', 'price_cents': 0, 'currency': DEFAULT_CURRENCY,
+                  'visibility': 'public', 'helpers_needed': False}
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            yield {key: value for key, value in row.items() if key is not None}
+
+
+def read_json(path, buffer_size=1 << 16):
+    """Stream objects from a JSON array or JSON Lines file without loading it whole"""
+    decoder = json.JSONDecoder()
+    with open(path, encoding='utf-8') as f:
+        buffer = f.read(buffer_size).lstrip()
+        in_array = buffer.startswith('[')
+        if in_array:
+            buffer = buffer[1:]
+        eof = False
+        while True:
+            buffer = buffer.lstrip().lstrip(',').lstrip()
+            if in_array and buffer.startswith(']'):
+                return
+            if not buffer and eof:
+                return
+            try:
+                obj, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = f.read(buffer_size)
+                eof = not chunk
+                buffer += chunk
+                continue
+            yield obj
+            buffer = buffer[end:]
+            if len(buffer) < buffer_size and not eof:
+                chunk = f.read(buffer_size)
+                eof = not chunk
+                buffer += chunk
+
+
+def read_rows(path, fmt=None):
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'json')
+    return read_csv(path) if fmt == 'csv' else read_json(path)
+
+
+def chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    if value is None:
+        return False
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+class ImportStats:
+    """Running counters with periodic progress and throughput reporting"""
+
+    def __init__(self, label, log=print, report_every=5.0):
+        self.label = label
+        self.log = log
+        self.report_every = report_every
+        self.read = 0
+        self.inserted = 0
+        self.updated = 0
+        self.skipped = 0
+        self.invalid = 0
+        self.started = time.perf_counter()
+        self._last_report = self.started
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.read / self.elapsed if self.elapsed > 0 else 0.0
+
+    def progress(self, force=False):
+        now = time.perf_counter()
+        if force or now - self._last_report >= self.report_every:
+            self._last_report = now
+            self.log(f"  {self.label}: {self.read} read, {self.inserted} inserted, {self.updated} updated, "
+                     f"{self.skipped} skipped, {self.invalid} invalid ({self.rows_per_second:,.0f} rows/s)")
+
+    def to_dict(self):
+        return {
+            'read': self.read,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'skipped': self.skipped,
+            'invalid': self.invalid,
+            'elapsed_seconds': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+        }
+
+
+def _commit_if_due(chunk_index, commit_every):
+    if (chunk_index + 1) % commit_every == 0:
+        db.session.commit()
+
+
+def import_users(rows, chunk_size=5000, commit_every=10, on_conflict='skip', log=print):
+    """Import users keyed by email; existing usernames or emails are skipped or updated"""
+    stats = ImportStats('users', log=log)
+    for chunk_index, chunk in enumerate(chunked(rows, chunk_size)):
+        stats.read += len(chunk)
+        candidates = {}
+        for row in chunk:
+            email = (row.get('email') or '').strip().lower()
+            username = (row.get('username') or '').strip()
+            if not email or not username:
+                stats.invalid += 1
+            elif email in candidates:
+                stats.skipped += 1
+            else:
+                candidates[email] = {'username': username, 'email': email}
+
+        existing = db.session.execute(
+            select(User.id, User.email, User.username).where(db.or_(
+                User.email.in_(list(candidates)),
+                User.username.in_([row['username'] for row in candidates.values()]),
+            ))
+        ).all()
+        existing_by_email = {row.email.lower(): row.id for row in existing}
+        taken_usernames = {row.username for row in existing}
+
+        new_rows, updates = [], []
+        for email, row in candidates.items():
+            if email in existing_by_email:
+                if on_conflict == 'update' and row['username'] not in taken_usernames:
+                    updates.append({'id': existing_by_email[email], 'username': row['username']})
+                else:
+                    stats.skipped += 1
+            elif row['username'] in taken_usernames:
+                stats.skipped += 1
+            else:
+                taken_usernames.add(row['username'])
+                new_rows.append(row)
+
+        if new_rows:
+            db.session.execute(insert(User), new_rows)
+            stats.inserted += len(new_rows)
+        if updates:
+            db.session.execute(update(User), updates)
+            stats.updated += len(updates)
+        _commit_if_due(chunk_index, commit_every)
+        stats.progress()
+
+    db.session.commit()
+    stats.progress(force=True)
+    return stats
+
+
+def _normalize_event(row):
+    if any(not row.get(field) for field in EVENT_REQUIRED_FIELDS):
+        return None
+    # Only fields present in the source row are kept so updates never clobber columns with defaults
+    event = {field: row[field] for field in EVENT_FIELDS if row.get(field) not in (None, '')}
+    if 'helpers_needed' in event:
+        event['helpers_needed'] = parse_bool(event['helpers_needed'])
+    if 'organizer_id' in event:
+        event['organizer_id'] = int(event['organizer_id'])
+    apply_price(event)
+    event['_organizer_email'] = (row.get('organizer_email') or '').strip().lower() or None
+    return event
+
+
+def import_events(rows, chunk_size=5000, commit_every=10, on_conflict='skip', log=print):
+    """Import events keyed by (title, date, location), resolving organizers by id or email"""
+    stats = ImportStats('events', log=log)
+    for chunk_index, chunk in enumerate(chunked(rows, chunk_size)):
+        stats.read += len(chunk)
+        candidates = {}
+        for row in chunk:
+            event = _normalize_event(row)
+            if event is None:
+                stats.invalid += 1
+                continue
+            key = (event['title'], event['date'], event['location'])
+            if key in candidates:
+                stats.skipped += 1
+            else:
+                candidates[key] = event
+
+        # Resolve organizers referenced by email in one query
+        emails = {event['_organizer_email'] for event in candidates.values()
+                  if event['_organizer_email'] and 'organizer_id' not in event}
+        organizers = {}
+        if emails:
+            for user_id, email, username in db.session.execute(
+                    select(User.id, User.email, User.username).where(User.email.in_(emails))):
+                organizers[email.lower()] = (user_id, username)
+
+        existing = {}
+        if candidates:
+            for event_id, version, title, date, location in db.session.execute(
+                    select(Event.id, Event.version, Event.title, Event.date, Event.location)
+                    .where(Event.title.in_({key[0] for key in candidates}))):
+                existing[(title, date, location)] = (event_id, version)
+
+        new_rows, updates = [], []
+        now = datetime.utcnow()
+        for key, event in candidates.items():
+            email = event.pop('_organizer_email')
+            if 'organizer_id' not in event:
+                if email not in organizers:
+                    stats.invalid += 1
+                    continue
+                event['organizer_id'], username = organizers[email]
+                event.setdefault('organizer_name', username)
+            if not event.get('organizer_name'):
+                stats.invalid += 1
+                continue
+
+            if key in existing:
+                if on_conflict == 'update':
+                    # The version read above is checked and bumped like any ORM update of the event
+                    event_id, version = existing[key]
+                    updates.append(dict(event, id=event_id, version=version, updated_at=now))
+                else:
+                    stats.skipped += 1
+            else:
+                new_rows.append(dict(EVENT_DEFAULTS, **event, attendees_count=0, created_at=now, updated_at=now))
+
+        if new_rows:
+            db.session.execute(insert(Event), new_rows)
+            stats.inserted += len(new_rows)
+        if updates:
+            db.session.execute(update(Event), updates)
+            # Dropping the stale signatures makes the dedup scan after the import sign these events again
+            remove_signatures([row['id'] for row in updates])
+            stats.updated += len(updates)
+        _commit_if_due(chunk_index, commit_every)
+        stats.progress()
+
+    db.session.commit()
+    stats.progress(force=True)
+    return stats
+
+
+IMPORTERS = {
+    'users': import_users,
+    'events': import_events,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bulk import users or events into Eventa')
+    parser.add_argument('kind', choices=sorted(IMPORTERS))
+    parser.add_argument('path', help='CSV, JSON array or JSON Lines file')
+    parser.add_argument('--format', choices=['csv', 'json'], help='Input format (default: from file extension)')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='Rows resolved and written per batch')
+    parser.add_argument('--commit-every', type=int, default=10, help='Chunks per transaction')
+    parser.add_argument('--on-conflict', choices=['skip', 'update'], default='skip')
+    parser.add_argument('--skip-dedup', action='store_true', help='Do not check imported events for near-duplicates')
+    args = parser.parse_args(argv)
+
+    from flask import Flask
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+        'EVENTA_DATABASE_URI',
+        f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+    )
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        upgrade_schema()
+        print(f"Importing {args.kind} from {args.path}...")
+        stats = IMPORTERS[args.kind](
+            read_rows(args.path, args.format),
+            chunk_size=args.chunk_size,
+            commit_every=args.commit_every,
+            on_conflict=args.on_conflict,
+        )
+        print(json.dumps(stats.to_dict()))
+        if args.kind == 'events' and not args.skip_dedup:
+            # Signs only the events that have no signature yet, i.e. the ones just imported or updated
+            print('Checking imported events for near-duplicates...')
+            print(json.dumps(scan_duplicates()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+DEAD = 'dead'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS job (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    idempotency_key TEXT,
+    coalesce_key TEXT,
+    run_at REAL NOT NULL,
+    locked_by TEXT,
+    locked_at REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_job_idempotency_key ON job (idempotency_key) WHERE idempotency_key IS NOT NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS ix_job_coalesce_key ON job (coalesce_key) WHERE status = 'queued' AND coalesce_key IS NOT NULL;
+CREATE INDEX IF NOT EXISTS ix_job_ready ON job (status, run_at);
+"""
+
+
+class Job:
+    """A claimed unit of work"""
+
+    def __init__(self, row):
+        self.id = row['id']
+        self.name = row['name']
+        self.payload = json.loads(row['payload'])
+        self.status = row['status']
+        self.attempts = row['attempts']
+        self.max_attempts = row['max_attempts']
+        self.idempotency_key = row['idempotency_key']
+        self.locked_by = row['locked_by']
+
+    def __repr__(self):
+        return f'<Job {self.id} {self.name} attempt:{self.attempts}>'
+
+
+class JobQueue:
+    """Durable job queue stored in its own SQLite file
+
+    Jobs live in a separate database so queue bookkeeping never contends with
+    the application's write lock. Claiming is a single UPDATE ... RETURNING, so
+    any number of worker threads or processes can share one queue file.
+
+    A running job's lock expires visibility_timeout seconds after it was
+    claimed or last renewed with heartbeat(); requeue_stale() then hands it to
+    another worker. complete() and fail() only apply while the caller still
+    holds the lock, so a worker whose job was taken over cannot finish it.
+    """
+
+    def __init__(self, path, visibility_timeout=300, retry_base_delay=2.0, retry_max_delay=600.0):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, name, payload=None, idempotency_key=None, coalesce_key=None, delay=0, max_attempts=5):
+        """Add a job and return its id
+
+        idempotency_key deduplicates until the job is purged: enqueueing the
+        same key again returns the original job, unless that job is dead, in
+        which case a new job takes over the key. coalesce_key only deduplicates
+        against a job that is still waiting to run, which suits recomputations
+        where one pending run covers every trigger.
+        """
+        now = time.time()
+        conn = self._connection()
+        if idempotency_key is not None:
+            conn.execute('UPDATE job SET idempotency_key = NULL WHERE idempotency_key = ? AND status = ?',
+                         (idempotency_key, DEAD))
+        cursor = conn.execute(
+            'INSERT OR IGNORE INTO job (name, payload, max_attempts, idempotency_key, coalesce_key, run_at, created_at, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (name, json.dumps(payload or {}), max_attempts, idempotency_key, coalesce_key, now + delay, now, now)
+        )
+        if cursor.rowcount:
+            return cursor.lastrowid
+        if idempotency_key is not None:
+            row = conn.execute('SELECT id FROM job WHERE idempotency_key = ?', (idempotency_key,)).fetchone()
+            if row:
+                return row['id']
+        row = conn.execute(
+            'SELECT id FROM job WHERE coalesce_key = ? AND status = ?', (coalesce_key, QUEUED)
+        ).fetchone()
+        return row['id'] if row else None
+
+    def claim(self, worker_id=None):
+        """Atomically take the next runnable job, or return None"""
+        now = time.time()
+        worker_id = worker_id or uuid.uuid4().hex
+        row = self._connection().execute(
+            'UPDATE job SET status = ?, locked_by = ?, locked_at = ?, attempts = attempts + 1, updated_at = ? '
+            'WHERE id = (SELECT id FROM job WHERE status = ? AND run_at <= ? ORDER BY run_at, id LIMIT 1) '
+            'RETURNING *',
+            (RUNNING, worker_id, now, now, QUEUED, now)
+        ).fetchone()
+        return Job(row) if row else None
+
+    def heartbeat(self, job):
+        """Renew the lock on a job this worker is still running; returns False once the lock was lost"""
+        now = time.time()
+        cursor = self._connection().execute(
+            'UPDATE job SET locked_at = ?, updated_at = ? WHERE id = ? AND status = ? AND locked_by = ?',
+            (now, now, job.id, RUNNING, job.locked_by)
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, job):
+        """Mark a job done; returns False if its lock expired and another worker has it now"""
+        cursor = self._connection().execute(
+            'UPDATE job SET status = ?, locked_by = NULL, last_error = NULL, updated_at = ? '
+            'WHERE id = ? AND status = ? AND locked_by = ?',
+            (DONE, time.time(), job.id, RUNNING, job.locked_by)
+        )
+        return cursor.rowcount == 1
+
+    def fail(self, job, error):
+        """Schedule a retry with exponential backoff, or mark the job dead
+
+        Returns the new status, or None if the job's lock expired and another worker has it now.
+        """
+        now = time.time()
+        if job.attempts >= job.max_attempts:
+            status, run_at = DEAD, now
+        else:
+            status = QUEUED
+            run_at = now + min(self.retry_max_delay, self.retry_base_delay * (2 ** (job.attempts - 1)))
+        conn = self._connection()
+        try:
+            cursor = conn.execute(
+                'UPDATE job SET status = ?, run_at = ?, locked_by = NULL, last_error = ?, updated_at = ? '
+                'WHERE id = ? AND status = ? AND locked_by = ?',
+                (status, run_at, str(error)[:2000], now, job.id, RUNNING, job.locked_by)
+            )
+        except sqlite3.IntegrityError:
+            # A newer job with the same coalesce_key is already queued and will do the work
+            status = DONE
+            cursor = conn.execute(
+                'UPDATE job SET status = ?, locked_by = NULL, last_error = ?, updated_at = ? '
+                'WHERE id = ? AND status = ? AND locked_by = ?',
+                (status, f'superseded after error: {error}'[:2000], now, job.id, RUNNING, job.locked_by)
+            )
+        return status if cursor.rowcount == 1 else None
+
+    def requeue_stale(self):
+        """Return jobs whose worker vanished mid-run to the queue, or mark them dead after their last attempt"""
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            "UPDATE job SET status = ?, locked_by = NULL, last_error = 'worker stopped renewing its lock', updated_at = ? "
+            'WHERE status = ? AND locked_at < ? AND attempts >= max_attempts',
+            (DEAD, now, RUNNING, now - self.visibility_timeout)
+        )
+        cursor = conn.execute(
+            'UPDATE OR IGNORE job SET status = ?, locked_by = NULL, run_at = ?, updated_at = ? '
+            'WHERE status = ? AND locked_at < ?',
+            (QUEUED, now, now, RUNNING, now - self.visibility_timeout)
+        )
+        # Rows skipped above collide with a newer queued job for the same coalesce_key
+        conn.execute(
+            "UPDATE job SET status = ?, locked_by = NULL, last_error = 'superseded', updated_at = ? "
+            'WHERE status = ? AND locked_at < ?',
+            (DONE, now, RUNNING, now - self.visibility_timeout)
+        )
+        return cursor.rowcount
+
+    def purge(self, older_than=7 * 86400):
+        """Delete finished jobs; idempotency keys of purged jobs can be reused"""
+        cursor = self._connection().execute(
+            'DELETE FROM job WHERE status = ? AND updated_at < ?', (DONE, time.time() - older_than)
+        )
+        return cursor.rowcount
+
+    def get(self, job_id):
+        row = self._connection().execute('SELECT * FROM job WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            'id': row['id'],
+            'name': row['name'],
+            'status': row['status'],
+            'attempts': row['attempts'],
+            'max_attempts': row['max_attempts'],
+            'last_error': row['last_error'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+        }
+
+    def stats(self):
+        """Queue depth by status plus the age of the oldest runnable job"""
+        conn = self._connection()
+        counts = {status: 0 for status in (QUEUED, RUNNING, DONE, DEAD)}
+        for row in conn.execute('SELECT status, COUNT(*) AS total FROM job GROUP BY status'):
+            counts[row['status']] = row['total']
+        oldest = conn.execute(
+            'SELECT MIN(run_at) AS oldest FROM job WHERE status = ? AND run_at <= ?', (QUEUED, time.time())
+        ).fetchone()['oldest']
+        by_name = {}
+        for row in conn.execute('SELECT name, COUNT(*) AS total FROM job WHERE status = ? GROUP BY name', (QUEUED,)):
+            by_name[row['name']] = row['total']
+        return {
+            'depth': counts,
+            'queued_by_name': by_name,
+            'oldest_queued_age_seconds': round(time.time() - oldest, 3) if oldest else 0.0,
+        }
@@ -0,0 +1,90 @@
+from flask import current_app
+
+from src.jobs.worker import job
+from src.models.user import User, db
+from src.models.event import Event
+from src.models.social import Message, UserProfile
+from src.services.invitations import fan_out_invitations
+from src.services.analytics import purge_engagement_log, rollup_engagement
+from src.services.archive import archive_history, schedule_archive
+from src.services.dedup import scan_duplicates
+from src.services.digests import run_digests, schedule_digests
+from src.services.propagation import propagate_copies
+from src.services.backup import run_backup, schedule_backup
+
+
+@job('send_event_invitation')
+def send_event_invitation(sender_id, recipient_id, event_id, content):
+    """Write the invitation message for one recipient"""
+    if Event.query.get(event_id) is None:
+        return
+    already_invited = Message.query.filter_by(
+        event_id=event_id, recipient_id=recipient_id, message_type='event_invite'
+    ).first()
+    if already_invited:
+        return
+    db.session.add(Message(
+        sender_id=sender_id,
+        recipient_id=recipient_id,
+        content=content,
+        message_type='event_invite',
+        event_id=event_id
+    ))
+
+
+@job('send_bulk_invitations')
+def send_bulk_invitations(sender_id, event_id, recipient_ids, audiences, content):
+    """Fan out invitations that were too large to send within the request"""
+    event = Event.query.get(event_id)
+    if event is not None:
+        fan_out_invitations(sender_id, event, recipient_ids, audiences, content)
+
+
+@job('rollup_engagement')
+def rollup_engagement_log():
+    """Fold new engagement log rows into the daily rollups and trim the rolled-up log"""
+    rollup_engagement()
+    purge_engagement_log(current_app.config.get('ANALYTICS_RETENTION_DAYS'))
+
+
+@job('archive_history')
+def archive_history_job():
+    """Move past events and old messages to the archive database, then queue the next run"""
+    archive_history()
+    schedule_archive()
+
+
+@job('generate_digests')
+def generate_digests_job(frequency='weekly'):
+    """Write the period's digests for every user who chose this frequency to the outbox, then queue the next run"""
+    run_digests(frequency=frequency)
+    schedule_digests(frequency)
+
+
+@job('propagate_copies')
+def propagate_copies_job(source, source_id, old_value):
+    """Rewrite the denormalized copies of a changed value in batches"""
+    propagate_copies(source, source_id, old_value)
+
+
+@job('backup_database')
+def backup_database_job():
+    """Snapshot the database into the backup directory, then queue the next run"""
+    run_backup()
+    schedule_backup()
+
+
+@job('scan_duplicates')
+def scan_duplicates_job(rebuild=False):
+    """Sign events missing from the duplicate index and flag near-duplicates"""
+    scan_duplicates(rebuild=rebuild)
+
+
+@job('create_default_profile')
+def create_default_profile(user_id):
+    """Persist the default profile served for users who have never saved one"""
+    if UserProfile.query.filter_by(user_id=user_id).first():
+        return
+    user = User.query.get(user_id)
+    if user:
+        db.session.add(UserProfile(user_id=user_id, display_name=user.username))
@@ -0,0 +1,159 @@
+import logging
+import os
+import threading
+import time
+import uuid
+
+from flask import current_app
+
+from src.jobs.queue import JobQueue
+from src.middleware.metrics import registry
+from src.models.user import db
+
+logger = logging.getLogger(__name__)
+
+# Job name -> handler(payload) registered with @job
+HANDLERS = {}
+
+jobs_processed = registry.counter(
+    'eventa_jobs_processed_total', 'Background jobs finished, by outcome', ('name', 'outcome'))
+job_duration = registry.histogram(
+    'eventa_job_duration_seconds', 'Background job handler run time', ('name',))
+queue_depth = registry.gauge(
+    'eventa_job_queue_depth', 'Background jobs by status', ('status',))
+
+
+def job(name):
+    """Register a function as the handler for jobs called name"""
+    def decorator(func):
+        HANDLERS[name] = func
+        return func
+    return decorator
+
+
+class WorkerPool:
+    """Threads that claim jobs from the queue and run their handlers in an app context"""
+
+    def __init__(self, app, queue, num_workers=2, poll_interval=0.5):
+        self.app = app
+        self.queue = queue
+        self.num_workers = num_workers
+        self.poll_interval = poll_interval
+        self.worker_id = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for index in range(self.num_workers):
+            thread = threading.Thread(target=self._run, args=(f'{self.worker_id}-{index}',),
+                                      name=f'eventa-job-worker-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def notify(self):
+        """Wake idle workers after an enqueue so new jobs start without waiting for a poll"""
+        self._wakeup.set()
+
+    def _heartbeat(self, claimed, finished):
+        """Renew a running job's lock until finished is set, so requeue_stale leaves long jobs to this worker"""
+        while not finished.wait(self.queue.visibility_timeout / 3):
+            try:
+                if not self.queue.heartbeat(claimed) and not finished.is_set():
+                    logger.warning('Job %s lost its lock while running', claimed)
+                    return
+            except Exception:
+                logger.exception('Could not renew the lock on job %s', claimed)
+
+    def run_once(self, worker_id=None):
+        """Claim and run a single job; returns False when the queue had nothing runnable"""
+        claimed = self.queue.claim(worker_id or self.worker_id)
+        if claimed is None:
+            return False
+        handler = HANDLERS.get(claimed.name)
+        start = time.perf_counter()
+        finished = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(claimed, finished),
+                         name=f'eventa-job-heartbeat-{claimed.id}', daemon=True).start()
+        with self.app.app_context():
+            try:
+                if handler is None:
+                    raise LookupError(f'No handler registered for job {claimed.name!r}')
+                handler(**claimed.payload)
+                db.session.commit()
+            except Exception as exc:
+                db.session.rollback()
+                finished.set()
+                status = self.queue.fail(claimed, exc)
+                jobs_processed.inc(name=claimed.name, outcome='retry' if status == 'queued' else status or 'lost')
+                logger.exception('Job %s failed (attempt %s/%s)', claimed, claimed.attempts, claimed.max_attempts)
+            else:
+                finished.set()
+                jobs_processed.inc(name=claimed.name, outcome='done' if self.queue.complete(claimed) else 'lost')
+            finally:
+                finished.set()
+                db.session.remove()
+        job_duration.observe(time.perf_counter() - start, name=claimed.name)
+        return True
+
+    def _run(self, worker_id):
+        last_maintenance = 0.0
+        while not self._stop.is_set():
+            try:
+                if time.monotonic() - last_maintenance > 30:
+                    self.queue.requeue_stale()
+                    last_maintenance = time.monotonic()
+                if self.run_once(worker_id):
+                    continue
+            except Exception:
+                logger.exception('Job worker %s crashed while polling', worker_id)
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+
+def init_jobs(app):
+    """Create the job queue and, in thread mode, start in-process workers
+
+    JOBS_MODE is 'thread' (workers inside the web process), 'external' (only
+    enqueue; run src/run_worker.py separately) or 'inline' (run handlers
+    synchronously at enqueue time, for development and debugging).
+    """
+    app.config.setdefault('JOBS_MODE', 'thread')
+    app.config.setdefault('JOBS_DATABASE', os.path.join(app.root_path, 'database', 'jobs.db'))
+    app.config.setdefault('JOBS_WORKERS', 2)
+    app.config.setdefault('JOBS_POLL_INTERVAL', 0.5)
+
+    # Importing the task modules registers their handlers
+    import src.jobs.tasks  # noqa: F401
+
+    queue = JobQueue(app.config['JOBS_DATABASE'])
+    pool = WorkerPool(app, queue, app.config['JOBS_WORKERS'], app.config['JOBS_POLL_INTERVAL'])
+    app.extensions['jobs'] = pool
+
+    def collect_queue_depth():
+        for status, total in queue.stats()['depth'].items():
+            queue_depth.set(total, status=status)
+
+    registry.register_collector(collect_queue_depth)
+
+    if app.config['JOBS_MODE'] == 'thread':
+        pool.start()
+    return pool
+
+
+def enqueue_job(name, payload=None, **options):
+    """Enqueue a job from inside a request and return its id"""
+    pool = current_app.extensions['jobs']
+    if current_app.config['JOBS_MODE'] == 'inline':
+        HANDLERS[name](**(payload or {}))
+        db.session.commit()
+        return None
+    job_id = pool.queue.enqueue(name, payload, **options)
+    pool.notify()
+    return job_id
@@ -3,12 +3,33 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+from flask import Flask
 from flask_cors import CORS
 from src.models.user import db
+from src.models.schema import upgrade_schema
 from src.routes.user import user_bp
 from src.routes.events import events_bp
 from src.routes.social import social_bp
+from src.routes.metrics import metrics_bp
+from src.routes.jobs import jobs_bp
+from src.routes.media import images_bp, media_bp
+from src.routes.batch import batch_bp
+from src.routes.analytics import analytics_bp
+from src.routes.suggest import suggest_bp
+from src.routes.calendar import calendar_bp
+from src.routes.dedup import dedup_bp
+from src.middleware.profiling import init_profiling
+from src.middleware.compression import init_compression
+from src.middleware.rate_limit import init_rate_limit
+from src.middleware.static_files import init_static
+from src.jobs.worker import init_jobs
+from src.services.write_buffer import init_write_buffer
+from src.services.analytics import init_analytics
+from src.services.archive import init_archive
+from src.services.digests import init_digests
+from src.services.backup import init_backups
+from src.services.suggest import init_suggest
+from src.services.ical import init_calendar_feeds
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
@@ -20,34 +41,130 @@ CORS(app)
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(events_bp, url_prefix='/api')
 app.register_blueprint(social_bp, url_prefix='/api')
+app.register_blueprint(jobs_bp, url_prefix='/api')
+app.register_blueprint(images_bp, url_prefix='/api')
+app.register_blueprint(batch_bp, url_prefix='/api')
+app.register_blueprint(analytics_bp, url_prefix='/api')
+app.register_blueprint(suggest_bp, url_prefix='/api')
+app.register_blueprint(calendar_bp, url_prefix='/api')
+app.register_blueprint(dedup_bp, url_prefix='/api')
+app.register_blueprint(media_bp)
+app.register_blueprint(metrics_bp)
 
 # Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+    'EVENTA_DATABASE_URI',
+    f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
 
+# Uploaded images are stored content-addressed; resized variants are rendered by a process pool
+app.config['MEDIA_ROOT'] = os.environ.get('EVENTA_MEDIA_ROOT', os.path.join(os.path.dirname(__file__), 'media'))
+app.config['IMAGE_WORKERS'] = int(os.environ.get('EVENTA_IMAGE_WORKERS', '2'))
+app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024
+
+# POST /api/batch: sub-requests per batch, and threads used to run independent reads concurrently
+app.config['BATCH_MAX_REQUESTS'] = int(os.environ.get('EVENTA_BATCH_MAX_REQUESTS', '20'))
+app.config['BATCH_WORKERS'] = int(os.environ.get('EVENTA_BATCH_WORKERS', '1'))
+
+# Events at least this MinHash-similar to an existing event on the same date are flagged as possible duplicates
+app.config['DEDUP_THRESHOLD'] = float(os.environ.get('EVENTA_DEDUP_THRESHOLD', '0.8'))
+
+# Recurring series are expanded into occurrences for this many days ahead unless a listing passes from/to
+app.config['RECURRENCE_WINDOW_DAYS'] = int(os.environ.get('EVENTA_RECURRENCE_WINDOW_DAYS', '60'))
+
+# Opt-in request profiling (Server-Timing headers, /metrics histograms, slow-request cProfile dumps)
+app.config['PROFILING_ENABLED'] = os.environ.get('EVENTA_PROFILING', '0') == '1'
+app.config['PROFILING_SAMPLE_RATE'] = float(os.environ.get('EVENTA_PROFILING_SAMPLE_RATE', '0'))
+app.config['PROFILING_SLOW_MS'] = float(os.environ.get('EVENTA_PROFILING_SLOW_MS', '500'))
+init_profiling(app)
+
+# Negotiated gzip/brotli/zstd compression for /api responses (brotli and zstd need their optional packages)
+app.config['COMPRESSION_ENABLED'] = os.environ.get('EVENTA_COMPRESSION', '1') == '1'
+app.config['COMPRESSION_MIN_SIZE'] = int(os.environ.get('EVENTA_COMPRESSION_MIN_SIZE', '1024'))
+app.config['COMPRESSION_LEVELS'] = {
+    'gzip': int(os.environ.get('EVENTA_COMPRESSION_GZIP_LEVEL', '6')),
+    'br': int(os.environ.get('EVENTA_COMPRESSION_BROTLI_LEVEL', '5')),
+    'zstd': int(os.environ.get('EVENTA_COMPRESSION_ZSTD_LEVEL', '3')),
+}
+init_compression(app)
+
+# Token-bucket rate limits per IP and per user; set EVENTA_RATE_LIMIT_STORE to a SQLite path to share buckets across processes
+app.config['RATE_LIMIT_ENABLED'] = os.environ.get('EVENTA_RATE_LIMIT', '1') == '1'
+app.config['RATE_LIMIT_STORE'] = os.environ.get('EVENTA_RATE_LIMIT_STORE') or None
+init_rate_limit(app)
+
 # Import all models to ensure they are registered
 from src.models.event import Event, RSVP, HelperRequest, HelperApplication
 from src.models.social import Friendship, Message, Bookmark, UserProfile
+from src.models.analytics import EngagementEvent, EventDailyStats, RollupWatermark
+from src.models.dedup import EventSignature, EventBand, DuplicateCandidate
 
 with app.app_context():
     db.create_all()
+    upgrade_schema()
+
+# Background jobs: 'thread' runs workers in this process, 'external' expects src/run_worker.py, 'inline' runs synchronously
+app.config['JOBS_MODE'] = os.environ.get('EVENTA_JOBS_MODE', 'thread')
+app.config['JOBS_DATABASE'] = os.environ.get('EVENTA_JOBS_DATABASE', os.path.join(os.path.dirname(__file__), 'database', 'jobs.db'))
+app.config['JOBS_WORKERS'] = int(os.environ.get('EVENTA_JOBS_WORKERS', '2'))
+init_jobs(app)
+
+# Read receipts and attendee recounts are written behind in batches; an interval of 0 writes them through
+app.config['WRITE_BUFFER_INTERVAL'] = float(os.environ.get('EVENTA_WRITE_BUFFER_INTERVAL', '0.5'))
+app.config['WRITE_BUFFER_MAX_PENDING'] = int(os.environ.get('EVENTA_WRITE_BUFFER_MAX_PENDING', '1000'))
+app.config['WRITE_BUFFER_MAX_ATTEMPTS'] = int(os.environ.get('EVENTA_WRITE_BUFFER_MAX_ATTEMPTS', '5'))
+init_write_buffer(app)
+
+# Event views and search impressions are logged through the write buffer and rolled up into daily stats
+app.config['ANALYTICS_ROLLUP_DELAY'] = float(os.environ.get('EVENTA_ANALYTICS_ROLLUP_DELAY', '60'))
+app.config['ANALYTICS_RETENTION_DAYS'] = int(os.environ.get('EVENTA_ANALYTICS_RETENTION_DAYS', '30'))
+app.config['ANALYTICS_IMPRESSION_LIMIT'] = int(os.environ.get('EVENTA_ANALYTICS_IMPRESSION_LIMIT', '50'))
+init_analytics(app)
+
+# Past events and old messages are moved to a separate archive database by a scheduled job
+app.config['ARCHIVE_DATABASE'] = os.environ.get('EVENTA_ARCHIVE_DATABASE', os.path.join(os.path.dirname(__file__), 'database', 'archive.db'))
+app.config['ARCHIVE_EVENT_DAYS'] = int(os.environ.get('EVENTA_ARCHIVE_EVENT_DAYS', '30'))
+app.config['ARCHIVE_MESSAGE_DAYS'] = int(os.environ.get('EVENTA_ARCHIVE_MESSAGE_DAYS', '365'))
+app.config['ARCHIVE_INTERVAL'] = float(os.environ.get('EVENTA_ARCHIVE_INTERVAL', str(24 * 60 * 60)))
+init_archive(app)
+
+# Personalized digests are generated for all users by a scheduled job and written to a local outbox
+app.config['DIGEST_OUTBOX'] = os.environ.get('EVENTA_DIGEST_OUTBOX', os.path.join(os.path.dirname(__file__), 'database', 'outbox'))
+app.config['DIGEST_WORKERS'] = int(os.environ.get('EVENTA_DIGEST_WORKERS', '0')) or None
+app.config['DIGEST_CHUNK_SIZE'] = int(os.environ.get('EVENTA_DIGEST_CHUNK_SIZE', '5000'))
+app.config['DIGEST_INTERVALS'] = {
+    'daily': float(os.environ.get('EVENTA_DIGEST_DAILY_INTERVAL', str(24 * 60 * 60))),
+    'weekly': float(os.environ.get('EVENTA_DIGEST_INTERVAL', str(7 * 24 * 60 * 60))),
+}
+init_digests(app)
+
+# Verified online snapshots of the database are taken by a scheduled job without blocking writers
+app.config['BACKUP_DIR'] = os.environ.get('EVENTA_BACKUP_DIR', os.path.join(os.path.dirname(__file__), 'database', 'backups'))
+app.config['BACKUP_METHOD'] = os.environ.get('EVENTA_BACKUP_METHOD', 'backup')
+app.config['BACKUP_PAGES_PER_STEP'] = int(os.environ.get('EVENTA_BACKUP_PAGES_PER_STEP', '256'))
+app.config['BACKUP_STEP_SLEEP'] = float(os.environ.get('EVENTA_BACKUP_STEP_SLEEP', '0.01'))
+app.config['BACKUP_NICENESS'] = int(os.environ.get('EVENTA_BACKUP_NICENESS', '10'))
+app.config['BACKUP_KEEP'] = int(os.environ.get('EVENTA_BACKUP_KEEP', '7'))
+app.config['BACKUP_INTERVAL'] = float(os.environ.get('EVENTA_BACKUP_INTERVAL', str(24 * 60 * 60)))
+init_backups(app)
+
+# Typeahead suggestions come from an in-memory prefix index built on the first /api/suggest lookup
+init_suggest(app)
+
+# Per-user .ics feeds are cached in memory and invalidated by RSVP, bookmark and event writes
+app.config['CALENDAR_CACHE_SECONDS'] = float(os.environ.get('EVENTA_CALENDAR_CACHE_SECONDS', '300'))
+app.config['CALENDAR_CACHE_SIZE'] = int(os.environ.get('EVENTA_CALENDAR_CACHE_SIZE', '10000'))
+init_calendar_feeds(app)
+
+# Served with `uvicorn src.asgi:app`, hot reads use this many aiosqlite connections and everything else this many threads
+app.config['ASYNC_DB_POOL_SIZE'] = int(os.environ.get('EVENTA_ASYNC_DB_POOL_SIZE', '4'))
+app.config['ASYNC_WSGI_THREADS'] = int(os.environ.get('EVENTA_ASYNC_WSGI_THREADS', '16'))
 
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-            return "Static folder not configured", 404
-
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
-            return "index.html not found", 404
+# Serve the built SPA from an in-memory index with precompressed gzip/brotli variants
+app.config['STATIC_RELOAD'] = os.environ.get('EVENTA_STATIC_RELOAD', '0') == '1'
+init_static(app)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,265 @@
+import itertools
+import zlib
+
+from flask import Response, current_app, request, stream_with_context
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+from src.middleware.metrics import registry
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/', 'application/javascript', 'application/xml',
+                          'text/calendar', 'application/problem+json')
+# Preference order when the client accepts several encodings equally
+ENCODING_PREFERENCE = ('zstd', 'br', 'gzip')
+DEFAULT_LEVELS = {'gzip': 6, 'br': 5, 'zstd': 3}
+STREAM_CHUNK_SIZE = 64 * 1024
+
+compressed_bytes = registry.counter(
+    'eventa_compression_bytes_total', 'API response bytes before and after compression', ('encoding', 'stage'))
+
+
+def accepted_encodings(header):
+    """Content codings from an Accept-Encoding header with a non-zero q-value"""
+    accepted = set()
+    for part in (header or '').split(','):
+        name, _, params = part.partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(name)
+    return accepted
+
+
+def available_encodings():
+    encodings = ['gzip']
+    if brotli is not None:
+        encodings.append('br')
+    if zstandard is not None:
+        encodings.append('zstd')
+    return encodings
+
+
+def negotiate_encoding(header, enabled):
+    accepted = accepted_encodings(header)
+    for encoding in ENCODING_PREFERENCE:
+        if encoding in enabled and (encoding in accepted or '*' in accepted):
+            return encoding
+    return None
+
+
+class StreamCompressor:
+    """Incremental compressor with a common interface across gzip, brotli and zstd"""
+
+    def __init__(self, encoding, level):
+        self.encoding = encoding
+        if encoding == 'gzip':
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        elif encoding == 'br':
+            self._compressor = brotli.Compressor(quality=level)
+        elif encoding == 'zstd':
+            self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        else:
+            raise ValueError(f'Unsupported encoding: {encoding}')
+
+    def compress(self, data):
+        if self.encoding == 'br':
+            return self._compressor.process(data)
+        return self._compressor.compress(data)
+
+    def flush(self):
+        """Emit everything buffered so far so the client can start decoding"""
+        if self.encoding == 'gzip':
+            return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        if self.encoding == 'br':
+            return self._compressor.flush()
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def compress_bytes(data, encoding, level):
+    compressor = StreamCompressor(encoding, level)
+    return compressor.compress(data) + compressor.finish()
+
+
+class CompressedStream:
+    """Compresses a response body chunk by chunk and counts the bytes in and out"""
+
+    def __init__(self, encoding, level):
+        self.encoding = encoding
+        self._compressor = StreamCompressor(encoding, level)
+        self._raw = 0
+        self._sent = 0
+
+    def feed(self, chunk):
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        self._raw += len(chunk)
+        out = self._compressor.compress(chunk) + self._compressor.flush()
+        self._sent += len(out)
+        return out
+
+    def close(self):
+        out = self._compressor.finish()
+        self._sent += len(out)
+        compressed_bytes.inc(self._raw, encoding=self.encoding, stage='raw')
+        compressed_bytes.inc(self._sent, encoding=self.encoding, stage='compressed')
+        return out
+
+
+def read_ahead(chunks, min_size):
+    """Pull chunks until min_size bytes have arrived; returns (those bytes, the rest or None if the stream ended)"""
+    iterator = iter(chunks)
+    head = []
+    size = 0
+    for chunk in iterator:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        head.append(chunk)
+        size += len(chunk)
+        if size >= min_size:
+            return b''.join(head), iterator
+    return b''.join(head), None
+
+
+def _compress_stream(chunks, encoding, level):
+    stream = CompressedStream(encoding, level)
+    for chunk in chunks:
+        out = stream.feed(chunk)
+        if out:
+            yield out
+    out = stream.close()
+    if out:
+        yield out
+
+
+class JSONArrayWriter:
+    """Builds a JSON array (optionally as one key of an object) in ~chunk_size pieces"""
+
+    def __init__(self, dumps, chunk_size=STREAM_CHUNK_SIZE, field=None, extra=None):
+        self.dumps = dumps
+        self.chunk_size = chunk_size
+        if field is None:
+            self._buffer, self._closing = ['['], ']\n'
+        else:
+            members = ''.join(f'{dumps(key)}:{dumps(value)},' for key, value in (extra or {}).items())
+            self._buffer, self._closing = ['{' + members + dumps(field) + ':['], ']}\n'
+        self._size = len(self._buffer[0])
+        self._first = True
+
+    def add(self, value):
+        """Append one element; returns a chunk to send once chunk_size is reached, else None"""
+        encoded = self.dumps(value)
+        if not self._first:
+            self._buffer.append(',')
+            self._size += 1
+        self._buffer.append(encoded)
+        self._size += len(encoded)
+        self._first = False
+        if self._size >= self.chunk_size:
+            chunk = ''.join(self._buffer)
+            self._buffer = []
+            self._size = 0
+            return chunk
+        return None
+
+    def close(self):
+        self._buffer.append(self._closing)
+        return ''.join(self._buffer)
+
+
+def stream_json_array(items, serialize=lambda item: item.to_dict(), chunk_size=STREAM_CHUNK_SIZE, field=None, extra=None):
+    """Stream a JSON array in ~chunk_size pieces instead of building the whole body
+
+    items may be a lazy query (e.g. with yield_per); the request context is kept
+    alive while the body is produced. With field, the array is streamed as that
+    key of a JSON object whose other keys are taken from extra.
+    """
+    def generate():
+        writer = JSONArrayWriter(current_app.json.dumps, chunk_size, field, extra)
+        for item in items:
+            chunk = writer.add(serialize(item))
+            if chunk is not None:
+                yield chunk
+        yield writer.close()
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+
+def init_compression(app):
+    """Compress API responses according to Accept-Encoding"""
+    app.config.setdefault('COMPRESSION_ENABLED', True)
+    app.config.setdefault('COMPRESSION_MIN_SIZE', 1024)
+    app.config.setdefault('COMPRESSION_LEVELS', dict(DEFAULT_LEVELS))
+    app.config.setdefault('COMPRESSION_PATH_PREFIXES', ('/api/',))
+
+    if not app.config['COMPRESSION_ENABLED']:
+        return
+
+    enabled = available_encodings()
+
+    @app.after_request
+    def compress_response(response):
+        if not request.path.startswith(tuple(app.config['COMPRESSION_PATH_PREFIXES'])):
+            return response
+        if (request.method == 'HEAD' or response.direct_passthrough
+                or response.status_code < 200 or response.status_code in (204, 206, 304)
+                or 'Content-Encoding' in response.headers
+                or not (response.mimetype or '').startswith(COMPRESSIBLE_MIMETYPES)):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        if response.is_streamed:
+            # Hold the start of the stream back until it's clear the body is big enough to be worth compressing;
+            # a stream that ends first is sent as a plain body with a Content-Length
+            head, rest = read_ahead(response.response, app.config['COMPRESSION_MIN_SIZE'])
+            if rest is None:
+                response.set_data(head)
+            else:
+                response.response = itertools.chain([head], rest)
+
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding'), enabled)
+        if encoding is None:
+            return response
+        level = app.config['COMPRESSION_LEVELS'].get(encoding, DEFAULT_LEVELS[encoding])
+
+        if response.is_streamed:
+            response.response = _compress_stream(response.response, encoding, level)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < app.config['COMPRESSION_MIN_SIZE']:
+                return response
+            compressed = compress_bytes(data, encoding, level)
+            if len(compressed) >= len(data):
+                return response
+            compressed_bytes.inc(len(data), encoding=encoding, stage='raw')
+            compressed_bytes.inc(len(compressed), encoding=encoding, stage='compressed')
+            response.set_data(compressed)
+
+        response.headers['Content-Encoding'] = encoding
+        # The representation changed, so a strong validator would be wrong
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
@@ -0,0 +1,157 @@
+import cProfile
+import os
+import random
+import threading
+import time
+from datetime import datetime
+
+from flask import g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.middleware.metrics import registry
+
+# Size buckets in bytes for response bodies
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+# Statement count buckets for queries issued per request
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+request_duration = registry.histogram(
+    'eventa_request_duration_seconds', 'Wall time spent handling a request', ('method', 'route', 'status'))
+sql_duration = registry.histogram(
+    'eventa_request_sql_duration_seconds', 'Total SQL execution time per request', ('method', 'route'))
+sql_queries = registry.histogram(
+    'eventa_request_sql_queries', 'SQL statements executed per request', ('method', 'route'), buckets=QUERY_BUCKETS)
+serialization_duration = registry.histogram(
+    'eventa_request_serialization_seconds', 'Time spent serializing JSON per request', ('method', 'route'))
+response_size = registry.histogram(
+    'eventa_response_size_bytes', 'Response body size', ('method', 'route'), buckets=SIZE_BUCKETS)
+profiles_dumped = registry.counter(
+    'eventa_slow_request_profiles_total', 'cProfile dumps written for slow requests', ('route',))
+
+_listeners_installed = False
+_listeners_lock = threading.Lock()
+
+
+def _stats():
+    if not has_request_context():
+        return None
+    return g.get('_profiling_stats')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _stats()
+    if stats is not None:
+        conn.info.setdefault('_profiling_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _stats()
+    starts = conn.info.get('_profiling_query_start')
+    if stats is None or not starts:
+        return
+    stats['sql_time'] += time.perf_counter() - starts.pop()
+    stats['sql_count'] += 1
+
+
+def _install_sql_listeners():
+    global _listeners_installed
+    with _listeners_lock:
+        if _listeners_installed:
+            return
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _listeners_installed = True
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """JSON provider that records time spent in dumps() for the current request"""
+
+    def dumps(self, obj, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            stats = _stats()
+            if stats is not None:
+                stats['serialization_time'] += time.perf_counter() - start
+
+
+def _route_label():
+    if request.url_rule is None:
+        return 'unmatched'
+    return request.endpoint or request.url_rule.rule
+
+
+def _dump_profile(app, profiler, route, wall_time):
+    dump_dir = app.config['PROFILING_DUMP_DIR']
+    os.makedirs(dump_dir, exist_ok=True)
+    timestamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+    filename = f"{timestamp}-{route.replace('/', '_')}-{int(wall_time * 1000)}ms.prof"
+    profiler.dump_stats(os.path.join(dump_dir, filename))
+    profiles_dumped.inc(route=route)
+
+
+def init_profiling(app):
+    """Install per-request profiling hooks when PROFILING_ENABLED is set"""
+    app.config.setdefault('PROFILING_ENABLED', False)
+    app.config.setdefault('PROFILING_SAMPLE_RATE', 0.0)  # fraction of requests run under cProfile
+    app.config.setdefault('PROFILING_SLOW_MS', 500)  # sampled requests slower than this are dumped
+    app.config.setdefault('PROFILING_DUMP_DIR', os.path.join(app.root_path, 'profiles'))
+
+    if not app.config['PROFILING_ENABLED']:
+        return
+
+    _install_sql_listeners()
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def start_request_profiling():
+        g._profiling_stats = {'sql_time': 0.0, 'sql_count': 0, 'serialization_time': 0.0}
+        g._profiling_start = time.perf_counter()
+        g._profiler = None
+        sample_rate = app.config['PROFILING_SAMPLE_RATE']
+        if sample_rate > 0 and random.random() < sample_rate:
+            g._profiler = cProfile.Profile()
+            g._profiler.enable()
+
+    @app.after_request
+    def finish_request_profiling(response):
+        stats = g.get('_profiling_stats')
+        if stats is None:
+            return response
+
+        wall_time = time.perf_counter() - g._profiling_start
+        profiler = g.get('_profiler')
+        if profiler is not None:
+            profiler.disable()
+
+        route = _route_label()
+        method = request.method
+
+        size = None
+        if not response.is_streamed and not response.direct_passthrough:
+            size = response.calculate_content_length()
+        if size is None:
+            size = response.content_length
+
+        request_duration.observe(wall_time, method=method, route=route, status=response.status_code)
+        sql_duration.observe(stats['sql_time'], method=method, route=route)
+        sql_queries.observe(stats['sql_count'], method=method, route=route)
+        serialization_duration.observe(stats['serialization_time'], method=method, route=route)
+        if size is not None:
+            response_size.observe(size, method=method, route=route)
+
+        response.headers.add('Server-Timing', ', '.join([
+            f'app;dur={wall_time * 1000:.2f}',
+            f'db;dur={stats["sql_time"] * 1000:.2f};desc="{stats["sql_count"]} queries"',
+            f'ser;dur={stats["serialization_time"] * 1000:.2f}',
+        ]))
+        if size is not None:
+            response.headers['X-Response-Size'] = str(size)
+
+        if profiler is not None and wall_time * 1000 >= app.config['PROFILING_SLOW_MS']:
+            _dump_profile(app, profiler, route, wall_time)
+
+        return response
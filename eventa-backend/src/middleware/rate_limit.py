@@ -0,0 +1,274 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, namedtuple
+from urllib.parse import parse_qs, urlsplit
+
+from flask import jsonify, request
+from werkzeug.exceptions import HTTPException
+
+from src.middleware.metrics import registry
+
+RateLimitResult = namedtuple('RateLimitResult', ('allowed', 'retry_after', 'remaining'))
+
+# Route class -> (sustained requests per second, burst size), applied per IP and per user
+DEFAULT_LIMITS = {
+    'read': (20.0, 60),
+    'write': (2.0, 20),
+    'poll': (1.0, 10),
+    'rsvp': (0.5, 10),
+    'invite': (0.5, 10),
+    'upload': (0.2, 5),
+    'batch': (2.0, 10),
+}
+ENDPOINT_CLASSES = {
+    'social.get_messages': 'poll',
+    'events.rsvp_event': 'rsvp',
+    'social.send_event_invitation': 'invite',
+    'social.send_bulk_invitations': 'invite',
+    'images.upload_image': 'upload',
+    'batch.batch': 'batch',
+}
+USER_ID_FIELDS = ('user_id', 'sender_id', 'requester_id', 'organizer_id')
+PRUNE_EVERY = 10000
+
+throttled_requests = registry.counter(
+    'eventa_rate_limited_total', 'Requests rejected by the rate limiter', ('route_class', 'scope'))
+
+
+class MemoryRateLimitStore:
+    """Per-process token buckets kept as GCRA theoretical arrival times
+
+    Each bucket is a single float in a dict, so a check is one read and one
+    write with no lock. Two threads racing on the same key can both be
+    admitted from the last token; the limiter may over-admit by that much
+    but never rejects a request that had capacity.
+    """
+
+    def __init__(self):
+        self._tats = {}
+        self._hits = 0
+
+    def peek(self, key, rate, burst, cost=1, now=None):
+        """What hit would answer, without charging the bucket"""
+        now = time.monotonic() if now is None else now
+        interval = 1.0 / rate
+        allow_at = max(self._tats.get(key, now), now) + cost * interval - burst * interval
+        if now < allow_at:
+            return RateLimitResult(False, allow_at - now, 0)
+        return RateLimitResult(True, 0.0, int((now - allow_at) / interval))
+
+    def hit(self, key, rate, burst, cost=1, now=None):
+        now = time.monotonic() if now is None else now
+        interval = 1.0 / rate
+        new_tat = max(self._tats.get(key, now), now) + cost * interval
+        allow_at = new_tat - burst * interval
+        if now < allow_at:
+            return RateLimitResult(False, allow_at - now, 0)
+        self._tats[key] = new_tat
+
+        self._hits += 1
+        if self._hits % PRUNE_EVERY == 0:
+            self.prune(now)
+        return RateLimitResult(True, 0.0, int((now - allow_at) / interval))
+
+    def prune(self, now=None):
+        """Forget buckets that have refilled completely"""
+        now = time.monotonic() if now is None else now
+        for key, tat in list(self._tats.items()):
+            if tat <= now:
+                self._tats.pop(key, None)
+
+    def __len__(self):
+        return len(self._tats)
+
+
+class SQLiteRateLimitStore:
+    """Buckets shared by every process pointed at the same SQLite file
+
+    The check-and-update is one UPSERT ... RETURNING, so concurrent web and
+    worker processes see a single consistent bucket per key.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._hits = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS rate_limit (key TEXT PRIMARY KEY, tat REAL NOT NULL) WITHOUT ROWID'
+        )
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            self._local.conn = conn
+        return conn
+
+    def peek(self, key, rate, burst, cost=1, now=None):
+        """What hit would answer, without charging the bucket"""
+        now = time.time() if now is None else now
+        interval = 1.0 / rate
+        row = self._connection().execute('SELECT tat FROM rate_limit WHERE key = ?', (key,)).fetchone()
+        allow_at = max(row[0] if row else now, now) + cost * interval - burst * interval
+        if now < allow_at:
+            return RateLimitResult(False, allow_at - now, 0)
+        return RateLimitResult(True, 0.0, int((now - allow_at) / interval))
+
+    def hit(self, key, rate, burst, cost=1, now=None):
+        # Wall-clock time, since the value is compared across processes
+        now = time.time() if now is None else now
+        interval = 1.0 / rate
+        params = {'key': key, 'now': now, 'increment': cost * interval, 'window': burst * interval}
+        conn = self._connection()
+        row = conn.execute(
+            'INSERT INTO rate_limit (key, tat) VALUES (:key, :now + :increment) '
+            'ON CONFLICT (key) DO UPDATE SET tat = max(tat, :now) + :increment '
+            'WHERE max(tat, :now) + :increment - :window <= :now '
+            'RETURNING tat',
+            params
+        ).fetchone()
+        if row is None:
+            tat = conn.execute('SELECT tat FROM rate_limit WHERE key = ?', (key,)).fetchone()[0]
+            return RateLimitResult(False, max(tat, now) + params['increment'] - params['window'] - now, 0)
+
+        self._hits += 1
+        if self._hits % PRUNE_EVERY == 0:
+            self.prune(now)
+        return RateLimitResult(True, 0.0, int((now - (row[0] - params['window'])) / interval))
+
+    def prune(self, now=None):
+        now = time.time() if now is None else now
+        self._connection().execute('DELETE FROM rate_limit WHERE tat <= ?', (now,))
+
+
+def route_class(endpoint, method):
+    if endpoint in ENDPOINT_CLASSES:
+        return ENDPOINT_CLASSES[endpoint]
+    return 'read' if method in ('GET', 'HEAD') else 'write'
+
+
+def request_user_id():
+    """Best-effort acting user: the viewer_id argument or a user field in the JSON body
+
+    URL path arguments name the user being read or changed, not the caller, so they never pick a bucket.
+    """
+    if request.args.get('viewer_id'):
+        return request.args['viewer_id']
+    data = request.get_json(silent=True) if request.is_json else None
+    if isinstance(data, dict):
+        for field in USER_ID_FIELDS:
+            if data.get(field) is not None:
+                return data[field]
+    return None
+
+
+def batch_charges(app):
+    """(route class, viewer_id) of every sub-request in a /api/batch body"""
+    # Imported here: the batch route's body parsing decides what actually runs
+    from src.routes.batch import parse_subrequests
+
+    try:
+        subrequests = parse_subrequests(request.get_json(silent=True), app.config.get('BATCH_MAX_REQUESTS', 20))
+    except ValueError:
+        return []
+    adapter = app.url_map.bind('localhost')
+    charges = []
+    for _, path in subrequests:
+        url = urlsplit(path)
+        try:
+            endpoint = adapter.match(url.path, method='GET')[0]
+        except HTTPException:
+            endpoint = None
+        charges.append((route_class(endpoint, 'GET'), parse_qs(url.query).get('viewer_id', [None])[0]))
+    return charges
+
+
+class RateLimiter:
+    def __init__(self, store, limits=None):
+        self.store = store
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+
+    def check(self, charges):
+        """Charge buckets for [(route class, [(scope, identity)], cost)] only if every one of them has room
+
+        Returns (route class, scope, result) for the first bucket without room,
+        or (None, None, None) once all of them were charged. A bucket drained by
+        another request between the look and the charge can still reject after
+        earlier buckets were charged; that only happens under a race.
+        """
+        costs = Counter()
+        buckets = {}
+        for route_class, identities, cost in charges:
+            if route_class not in self.limits:
+                continue
+            for scope, identity in identities:
+                key = f'{route_class}:{scope}:{identity}'
+                costs[key] += cost
+                buckets[key] = (route_class, scope)
+        for method in (self.store.peek, self.store.hit):
+            for key, cost in costs.items():
+                route_class, scope = buckets[key]
+                result = method(key, *self.limits[route_class], cost)
+                if not result.allowed:
+                    return route_class, scope, result
+        return None, None, None
+
+
+def create_store(path):
+    return SQLiteRateLimitStore(path) if path else MemoryRateLimitStore()
+
+
+def init_rate_limit(app):
+    """Throttle /api requests with token buckets per IP and per user"""
+    app.config.setdefault('RATE_LIMIT_ENABLED', True)
+    app.config.setdefault('RATE_LIMITS', DEFAULT_LIMITS)
+    app.config.setdefault('RATE_LIMIT_STORE', None)
+
+    limiter = RateLimiter(create_store(app.config['RATE_LIMIT_STORE']), app.config['RATE_LIMITS'])
+    app.extensions['rate_limiter'] = limiter
+    if not app.config['RATE_LIMIT_ENABLED']:
+        return limiter
+
+    @app.before_request
+    def enforce_rate_limit():
+        if not request.path.startswith('/api/') or request.method == 'OPTIONS':
+            return None
+        limit_class = route_class(request.endpoint, request.method)
+        ip = request.remote_addr or 'unknown'
+        user_id = request_user_id()
+        # (route class, acting user) -> requests to charge
+        charges = Counter({(limit_class, user_id): 1})
+        if request.endpoint == 'batch.batch':
+            # Each sub-request also costs what it would on its own, so batching doesn't get around the read limits
+            subrequests = batch_charges(app)
+            charges.update((sub_class, viewer_id or user_id) for sub_class, viewer_id in subrequests)
+            # More sub-requests of one class than its burst could never be admitted, however long the client waits
+            for sub_class, count in Counter(sub_class for sub_class, _ in subrequests).items():
+                if sub_class in limiter.limits and count > limiter.limits[sub_class][1]:
+                    return jsonify({
+                        'error': f'A batch can hold at most {limiter.limits[sub_class][1]} {sub_class} requests; '
+                                 f'this one has {count}'
+                    }), 400
+
+        limit_class, scope, result = limiter.check([
+            (charge_class, [('ip', ip)] + ([('user', charge_user)] if charge_user is not None else []), cost)
+            for (charge_class, charge_user), cost in charges.items()
+        ])
+        if result is None:
+            return None
+        throttled_requests.inc(route_class=limit_class, scope=scope)
+        retry_after = max(1, math.ceil(result.retry_after))
+        response = jsonify({'error': 'Too many requests', 'retry_after': retry_after})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(retry_after)
+        return response
+
+    return limiter
@@ -0,0 +1,201 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+import time
+
+from flask import Response, request
+from werkzeug.wsgi import wrap_file
+
+from src.middleware.compression import accepted_encodings
+
+try:
+    import brotli
+except ImportError:  # optional: pre-built .br files are still served without it
+    brotli = None
+
+# Vite emits bundles and imported files as assets/name-<8 char hash>.ext; files copied from public/ keep their names
+HASHED_ASSET_PATTERN = re.compile(r'^assets/(.+/)?[^/]+-[A-Za-z0-9_-]{8}\.(js|css|woff2?|png|jpe?g|svg|webp|gif|ico|map)$')
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml',
+                      'application/xml', 'application/manifest+json', 'image/x-icon', 'image/vnd.microsoft.icon')
+PRECOMPRESSED_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+ONE_YEAR = 365 * 24 * 60 * 60
+
+
+class StaticAsset:
+    """One file from the static folder, with its identity bytes and compressed encodings cached"""
+
+    __slots__ = ('path', 'mtime', 'size', 'mimetype', 'etag', 'immutable', 'encodings')
+
+    def __init__(self, rel_path, path, max_cached_size, compress):
+        stat = os.stat(path)
+        self.path = path
+        self.mtime = stat.st_mtime
+        self.size = stat.st_size
+        self.mimetype = mimetypes.guess_type(rel_path)[0] or 'application/octet-stream'
+        self.immutable = bool(HASHED_ASSET_PATTERN.search(rel_path))
+        # encoding -> bytes held in memory, or None when the file is streamed from disk
+        self.encodings = {}
+
+        with open(path, 'rb') as f:
+            data = f.read() if self.size <= max_cached_size else None
+        if data is not None:
+            self.etag = hashlib.sha1(data).hexdigest()[:20]
+            self.encodings['identity'] = data
+        else:
+            self.etag = f'{int(self.mtime)}-{self.size}'
+            self.encodings['identity'] = None
+
+        for encoding, suffix in PRECOMPRESSED_SUFFIXES.items():
+            if os.path.exists(path + suffix):
+                with open(path + suffix, 'rb') as f:
+                    self.encodings[encoding] = f.read()
+
+        if data is not None and compress and self.mimetype.startswith(COMPRESSIBLE_TYPES) and self.size > 256:
+            if 'gzip' not in self.encodings:
+                self.encodings['gzip'] = gzip.compress(data, compresslevel=9, mtime=0)
+            if 'br' not in self.encodings and brotli is not None:
+                self.encodings['br'] = brotli.compress(data, quality=11)
+            # Drop encodings that do not actually save bytes
+            for encoding in ('gzip', 'br'):
+                if encoding in self.encodings and len(self.encodings[encoding]) >= self.size:
+                    del self.encodings[encoding]
+
+    def is_stale(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return True
+        return stat.st_mtime != self.mtime or stat.st_size != self.size
+
+
+class StaticIndex:
+    """In-memory index of the static folder built once at startup
+
+    With reload enabled, entries are re-stat'ed on access and the folder is
+    rescanned (at most once per reload_interval) when a path is missing, so
+    a rebuilt frontend is picked up without restarting the server.
+    """
+
+    def __init__(self, root, reload=False, reload_interval=1.0, max_cached_size=4 * 1024 * 1024, compress=True):
+        self.root = os.path.abspath(root)
+        self.reload = reload
+        self.reload_interval = reload_interval
+        self.max_cached_size = max_cached_size
+        self.compress = compress
+        self._assets = {}
+        self._lock = threading.Lock()
+        self._last_scan = 0.0
+        self.scan()
+
+    def _load(self, rel_path):
+        try:
+            return StaticAsset(rel_path, os.path.join(self.root, rel_path), self.max_cached_size, self.compress)
+        except FileNotFoundError:
+            return None
+
+    def scan(self):
+        assets = {}
+        if os.path.isdir(self.root):
+            for dirpath, _, filenames in os.walk(self.root):
+                for filename in filenames:
+                    if filename.endswith(tuple(PRECOMPRESSED_SUFFIXES.values())):
+                        continue
+                    rel_path = os.path.relpath(os.path.join(dirpath, filename), self.root).replace(os.sep, '/')
+                    asset = self._load(rel_path)
+                    if asset is not None:
+                        assets[rel_path] = asset
+        with self._lock:
+            self._assets = assets
+            self._last_scan = time.monotonic()
+
+    def get(self, rel_path):
+        asset = self._assets.get(rel_path)
+        if not self.reload:
+            return asset
+        if asset is not None and asset.is_stale():
+            asset = self._load(rel_path)
+            with self._lock:
+                if asset is None:
+                    self._assets.pop(rel_path, None)
+                else:
+                    self._assets[rel_path] = asset
+        elif asset is None and time.monotonic() - self._last_scan > self.reload_interval:
+            self.scan()
+            asset = self._assets.get(rel_path)
+        return asset
+
+    def __len__(self):
+        return len(self._assets)
+
+
+def _preferred_encoding(asset, accept_encoding):
+    """Pick br over gzip when the client accepts it and a variant exists"""
+    if request.headers.get('Range'):
+        # Byte ranges are only served against the identity representation
+        return 'identity'
+    accepted = accepted_encodings(accept_encoding)
+    for encoding in ('br', 'gzip'):
+        if encoding in asset.encodings and encoding in accepted:
+            return encoding
+    return 'identity'
+
+
+def asset_response(asset):
+    """Build a conditional, range-capable response for an indexed asset"""
+    encoding = _preferred_encoding(asset, request.headers.get('Accept-Encoding', ''))
+    data = asset.encodings[encoding]
+    if data is None:
+        # Large identity file that is not held in memory
+        body = wrap_file(request.environ, open(asset.path, 'rb'))
+        response = Response(body, mimetype=asset.mimetype, direct_passthrough=True)
+        response.content_length = asset.size
+        complete_length = asset.size
+    else:
+        response = Response(data, mimetype=asset.mimetype)
+        complete_length = len(data)
+
+    response.set_etag(asset.etag if encoding == 'identity' else f'{asset.etag}-{encoding}')
+    response.last_modified = asset.mtime
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    if len(asset.encodings) > 1:
+        response.vary.add('Accept-Encoding')
+    if asset.immutable:
+        response.cache_control.public = True
+        response.cache_control.max_age = ONE_YEAR
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+
+    return response.make_conditional(request.environ, accept_ranges=True, complete_length=complete_length)
+
+
+def init_static(app):
+    """Serve the built SPA from an in-memory index with precompressed variants"""
+    app.config.setdefault('STATIC_RELOAD', app.debug)
+    app.config.setdefault('STATIC_MAX_CACHED_SIZE', 4 * 1024 * 1024)
+
+    index = None
+    if app.static_folder is not None:
+        index = StaticIndex(app.static_folder, reload=app.config['STATIC_RELOAD'],
+                            max_cached_size=app.config['STATIC_MAX_CACHED_SIZE'])
+    app.extensions['static_index'] = index
+
+    def serve(path):
+        index = app.extensions['static_index']
+        if index is None:
+            return "Static folder not configured", 404
+        asset = index.get(path) if path else None
+        if asset is None:
+            # Client-side routes fall back to the SPA entry point
+            asset = index.get('index.html')
+            if asset is None:
+                return "index.html not found", 404
+        return asset_response(asset)
+
+    app.add_url_rule('/', 'serve', serve, defaults={'path': ''})
+    app.add_url_rule('/<path:path>', 'serve', serve)
+    return index
@@ -0,0 +1,48 @@
+from datetime import datetime
+from src.models.user import db
+
+class EngagementEvent(db.Model):
+    """Append-only log of event page views and search impressions"""
+    __tablename__ = 'engagement_event'
+    # Ids must never be reused: the rollup watermark counts every id up to it as already folded
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, nullable=False)
+    kind = db.Column(db.String(20), nullable=False)  # view, impression
+    occurred_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<EngagementEvent {self.kind} Event:{self.event_id}>'
+
+class EventDailyStats(db.Model):
+    """Per-event, per-day engagement totals rolled up from the log"""
+    __tablename__ = 'event_daily_stats'
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
+    day = db.Column(db.String(10), nullable=False)  # YYYY-MM-DD (UTC)
+    views = db.Column(db.Integer, nullable=False, default=0)
+    impressions = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('event_id', 'day', name='unique_event_day_stats'),
+        db.Index('ix_event_daily_stats_day', 'day'),
+    )
+
+    def __repr__(self):
+        return f'<EventDailyStats Event:{self.event_id} {self.day}>'
+
+    def to_dict(self):
+        return {
+            'day': self.day,
+            'views': self.views,
+            'impressions': self.impressions
+        }
+
+class RollupWatermark(db.Model):
+    """Highest log id already folded into the rollup tables"""
+    __tablename__ = 'rollup_watermark'
+
+    name = db.Column(db.String(50), primary_key=True)
+    last_id = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,62 @@
+from datetime import datetime
+from src.models.user import db
+
+class EventSignature(db.Model):
+    """MinHash signature of an event's title, description and location"""
+    __tablename__ = 'event_signature'
+
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), primary_key=True)
+    signature = db.Column(db.LargeBinary, nullable=False)  # uint32 minimum hashes, see src/services/dedup.py
+    date_key = db.Column(db.String(50), nullable=False)  # normalized event date; duplicates share it
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<EventSignature Event:{self.event_id}>'
+
+class EventBand(db.Model):
+    """One LSH band of an event's signature; events sharing any (band, bucket) are duplicate candidates"""
+    __tablename__ = 'event_band'
+
+    # Primary key order puts bucket first so lookups by bucket use its index
+    bucket = db.Column(db.BigInteger, primary_key=True)
+    band = db.Column(db.SmallInteger, primary_key=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), primary_key=True)
+
+    __table_args__ = (
+        db.Index('ix_event_band_event_id', 'event_id'),
+    )
+
+    def __repr__(self):
+        return f'<EventBand Event:{self.event_id} {self.band}:{self.bucket}>'
+
+class DuplicateCandidate(db.Model):
+    """A pair of events whose signatures are similar enough to review"""
+    __tablename__ = 'duplicate_candidate'
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)  # the newer event
+    duplicate_of_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
+    similarity = db.Column(db.Float, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, merged, dismissed
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    resolved_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('event_id', 'duplicate_of_id', name='unique_duplicate_pair'),
+        db.Index('ix_duplicate_candidate_status', 'status'),
+        db.Index('ix_duplicate_candidate_duplicate_of_id', 'duplicate_of_id'),
+    )
+
+    def __repr__(self):
+        return f'<DuplicateCandidate Event:{self.event_id} of {self.duplicate_of_id}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'event_id': self.event_id,
+            'duplicate_of_id': self.duplicate_of_id,
+            'similarity': round(self.similarity, 3),
+            'status': self.status,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'resolved_at': self.resolved_at.isoformat() if self.resolved_at else None
+        }
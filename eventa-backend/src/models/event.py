@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from src.models.user import db
+from src.services.images import image_variant_urls
 
 class Event(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -9,16 +10,34 @@ class Event(db.Model):
     date = db.Column(db.String(50), nullable=False)
     time = db.Column(db.String(50), nullable=False)
     location = db.Column(db.String(200), nullable=False)
-    price = db.Column(db.String(20), nullable=False, default='Free')
+    price = db.Column(db.String(20), nullable=False, default='Free')  # display string; parsed into price_cents
+    price_cents = db.Column(db.Integer, nullable=True, index=True)  # NULL when price can't be parsed
+    currency = db.Column(db.String(3), nullable=True)
     image_url = db.Column(db.String(500), nullable=True)
     category = db.Column(db.String(50), nullable=False)
-    organizer_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    organizer_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     organizer_name = db.Column(db.String(100), nullable=False)
     attendees_count = db.Column(db.Integer, default=0)
     helpers_needed = db.Column(db.Boolean, default=False)
     visibility = db.Column(db.String(20), default='public')  # public, private, invite-only
+    # Recurring series: the rule lives on the series row; see src/services/recurrence.py
+    recurrence_rule = db.Column(db.String(200), nullable=True)
+    recurrence_exdates = db.Column(db.Text, nullable=True)  # comma-separated YYYY-MM-DD of cancelled occurrences
+    # Set on an occurrence stored as its own row because it was overridden or RSVP'd to
+    series_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=True)
+    occurrence_date = db.Column(db.String(10), nullable=True)  # YYYY-MM-DD
+    occurrence_overrides = db.Column(db.String(500), nullable=True)  # comma-separated fields not inherited from the series
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Bumped by every ORM update, which only applies if the row still has the version it was read at
+    version = db.Column(db.Integer, nullable=False, default=1)
+
+    # AUTOINCREMENT: ids of archived events must never be given to new ones (see src/services/archive.py)
+    __table_args__ = (
+        db.Index('ix_event_series_occurrence', 'series_id', 'occurrence_date', unique=True),
+        {'sqlite_autoincrement': True},
+    )
+    __mapper_args__ = {'version_id_col': version}
 
     # Relationships
     organizer = db.relationship('User', backref=db.backref('organized_events', lazy=True))
@@ -37,28 +56,35 @@ class Event(db.Model):
             'time': self.time,
             'location': self.location,
             'price': self.price,
+            'price_cents': self.price_cents,
+            'currency': self.currency,
             'image_url': self.image_url,
+            'image_variants': image_variant_urls(self.image_url),
             'category': self.category,
             'organizer_id': self.organizer_id,
             'organizer_name': self.organizer_name,
             'attendees_count': self.attendees_count,
             'helpers_needed': self.helpers_needed,
             'visibility': self.visibility,
+            'recurrence_rule': self.recurrence_rule,
+            'series_id': self.series_id,
+            'occurrence_date': self.occurrence_date,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'version': self.version
         }
 
 class RSVP(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False, index=True)
     status = db.Column(db.String(20), default='interested')  # interested, going, not_going
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # Relationships
     user = db.relationship('User', backref=db.backref('rsvps', lazy=True))
 
-    __table_args__ = (db.UniqueConstraint('user_id', 'event_id', name='unique_user_event_rsvp'),)
+    __table_args__ = (db.UniqueConstraint('user_id', 'event_id', name='unique_user_event_rsvp'), {'sqlite_autoincrement': True})
 
     def __repr__(self):
         return f'<RSVP User:{self.user_id} Event:{self.event_id} Status:{self.status}>'
@@ -73,8 +99,10 @@ class RSVP(db.Model):
         }
 
 class HelperRequest(db.Model):
+    __table_args__ = {'sqlite_autoincrement': True}
+
     id = db.Column(db.Integer, primary_key=True)
-    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False, index=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=True)
     helpers_needed = db.Column(db.Integer, default=1)
@@ -113,7 +141,8 @@ class HelperApplication(db.Model):
     # Relationships
     user = db.relationship('User', backref=db.backref('helper_applications', lazy=True))
 
-    __table_args__ = (db.UniqueConstraint('helper_request_id', 'user_id', name='unique_user_helper_application'),)
+    __table_args__ = (db.UniqueConstraint('helper_request_id', 'user_id', name='unique_user_helper_application'),
+                      {'sqlite_autoincrement': True})
 
     def __repr__(self):
         return f'<HelperApplication User:{self.user_id} Request:{self.helper_request_id}>'
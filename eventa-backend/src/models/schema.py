@@ -0,0 +1,90 @@
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateTable
+
+from src.models.user import db
+from src.services.pricing import backfill_event_prices
+
+def backfill_versions(conn, table_name):
+    conn.exec_driver_sql(f'UPDATE {table_name} SET version = 1 WHERE version IS NULL')
+
+# Run once when the column is added to an existing table: (table, column) -> function(connection, table name)
+BACKFILLS = {
+    ('event', 'price_cents'): backfill_event_prices,
+    ('event', 'version'): backfill_versions,
+}
+
+def add_missing_columns(engine, tables):
+    """ALTER TABLE ADD COLUMN for model columns an existing table lacks, then backfill them"""
+    inspector = inspect(engine)
+    added = []
+    with engine.begin() as conn:
+        for table in tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}')
+                    added.append((table.name, column.name))
+        for table_name, column_name in added:
+            if (table_name, column_name) in BACKFILLS:
+                BACKFILLS[(table_name, column_name)](conn, table_name)
+    return added
+
+def use_autoincrement(engine, tables):
+    """Rebuild tables declared sqlite_autoincrement=True that were created without it
+
+    Without AUTOINCREMENT, SQLite gives the ids of deleted rows at the top of a
+    table to new rows. Rows are copied into a fresh table, so the sequence then
+    starts above the highest id kept; raise_sequence() covers ids deleted before.
+    """
+    if engine.dialect.name != 'sqlite':
+        return []
+    rebuilt = []
+    with engine.begin() as conn:
+        for table in tables:
+            if not table.dialect_options['sqlite']['autoincrement']:
+                continue
+            sql = conn.exec_driver_sql(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table.name,)
+            ).scalar()
+            if sql is None or 'AUTOINCREMENT' in sql.upper():
+                continue
+            existing = {row[1] for row in conn.exec_driver_sql(f'PRAGMA table_info("{table.name}")')}
+            columns = ', '.join(f'"{column.name}"' for column in table.columns if column.name in existing)
+            staging = f'_rebuild_{table.name}'
+            ddl = str(CreateTable(table).compile(dialect=engine.dialect)).replace(
+                engine.dialect.identifier_preparer.format_table(table), f'"{staging}"', 1)
+            conn.exec_driver_sql(f'DROP TABLE IF EXISTS "{staging}"')
+            conn.exec_driver_sql(ddl)
+            conn.exec_driver_sql(f'INSERT INTO "{staging}" ({columns}) SELECT {columns} FROM "{table.name}"')
+            # Indexes go with the old table; upgrade_schema creates them again
+            conn.exec_driver_sql(f'DROP TABLE "{table.name}"')
+            conn.exec_driver_sql(f'ALTER TABLE "{staging}" RENAME TO "{table.name}"')
+            rebuilt.append(table.name)
+    return rebuilt
+
+def raise_sequence(conn, table_name, floor):
+    """Make an AUTOINCREMENT table hand out ids above floor from now on"""
+    if not floor:
+        return
+    updated = conn.exec_driver_sql(
+        'UPDATE sqlite_sequence SET seq = max(seq, ?) WHERE name = ?', (floor, table_name)
+    ).rowcount
+    if not updated:
+        conn.exec_driver_sql('INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)', (table_name, floor))
+
+def upgrade_schema(engine=None):
+    """Bring an existing database up to date with the models
+
+    db.create_all() only creates missing tables, so columns and indexes added
+    to models after a table already exists are created here, and tables that
+    gained AUTOINCREMENT are rebuilt.
+    """
+    engine = engine or db.engine
+    add_missing_columns(engine, db.metadata.sorted_tables)
+    use_autoincrement(engine, db.metadata.sorted_tables)
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
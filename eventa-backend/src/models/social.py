@@ -5,7 +5,7 @@ from src.models.user import db
 class Friendship(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     requester_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    addressee_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    addressee_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     status = db.Column(db.String(20), default='pending')  # pending, accepted, blocked
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -30,12 +30,15 @@ class Friendship(db.Model):
         }
 
 class Message(db.Model):
+    # Archived messages keep their ids, so they must never be reused
+    __table_args__ = {'sqlite_autoincrement': True}
+
     id = db.Column(db.Integer, primary_key=True)
     sender_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    recipient_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    recipient_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     content = db.Column(db.Text, nullable=False)
     message_type = db.Column(db.String(20), default='text')  # text, image, event_invite
-    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=True)  # for event invites
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=True, index=True)  # for event invites
     is_read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
@@ -62,14 +65,14 @@ class Message(db.Model):
 class Bookmark(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # Relationships
     user = db.relationship('User', backref=db.backref('bookmarks', lazy=True))
     event = db.relationship('Event', backref=db.backref('bookmarked_by', lazy=True))
 
-    __table_args__ = (db.UniqueConstraint('user_id', 'event_id', name='unique_user_event_bookmark'),)
+    __table_args__ = (db.UniqueConstraint('user_id', 'event_id', name='unique_user_event_bookmark'), {'sqlite_autoincrement': True})
 
     def __repr__(self):
         return f'<Bookmark User:{self.user_id} Event:{self.event_id}>'
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+List, verify and restore database snapshots taken by src/backup_database.py
+or the scheduled backup job
+
+Restoring replaces the database file, so stop the app and job workers first.
+The snapshot is checked against its manifest (SHA-256, integrity_check, row
+counts) before anything is touched, and the database it replaces is kept
+next to it as <name>.before-restore-<UTC time>. A snapshot taken with an
+archive database copy restores the archive database as well, so the two
+stay a matching pair.
+
+Usage:
+    python src/restore_backup.py --list
+    python src/restore_backup.py --verify app-20250701T030000Z.db
+    python src/restore_backup.py app-20250701T030000Z.db
+    python src/restore_backup.py --latest --database /srv/eventa/app.db --archive-database /srv/eventa/archive.db
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+# Not src.main: importing the app opens the database this may be replacing
+from src.services.backup import BackupError, archive_snapshot_path, database_path, list_snapshots, verify_snapshot
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_manifest(snapshot):
+    manifest_path = snapshot[:-3] + '.json'
+    if not os.path.exists(manifest_path):
+        raise BackupError(f'{snapshot} has no manifest at {manifest_path}')
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def verify_pair(snapshot, manifest):
+    """Verify a snapshot and its archive database copy, if it has one; returns {snapshot path: row counts}"""
+    checked = {snapshot: verify_snapshot(snapshot, manifest)}
+    if 'archive' in manifest:
+        archive = archive_snapshot_path(snapshot)
+        if not os.path.exists(archive):
+            raise BackupError(f'{snapshot} was taken with an archive database copy, but {archive} is missing')
+        checked[archive] = verify_snapshot(archive, manifest['archive'])
+    return checked
+
+
+def _put_in_place(staging, target, stamp):
+    moved_to = None
+    if os.path.exists(target):
+        moved_to = f'{target}.before-restore-{stamp}'
+        os.replace(target, moved_to)
+    # A WAL left by the old database would be replayed into the restored one
+    for suffix in ('-wal', '-shm', '-journal'):
+        if os.path.exists(target + suffix):
+            os.replace(target + suffix, (moved_to or target) + suffix)
+    os.replace(staging, target)
+    return moved_to
+
+
+def restore(snapshot, target, archive_target=None):
+    """Replace target, and archive_target when the snapshot has an archive database copy, with verified copies
+
+    Returns [(database replaced, snapshot it was restored from, where the old database was moved)].
+    """
+    manifest = load_manifest(snapshot)
+    verify_pair(snapshot, manifest)
+    pairs = [(snapshot, manifest, target)]
+    if 'archive' in manifest:
+        if archive_target is None:
+            raise BackupError(f'{snapshot} includes the archive database; name the archive database to replace')
+        pairs.append((archive_snapshot_path(snapshot), manifest['archive'], archive_target))
+
+    # Both copies are staged and checked before either database is replaced
+    staged = []
+    for source, entry, destination in pairs:
+        staging = destination + '.restoring'
+        shutil.copyfile(source, staging)
+        verify_snapshot(staging, entry)
+        staged.append((source, staging, destination))
+    stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+    return [(destination, source, _put_in_place(staging, destination, stamp)) for source, staging, destination in staged]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Restore the app database from a snapshot')
+    parser.add_argument('snapshot', nargs='?', help='Snapshot file, or its name inside the backup directory')
+    parser.add_argument('--latest', action='store_true', help='Use the newest snapshot')
+    parser.add_argument('--list', action='store_true', help='List snapshots and exit')
+    parser.add_argument('--verify', action='store_true', help='Only verify the snapshot')
+    parser.add_argument('--backup-dir', default=os.environ.get('EVENTA_BACKUP_DIR', os.path.join(SRC_DIR, 'database', 'backups')))
+    parser.add_argument('--database', help='Database file to replace (default: from EVENTA_DATABASE_URI)')
+    parser.add_argument('--archive-database', default=os.environ.get('EVENTA_ARCHIVE_DATABASE', os.path.join(SRC_DIR, 'database', 'archive.db')),
+                        help='Archive database file to replace when the snapshot includes one')
+    args = parser.parse_args(argv)
+
+    snapshots = list_snapshots(args.backup_dir)
+    if args.list:
+        for path in snapshots:
+            manifest = load_manifest(path) if os.path.exists(path[:-3] + '.json') else {}
+            print(f"{os.path.basename(path)}  {os.path.getsize(path) / 1024 / 1024:10.1f} MB  "
+                  f"{sum(manifest.get('tables', {}).values()):>12} rows  {manifest.get('method', '?')}"
+                  f"{'  +archive' if 'archive' in manifest else ''}")
+        return
+
+    if args.latest:
+        if not snapshots:
+            parser.error(f'No snapshots in {args.backup_dir}')
+        snapshot = snapshots[-1]
+    elif args.snapshot:
+        snapshot = args.snapshot if os.path.exists(args.snapshot) else os.path.join(args.backup_dir, args.snapshot)
+    else:
+        parser.error('Name a snapshot or pass --latest or --list')
+
+    try:
+        if args.verify:
+            for path, counts in verify_pair(snapshot, load_manifest(snapshot)).items():
+                print(f'{path} is intact: {sum(counts.values())} rows in {len(counts)} tables')
+            return
+        target = args.database or database_path(os.environ.get(
+            'EVENTA_DATABASE_URI', f"sqlite:///{os.path.join(SRC_DIR, 'database', 'app.db')}"
+        ))
+        restored = restore(snapshot, target, args.archive_database)
+    except BackupError as error:
+        sys.exit(f'Restore failed: {error}')
+    for database, source, moved_to in restored:
+        print(f'Restored {database} from {source}' + (f'; previous database kept at {moved_to}' if moved_to else ''))
+    if len(restored) == 1:
+        print(f'{snapshot} has no archive database copy; {args.archive_database} was left as it is')
+
+
+if __name__ == '__main__':
+    main()
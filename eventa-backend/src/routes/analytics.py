@@ -0,0 +1,16 @@
+from flask import Blueprint, jsonify, request
+from flask_cors import cross_origin
+from src.models.user import User
+from src.services.analytics import organizer_engagement
+
+analytics_bp = Blueprint('analytics', __name__)
+
+@analytics_bp.route('/users/<int:user_id>/analytics', methods=['GET'])
+@cross_origin()
+def get_organizer_analytics(user_id):
+    """Get daily views and search impressions for the events a user organizes"""
+    User.query.get_or_404(user_id)
+    days = request.args.get('days', 30, type=int)
+    if days is None or not 1 <= days <= 365:
+        return jsonify({'error': 'days must be between 1 and 365'}), 400
+    return jsonify(organizer_engagement(user_id, days))
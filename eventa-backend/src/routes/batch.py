@@ -0,0 +1,124 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Blueprint, Response, current_app, jsonify, request
+from flask_cors import cross_origin
+from werkzeug.exceptions import HTTPException
+
+from src.models.user import db
+
+batch_bp = Blueprint('batch', __name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor(max_workers):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='eventa-batch')
+        return _executor
+
+
+def parse_subrequests(data, max_requests):
+    """Normalize the batch body into (id, path) pairs, or raise ValueError"""
+    if not isinstance(data, dict) or not isinstance(data.get('requests'), list):
+        raise ValueError('Body must be an object with a requests list')
+    items = data['requests']
+    if not items:
+        raise ValueError('requests must not be empty')
+    if len(items) > max_requests:
+        raise ValueError(f'At most {max_requests} requests per batch')
+
+    subrequests = []
+    for index, item in enumerate(items):
+        if isinstance(item, str):
+            item = {'path': item}
+        if not isinstance(item, dict) or not isinstance(item.get('path'), str):
+            raise ValueError(f'requests[{index}] must be a path or an object with a path')
+        if item.get('method', 'GET').upper() != 'GET':
+            raise ValueError(f'requests[{index}]: only GET requests can be batched')
+        path = item['path']
+        if not path.startswith('/api/'):
+            path = '/api/' + path.lstrip('/')
+        if path.split('?', 1)[0].rstrip('/') == '/api/batch':
+            raise ValueError(f'requests[{index}]: batches cannot be nested')
+        subrequests.append((item.get('id', index), path))
+    return subrequests
+
+
+def dispatch_subrequest(app, path, base_url, headers):
+    """Run one GET through the view function in the current app context
+
+    Only the view runs; before/after request hooks belong to the outer batch
+    request. The app context, and so the SQLAlchemy session, is shared with
+    whatever else runs in it.
+    """
+    with app.test_request_context(path, method='GET', base_url=base_url, headers=headers):
+        try:
+            response = app.make_response(app.dispatch_request())
+        except HTTPException as exc:
+            response = jsonify({'error': exc.description})
+            response.status_code = exc.code
+        except Exception:
+            app.logger.exception('Batched request to %s failed', path)
+            db.session.rollback()
+            response = jsonify({'error': 'Internal server error'})
+            response.status_code = 500
+        body = response.get_data()
+        if response.mimetype != 'application/json':
+            body = app.json.dumps(body.decode('utf-8', 'replace')).encode('utf-8')
+        return response.status_code, body or b'null'
+
+
+def _run_group(app, group, base_url, headers):
+    # Worker threads need their own app context, and with it their own session
+    with app.app_context():
+        return [(index, *dispatch_subrequest(app, path, base_url, headers)) for index, path in group]
+
+
+def execute_batch(app, paths, base_url, headers, workers):
+    """Dispatch sub-requests, spreading them over up to `workers` threads
+
+    With one worker everything runs in the caller's session and shares its
+    identity map. With more, sub-requests are split round-robin into groups
+    that each run sequentially in their own session, so SQLite can serve the
+    groups' reads concurrently.
+    """
+    indexed = list(enumerate(paths))
+    if workers <= 1 or len(indexed) == 1:
+        return [dispatch_subrequest(app, path, base_url, headers) for path in paths]
+
+    groups = [indexed[offset::workers] for offset in range(min(workers, len(indexed)))]
+    executor = get_executor(workers)
+    # The first group runs here, in the request's own session, while the rest run in the pool
+    futures = [executor.submit(_run_group, app, group, base_url, headers) for group in groups[1:]]
+    results = [(index, *dispatch_subrequest(app, path, base_url, headers)) for index, path in groups[0]]
+    for future in futures:
+        results.extend(future.result())
+    results.sort(key=lambda result: result[0])
+    return [(status, body) for _, status, body in results]
+
+
+@batch_bp.route('/batch', methods=['POST'])
+@cross_origin()
+def batch():
+    """Run several GET requests in one round trip"""
+    try:
+        subrequests = parse_subrequests(request.get_json(silent=True),
+                                        current_app.config.get('BATCH_MAX_REQUESTS', 20))
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+
+    app = current_app._get_current_object()
+    headers = {name: value for name, value in request.headers.items()
+               if name.lower() in ('accept-language', 'authorization', 'cookie')}
+    results = execute_batch(app, [path for _, path in subrequests], request.host_url,
+                            headers, current_app.config.get('BATCH_WORKERS', 1))
+
+    # Sub-response bodies are already JSON, so they are spliced in rather than re-parsed
+    parts = []
+    for (request_id, _), (status, body) in zip(subrequests, results):
+        parts.append(b'{"id":%s,"status":%d,"body":%s}' % (app.json.dumps(request_id).encode('utf-8'), status, body))
+    return Response(b'{"responses":[' + b','.join(parts) + b']}', mimetype='application/json')
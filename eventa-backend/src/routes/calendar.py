@@ -0,0 +1,17 @@
+from flask import Blueprint, Response, request
+from flask_cors import cross_origin
+from src.services.ical import get_calendar_feeds
+
+calendar_bp = Blueprint('calendar', __name__)
+
+@calendar_bp.route('/calendar/<int:user_id>/<any(going, bookmarks):feed>.ics', methods=['GET'])
+@cross_origin()
+def get_calendar_feed(user_id, feed):
+    """Get an iCalendar feed of the events a user is going to or has bookmarked"""
+    body, etag = get_calendar_feeds().feed(user_id, feed)
+    response = Response(body, mimetype='text/calendar')
+    response.set_etag(etag)
+    # Calendar apps should revalidate every poll; unchanged feeds answer 304
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
@@ -0,0 +1,112 @@
+from datetime import datetime
+from flask import Blueprint, jsonify, request
+from flask_cors import cross_origin
+from src.models.user import db
+from src.models.event import Event
+from src.models.dedup import DuplicateCandidate
+from src.jobs.worker import enqueue_job
+from src.services.dedup import find_duplicates, merge_events
+from src.services.suggest import get_suggest_index
+from src.services.ical import get_calendar_feeds
+from src.services.visibility import event_visibility, viewer_id_from_request
+from src.services.write_buffer import get_write_buffer
+
+dedup_bp = Blueprint('dedup', __name__)
+
+DUPLICATE_STATUSES = ('pending', 'merged', 'dismissed')
+
+def _threshold():
+    threshold = request.args.get('threshold', type=float)
+    if threshold is not None and not 0 < threshold <= 1:
+        return None, (jsonify({'error': 'threshold must be between 0 and 1'}), 400)
+    return threshold, None
+
+@dedup_bp.route('/events/<int:event_id>/duplicates', methods=['GET'])
+@cross_origin()
+def get_event_duplicates(event_id):
+    """Get events that look like near-duplicates of an event, among the events the viewer may see"""
+    visible = event_visibility(Event, viewer_id_from_request())
+    event = Event.query.filter(Event.id == event_id, visible).first_or_404()
+    threshold, error = _threshold()
+    if error:
+        return error
+    matches = find_duplicates(event, threshold)
+    events = {other.id: other for other in Event.query.filter(
+        Event.id.in_([other_id for other_id, _ in matches]), visible)}
+    return jsonify([
+        {'event': events[other_id].to_dict(), 'similarity': round(score, 3)}
+        for other_id, score in matches if other_id in events
+    ])
+
+@dedup_bp.route('/duplicates', methods=['GET'])
+@cross_origin()
+def get_duplicates():
+    """Get flagged duplicate pairs for review, most similar first; events the viewer may not see are null"""
+    status = request.args.get('status', 'pending')
+    if status not in DUPLICATE_STATUSES:
+        return jsonify({'error': f"status must be one of: {', '.join(DUPLICATE_STATUSES)}"}), 400
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    candidates = DuplicateCandidate.query.filter_by(status=status).order_by(
+        DuplicateCandidate.similarity.desc(), DuplicateCandidate.id
+    ).limit(limit).all()
+    event_ids = {candidate.event_id for candidate in candidates} | {candidate.duplicate_of_id for candidate in candidates}
+    events = {event.id: event for event in Event.query.filter(
+        Event.id.in_(event_ids), event_visibility(Event, viewer_id_from_request()))}
+
+    results = []
+    for candidate in candidates:
+        result = candidate.to_dict()
+        result['event'] = events[candidate.event_id].to_dict() if candidate.event_id in events else None
+        result['duplicate_of'] = events[candidate.duplicate_of_id].to_dict() if candidate.duplicate_of_id in events else None
+        results.append(result)
+    return jsonify(results)
+
+@dedup_bp.route('/duplicates/<int:candidate_id>/merge', methods=['POST'])
+@cross_origin()
+def merge_duplicate(candidate_id):
+    """Merge a flagged pair, keeping the older event unless keep_event_id names the other one"""
+    candidate = DuplicateCandidate.query.get_or_404(candidate_id)
+    if candidate.status != 'pending':
+        return jsonify({'error': f'Duplicate pair is already {candidate.status}'}), 400
+    data = request.get_json(silent=True) or {}
+    keep_id = data.get('keep_event_id', candidate.duplicate_of_id)
+    if keep_id not in (candidate.event_id, candidate.duplicate_of_id):
+        return jsonify({'error': 'keep_event_id must be one of the pair'}), 400
+    duplicate_id = candidate.event_id if keep_id == candidate.duplicate_of_id else candidate.duplicate_of_id
+    kept = Event.query.get(keep_id)
+    if kept is None or Event.query.get(duplicate_id) is None:
+        return jsonify({'error': 'One of the events no longer exists'}), 404
+
+    merge_events(keep_id, duplicate_id)
+    db.session.commit()
+    get_write_buffer().recount_attendees(keep_id)
+    get_suggest_index().remove_event(duplicate_id)
+    get_calendar_feeds().invalidate_event(duplicate_id)
+    get_calendar_feeds().invalidate_event(keep_id)
+
+    db.session.refresh(kept)
+    return jsonify(kept.to_dict())
+
+@dedup_bp.route('/duplicates/<int:candidate_id>/dismiss', methods=['POST'])
+@cross_origin()
+def dismiss_duplicate(candidate_id):
+    """Mark a flagged pair as not a duplicate; it is not flagged again"""
+    candidate = DuplicateCandidate.query.get_or_404(candidate_id)
+    if candidate.status != 'pending':
+        return jsonify({'error': f'Duplicate pair is already {candidate.status}'}), 400
+    candidate.status = 'dismissed'
+    candidate.resolved_at = datetime.utcnow()
+    db.session.commit()
+    return jsonify(candidate.to_dict())
+
+@dedup_bp.route('/duplicates/scan', methods=['POST'])
+@cross_origin()
+def scan_for_duplicates():
+    """Queue a scan that signs unindexed events (all events with rebuild) and flags duplicates"""
+    data = request.get_json(silent=True) or {}
+    rebuild = bool(data.get('rebuild', False))
+    job_id = enqueue_job('scan_duplicates', {'rebuild': rebuild}, coalesce_key=f'scan_duplicates:{rebuild}')
+    return jsonify({
+        'message': 'Duplicate scan queued',
+        'job_id': job_id
+    }), 202
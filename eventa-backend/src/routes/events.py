@@ -1,48 +1,78 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, abort, jsonify, request
 from flask_cors import cross_origin
+from sqlalchemy import select
+from sqlalchemy.orm.exc import StaleDataError
 from src.models.user import User, db
 from src.models.event import Event, RSVP, HelperRequest, HelperApplication
-from datetime import datetime
+from src.services.write_buffer import get_write_buffer
+from src.services.analytics import record_view
+from src.services.organizer import organized_event_summaries
+from src.services.archive import archived_events, include_past_requested, merge_sorted
+from src.services.pricing import parse_price
+from src.services.visibility import event_visibility, viewer_id_from_request
+from src.services.facets import event_facets, facets_requested
+from src.services.listing import EventListing
+from src.services.suggest import get_suggest_index
+from src.services.ical import get_calendar_feeds
+from src.services.dedup import check_event, forget_event
+from src.services.recurrence import (MAX_WINDOW_DAYS, cancel_occurrence, delete_series_occurrences, expand_series,
+                                     is_occurrence, materialize_occurrence, occurrence_dates, override_occurrence,
+                                     parse_day, propagate_series_update, requested_window, stored_occurrence,
+                                     validate_series)
+from src.middleware.compression import stream_json_array
+from datetime import date, datetime, timedelta
 
 events_bp = Blueprint('events', __name__)
 
+def _versioned(response, event):
+    """Send the event's version as its ETag, for If-Match on PUT and DELETE"""
+    if event.version is not None:
+        response.set_etag(str(event.version))
+    return response
+
+def _precondition_failed(event_id):
+    """412 carrying the event as it is now, so the client can reapply its change"""
+    event = Event.query.get_or_404(event_id)
+    return _versioned(jsonify({
+        'error': 'Event was changed by someone else; reload it and try again',
+        'event': event.to_dict()
+    }), event), 412
+
+def _if_match_failed(event):
+    # Compression weakens ETags on the way out, so clients may send either form back
+    return bool(request.if_match) and not request.if_match.contains_weak(str(event.version))
+
 @events_bp.route('/events', methods=['GET'])
 @cross_origin()
 def get_events():
     """Get all events with optional filtering"""
-    category = request.args.get('category')
-    search = request.args.get('search')
-    location = request.args.get('location')
-    helpers_needed = request.args.get('helpers_needed')
-    price_filter = request.args.get('price_filter')  # free, paid
-    
-    query = Event.query.filter_by(visibility='public')
-    
-    if category and category != 'all':
-        query = query.filter(Event.category.ilike(f'%{category}%'))
-    
-    if search:
-        query = query.filter(
-            db.or_(
-                Event.title.ilike(f'%{search}%'),
-                Event.description.ilike(f'%{search}%'),
-                Event.location.ilike(f'%{search}%')
-            )
-        )
+    try:
+        listing = EventListing(request.args, viewer_id_from_request())
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
     
-    if location:
-        query = query.filter(Event.location.ilike(f'%{location}%'))
-    
-    if helpers_needed == 'true':
-        query = query.filter(Event.helpers_needed == True)
+    events = db.session.scalars(listing.events_query())
+    occurrences = listing.sort_occurrences(
+        expand_series(db.session.scalars(listing.series_query()).all(), listing.window_start, listing.window_end)
+    )
+    if occurrences:
+        events = merge_sorted(events, occurrences, listing.merge_key, listing.descending)
+    if include_past_requested():
+        events = merge_sorted(events, archived_events(lambda columns: listing.conditions(columns, materialize=True),
+                                                      listing.order_by),
+                              listing.merge_key, listing.descending)
     
-    if price_filter == 'free':
-        query = query.filter(Event.price.ilike('free'))
-    elif price_filter == 'paid':
-        query = query.filter(~Event.price.ilike('free'))
+    if facets_requested():
+        unselected_series = db.session.scalars(listing.series_query(selected=False)).all()
+        facets = event_facets(
+            lambda columns: listing.base_conditions(columns, materialize=columns is not Event),
+            listing.selection, include_past=include_past_requested(),
+            occurrences=expand_series(unselected_series, listing.window_start, listing.window_end)
+        )
+        return stream_json_array(events, listing.serializer(), field='events', extra={'facets': facets})
     
-    events = query.order_by(Event.created_at.desc()).all()
-    return jsonify([event.to_dict() for event in events])
+    # Streamed so the compression middleware can encode it without buffering the whole listing
+    return stream_json_array(events, listing.serializer())
 
 @events_bp.route('/events', methods=['POST'])
 @cross_origin()
@@ -56,57 +86,134 @@ def create_event():
         if field not in data:
             return jsonify({'error': f'Missing required field: {field}'}), 400
     
+    recurrence_rule = data.get('recurrence_rule') or None
+    if recurrence_rule:
+        error = validate_series(recurrence_rule, data['date'])
+        if error:
+            return jsonify({'error': error}), 400
+    
+    price = data.get('price', 'Free')
+    price_cents, currency = parse_price(price)
     event = Event(
         title=data['title'],
         description=data.get('description', ''),
         date=data['date'],
         time=data['time'],
         location=data['location'],
-        price=data.get('price', 'Free'),
+        price=price,
+        price_cents=price_cents,
+        currency=currency,
         image_url=data.get('image_url'),
         category=data['category'],
         organizer_id=data['organizer_id'],
         organizer_name=data['organizer_name'],
         helpers_needed=data.get('helpers_needed', False),
-        visibility=data.get('visibility', 'public')
+        visibility=data.get('visibility', 'public'),
+        recurrence_rule=recurrence_rule
     )
     
     db.session.add(event)
     db.session.commit()
+    get_suggest_index().update_event(event)
+    
+    # Flagged for review rather than rejected; the organizer sees what it resembles
+    duplicates = check_event(event)
+    db.session.commit()
     
-    return jsonify(event.to_dict()), 201
+    result = event.to_dict()
+    result['possible_duplicates'] = [{'event_id': other_id, 'similarity': round(score, 3)} for other_id, score in duplicates]
+    return _versioned(jsonify(result), event), 201
+
+def visible_event_query(event_id, viewer_id):
+    return select(Event).where(Event.id == event_id, event_visibility(Event, viewer_id)).limit(1)
+
+def event_detail_response(event):
+    """Count a view of the event and answer with it, plus the next dates of a recurring series"""
+    record_view(event.id)
+    result = event.to_dict()
+    if event.recurrence_rule:
+        today = date.today()
+        result['next_occurrences'] = [
+            day.isoformat() for day in occurrence_dates(event, today, today + timedelta(days=MAX_WINDOW_DAYS))[:5]
+        ]
+    return _versioned(jsonify(result), event)
 
 @events_bp.route('/events/<int:event_id>', methods=['GET'])
 @cross_origin()
 def get_event(event_id):
     """Get a specific event by ID"""
-    event = Event.query.get_or_404(event_id)
-    return jsonify(event.to_dict())
+    viewer_id = viewer_id_from_request()
+    event = db.session.scalars(visible_event_query(event_id, viewer_id)).first()
+    if event is None and include_past_requested():
+        event = next(archived_events(
+            lambda columns: [columns.id == event_id, event_visibility(columns, viewer_id, materialize=True)],
+            lambda columns: (columns.id,)
+        ), None)
+    if event is None:
+        abort(404)
+    return event_detail_response(event)
 
 @events_bp.route('/events/<int:event_id>', methods=['PUT'])
 @cross_origin()
 def update_event(event_id):
-    """Update an event"""
+    """Update an event; with If-Match, only if it is still at that version"""
     event = Event.query.get_or_404(event_id)
     data = request.json
+    if _if_match_failed(event):
+        return _precondition_failed(event_id)
+    
+    if event.recurrence_rule and ('recurrence_rule' in data or 'date' in data):
+        error = validate_series(data.get('recurrence_rule', event.recurrence_rule), data.get('date', event.date))
+        if error:
+            return jsonify({'error': error}), 400
     
     # Update fields if provided
     for field in ['title', 'description', 'date', 'time', 'location', 'price', 'image_url', 'category', 'helpers_needed', 'visibility']:
         if field in data:
             setattr(event, field, data[field])
+    if 'price' in data:
+        event.price_cents, event.currency = parse_price(event.price)
+    if event.recurrence_rule:
+        if data.get('recurrence_rule'):
+            event.recurrence_rule = data['recurrence_rule']
+        # Stored occurrences follow the series except for the fields they override
+        changed = list(data) + (['price_cents', 'currency'] if 'price' in data else [])
+        propagate_series_update(event, changed)
     
     event.updated_at = datetime.utcnow()
-    db.session.commit()
+    try:
+        # The UPDATE matches only the version read above, so a concurrent edit makes it fail here
+        db.session.commit()
+    except StaleDataError:
+        db.session.rollback()
+        return _precondition_failed(event_id)
+    get_suggest_index().update_event(event)
+    get_calendar_feeds().invalidate_event(event.id, event.series_id)
+    if {'title', 'description', 'location', 'date'} & set(data):
+        check_event(event)
+        db.session.commit()
     
-    return jsonify(event.to_dict())
+    return _versioned(jsonify(event.to_dict()), event)
 
 @events_bp.route('/events/<int:event_id>', methods=['DELETE'])
 @cross_origin()
 def delete_event(event_id):
-    """Delete an event"""
+    """Delete an event; with If-Match, only if it is still at that version"""
     event = Event.query.get_or_404(event_id)
+    if _if_match_failed(event):
+        return _precondition_failed(event_id)
+    series_id = event.series_id
+    if event.recurrence_rule:
+        delete_series_occurrences(event)
+    forget_event(event_id)
     db.session.delete(event)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except StaleDataError:
+        db.session.rollback()
+        return _precondition_failed(event_id)
+    get_suggest_index().remove_event(event_id)
+    get_calendar_feeds().invalidate_event(event_id, series_id)
     return '', 204
 
 @events_bp.route('/events/<int:event_id>/rsvp', methods=['POST'])
@@ -120,6 +227,14 @@ def rsvp_event(event_id):
     if not user_id:
         return jsonify({'error': 'user_id is required'}), 400
     
+    if data.get('occurrence_date'):
+        # RSVPs to one occurrence of a series go to that occurrence's own row, created on first use
+        series = Event.query.get_or_404(event_id)
+        occurrence, error = _series_occurrence(series, data['occurrence_date'])
+        if error:
+            return error
+        event_id = materialize_occurrence(series, occurrence).id
+    
     # Check if RSVP already exists
     existing_rsvp = RSVP.query.filter_by(user_id=user_id, event_id=event_id).first()
     
@@ -129,15 +244,79 @@ def rsvp_event(event_id):
         rsvp = RSVP(user_id=user_id, event_id=event_id, status=status)
         db.session.add(rsvp)
     
-    # Update attendees count
-    event = Event.query.get(event_id)
-    if event:
-        going_count = RSVP.query.filter_by(event_id=event_id, status='going').count()
-        event.attendees_count = going_count
-    
     db.session.commit()
+    get_calendar_feeds().invalidate_user(user_id)
+    
+    # Recounted by the write buffer; one pending recount covers any burst of RSVPs to the event
+    get_write_buffer().recount_attendees(event_id)
+    
+    return jsonify({'message': 'RSVP updated successfully', 'event_id': event_id}), 200
+
+def _series_occurrence(series, value):
+    """Parse an occurrence date of a series, returning (date, None) or (None, error response)"""
+    if not series.recurrence_rule:
+        return None, (jsonify({'error': 'Event is not a recurring series'}), 400)
+    try:
+        day = parse_day(value)
+    except ValueError:
+        return None, (jsonify({'error': 'occurrence_date must be a date like 2025-06-03'}), 400)
+    if not is_occurrence(series, day):
+        return None, (jsonify({'error': f'{value} is not an occurrence of this series'}), 404)
+    return day, None
+
+@events_bp.route('/events/<int:event_id>/occurrences', methods=['GET'])
+@cross_origin()
+def get_occurrences(event_id):
+    """Get the occurrences of a recurring series within a from/to window"""
+    series = Event.query.filter(Event.id == event_id, event_visibility(Event, viewer_id_from_request())).first()
+    if series is None:
+        abort(404)
+    if not series.recurrence_rule:
+        return jsonify({'error': 'Event is not a recurring series'}), 400
+    try:
+        window_start, window_end = requested_window(request.args)
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
     
-    return jsonify({'message': 'RSVP updated successfully'}), 200
+    stored = Event.query.filter(
+        Event.series_id == series.id,
+        Event.occurrence_date.between(window_start.isoformat(), window_end.isoformat())
+    ).all()
+    occurrences = expand_series([series], window_start, window_end) + stored
+    occurrences.sort(key=lambda occurrence: occurrence.occurrence_date)
+    return jsonify([occurrence.to_dict() for occurrence in occurrences])
+
+@events_bp.route('/events/<int:event_id>/occurrences/<occurrence_date>', methods=['PUT'])
+@cross_origin()
+def update_occurrence(event_id, occurrence_date):
+    """Override fields of a single occurrence of a recurring series"""
+    series = Event.query.get_or_404(event_id)
+    day, error = _series_occurrence(series, occurrence_date)
+    if error:
+        return error
+    data = dict(request.json)
+    if 'price' in data:
+        data['price_cents'], data['currency'] = parse_price(data['price'])
+    occurrence = override_occurrence(series, day, data)
+    get_suggest_index().update_event(occurrence)
+    get_calendar_feeds().invalidate_event(occurrence.id, series.id)
+    return jsonify(occurrence.to_dict())
+
+@events_bp.route('/events/<int:event_id>/occurrences/<occurrence_date>', methods=['DELETE'])
+@cross_origin()
+def delete_occurrence(event_id, occurrence_date):
+    """Cancel a single occurrence of a recurring series"""
+    series = Event.query.get_or_404(event_id)
+    day, error = _series_occurrence(series, occurrence_date)
+    if error:
+        return error
+    stored = stored_occurrence(series, day)
+    stored_id = stored.id if stored is not None else None
+    cancel_occurrence(series, day)
+    if stored_id is not None:
+        get_suggest_index().remove_event(stored_id)
+    get_calendar_feeds().invalidate_event(stored_id or series.id, series.id)
+    return '', 204
 
 @events_bp.route('/events/<int:event_id>/rsvps', methods=['GET'])
 @cross_origin()
@@ -146,11 +325,26 @@ def get_event_rsvps(event_id):
     rsvps = RSVP.query.filter_by(event_id=event_id).all()
     return jsonify([rsvp.to_dict() for rsvp in rsvps])
 
+@events_bp.route('/users/<int:user_id>/organized-events/summary', methods=['GET'])
+@cross_origin()
+def get_organized_events_summary(user_id):
+    """Get RSVP, bookmark, helper and invitation counts for every event a user organizes"""
+    User.query.get_or_404(user_id)
+    summaries = organized_event_summaries(user_id)
+    return jsonify({
+        'organizer_id': user_id,
+        'event_count': len(summaries),
+        'events': summaries
+    })
+
+def trending_query(viewer_id):
+    return select(Event).where(event_visibility(Event, viewer_id)).order_by(Event.attendees_count.desc()).limit(10)
+
 @events_bp.route('/events/trending', methods=['GET'])
 @cross_origin()
 def get_trending_events():
     """Get trending events based on attendees count"""
-    events = Event.query.filter_by(visibility='public').order_by(Event.attendees_count.desc()).limit(10).all()
+    events = db.session.scalars(trending_query(viewer_id_from_request())).all()
     return jsonify([event.to_dict() for event in events])
 
 @events_bp.route('/events/categories', methods=['GET'])
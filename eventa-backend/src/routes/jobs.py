@@ -0,0 +1,22 @@
+from flask import Blueprint, current_app, jsonify
+from flask_cors import cross_origin
+
+jobs_bp = Blueprint('jobs', __name__)
+
+@jobs_bp.route('/jobs/stats', methods=['GET'])
+@cross_origin()
+def get_job_stats():
+    """Get background job queue depth"""
+    pool = current_app.extensions['jobs']
+    stats = pool.queue.stats()
+    stats['mode'] = current_app.config['JOBS_MODE']
+    return jsonify(stats)
+
+@jobs_bp.route('/jobs/<int:job_id>', methods=['GET'])
+@cross_origin()
+def get_job(job_id):
+    """Get the status of a background job"""
+    job = current_app.extensions['jobs'].queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
@@ -0,0 +1,62 @@
+import os
+
+from flask import Blueprint, abort, current_app, jsonify, request, send_file
+from flask_cors import cross_origin
+
+from src.services.images import (MEDIA_URL_PATTERN, MEDIA_URL_PREFIX, VARIANT_NAME_PATTERN, VARIANT_SIZES,
+                                 InvalidImageError,
+                                 find_original, image_variant_urls, media_path, render_variant,
+                                 schedule_variants, store_original)
+
+images_bp = Blueprint('images', __name__)
+media_bp = Blueprint('media', __name__)
+
+ONE_YEAR = 365 * 24 * 60 * 60
+
+@images_bp.route('/images', methods=['POST'])
+@cross_origin()
+def upload_image():
+    """Upload an event image; resized variants are generated in the background"""
+    upload = request.files.get('file')
+    if upload is None:
+        return jsonify({'error': 'Missing file upload'}), 400
+    
+    media_root = current_app.config['MEDIA_ROOT']
+    try:
+        digest, filename = store_original(media_root, upload.read())
+    except InvalidImageError as exc:
+        return jsonify({'error': str(exc)}), 400
+    
+    schedule_variants(media_root, filename, current_app.config['IMAGE_WORKERS'])
+    
+    image_url = f'{MEDIA_URL_PREFIX}{filename}'
+    return jsonify({
+        'id': digest,
+        'image_url': image_url,
+        'image_variants': image_variant_urls(image_url)
+    }), 201
+
+@media_bp.route('/media/<filename>', methods=['GET'])
+def serve_media(filename):
+    """Serve content-addressed media with immutable caching"""
+    original = MEDIA_URL_PATTERN.match(f'{MEDIA_URL_PREFIX}{filename}')
+    variant = VARIANT_NAME_PATTERN.match(filename)
+    if original is None and (variant is None or variant.group('size') not in VARIANT_SIZES):
+        abort(404)
+    
+    media_root = current_app.config['MEDIA_ROOT']
+    path = media_path(media_root, filename)
+    if not os.path.exists(path):
+        if variant is None:
+            abort(404)
+        # The worker pool has not produced this variant yet (or it was lost); render it now
+        source = find_original(media_root, variant.group('digest'))
+        if source is None:
+            abort(404)
+        path = render_variant(source, media_root, variant.group('digest'), variant.group('size'), variant.group('ext'))
+    
+    # File names embed the content hash, so the name itself is a strong validator
+    response = send_file(path, conditional=True, etag=filename, max_age=ONE_YEAR)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
@@ -0,0 +1,13 @@
+from flask import Blueprint, Response, abort, request
+from src.middleware.metrics import registry
+
+metrics_bp = Blueprint('metrics', __name__)
+
+LOCAL_ADDRESSES = {'127.0.0.1', '::1', 'localhost'}
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Expose collected metrics in Prometheus text format (local clients only)"""
+    if request.remote_addr not in LOCAL_ADDRESSES:
+        abort(404)
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -1,9 +1,20 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 from flask_cors import cross_origin
+from sqlalchemy import select
 from src.models.user import User, db
 from src.models.social import Friendship, Message, Bookmark, UserProfile
 from src.models.event import Event
+from src.jobs.worker import enqueue_job
+from src.middleware.compression import stream_json_array
+from src.services.write_buffer import get_write_buffer
+from src.services.archive import archived_messages, include_past_requested, merge_by_created_at
+from src.services.invitations import AUDIENCES, DEFAULT_INVITATION_MESSAGE, resolve_recipients, send_invitations
+from src.services.visibility import profile_visibility, viewer_id_from_request
+from src.services.ical import get_calendar_feeds
+from src.services.digests import DIGEST_PREFERENCES, digest_preference
+from src.services.propagation import display_name, queue_propagation
 from datetime import datetime
+import json
 
 social_bp = Blueprint('social', __name__)
 
@@ -123,37 +134,50 @@ def send_message():
     
     return jsonify(message.to_dict()), 201
 
+def message_conditions(columns, user_id, other_user_id=None):
+    if other_user_id:
+        # Get conversation between two users
+        return [db.or_(
+            db.and_(columns.sender_id == user_id, columns.recipient_id == other_user_id),
+            db.and_(columns.sender_id == other_user_id, columns.recipient_id == user_id)
+        )]
+    # Get all messages for user
+    return [db.or_(columns.sender_id == user_id, columns.recipient_id == user_id)]
+
+def message_order(columns, other_user_id=None):
+    return columns.created_at.asc() if other_user_id else columns.created_at.desc()
+
+def messages_query(user_id, other_user_id=None):
+    """Select a user's messages, or one conversation oldest first, streamed 500 at a time"""
+    return select(Message).where(*message_conditions(Message, user_id, other_user_id)).order_by(
+        message_order(Message, other_user_id)).execution_options(yield_per=500)
+
 @social_bp.route('/messages/<int:user_id>', methods=['GET'])
 @cross_origin()
 def get_messages(user_id):
     """Get messages for a user"""
     other_user_id = request.args.get('other_user_id')
     
-    if other_user_id:
-        # Get conversation between two users
-        messages = Message.query.filter(
-            db.or_(
-                db.and_(Message.sender_id == user_id, Message.recipient_id == other_user_id),
-                db.and_(Message.sender_id == other_user_id, Message.recipient_id == user_id)
-            )
-        ).order_by(Message.created_at.asc()).all()
-    else:
-        # Get all messages for user
-        messages = Message.query.filter(
-            db.or_(Message.sender_id == user_id, Message.recipient_id == user_id)
-        ).order_by(Message.created_at.desc()).all()
-    
-    return jsonify([message.to_dict() for message in messages])
+    messages = db.session.scalars(messages_query(user_id, other_user_id))
+    if include_past_requested():
+        messages = merge_by_created_at(messages, archived_messages(
+            lambda columns: message_conditions(columns, user_id, other_user_id),
+            lambda columns: message_order(columns, other_user_id)
+        ), descending=not other_user_id)
+    
+    return stream_json_array(messages)
 
 @social_bp.route('/messages/<int:message_id>/read', methods=['PUT'])
 @cross_origin()
 def mark_message_read(message_id):
     """Mark a message as read"""
     message = Message.query.get_or_404(message_id)
-    message.is_read = True
-    db.session.commit()
+    get_write_buffer().mark_read(message.id)
     
-    return jsonify(message.to_dict())
+    # The flag is written behind; the response already reflects it
+    message_data = message.to_dict()
+    message_data['is_read'] = True
+    return jsonify(message_data)
 
 # Bookmarks
 @social_bp.route('/bookmarks', methods=['POST'])
@@ -175,6 +199,7 @@ def add_bookmark():
     bookmark = Bookmark(user_id=user_id, event_id=event_id)
     db.session.add(bookmark)
     db.session.commit()
+    get_calendar_feeds().invalidate_user(user_id)
     
     return jsonify(bookmark.to_dict()), 201
 
@@ -201,8 +226,10 @@ def get_bookmarks(user_id):
 def remove_bookmark(bookmark_id):
     """Remove a bookmark"""
     bookmark = Bookmark.query.get_or_404(bookmark_id)
+    user_id = bookmark.user_id
     db.session.delete(bookmark)
     db.session.commit()
+    get_calendar_feeds().invalidate_user(user_id)
     return '', 204
 
 # User Profiles
@@ -210,13 +237,19 @@ def remove_bookmark(bookmark_id):
 @cross_origin()
 def get_profile(user_id):
     """Get user profile"""
-    profile = UserProfile.query.filter_by(user_id=user_id).first()
+    # Fetch the profile and whether the viewer may read it in one query
+    visible = db.case((profile_visibility(UserProfile, viewer_id_from_request()), True), else_=False)
+    row = db.session.query(UserProfile, visible).filter(UserProfile.user_id == user_id).first()
+    profile = None
+    if row:
+        profile, visible = row
+        if not visible:
+            return jsonify({'error': 'This profile is private'}), 403
     if not profile:
-        # Create default profile if doesn't exist
+        # Serve a default profile without writing on GET; it is persisted in the background
         user = User.query.get_or_404(user_id)
         profile = UserProfile(user_id=user_id, display_name=user.username)
-        db.session.add(profile)
-        db.session.commit()
+        enqueue_job('create_default_profile', {'user_id': user_id}, coalesce_key=f'default_profile:{user_id}')
     
     return jsonify(profile.to_dict())
 
@@ -226,6 +259,14 @@ def update_profile(user_id):
     """Update user profile"""
     data = request.json
     
+    if isinstance(data.get('notification_preferences'), dict):
+        data['notification_preferences'] = json.dumps(data['notification_preferences'])
+    if data.get('notification_preferences') and digest_preference(data['notification_preferences']) is None:
+        return jsonify({'error': f"notification_preferences must be a JSON object with digest one of: {', '.join(DIGEST_PREFERENCES)}"}), 400
+    
+    # Events carry a copy of the organizer's name, rewritten in the background when it changes
+    old_name = display_name(user_id) if 'display_name' in data else None
+    
     profile = UserProfile.query.filter_by(user_id=user_id).first()
     if not profile:
         profile = UserProfile(user_id=user_id)
@@ -241,6 +282,8 @@ def update_profile(user_id):
     
     profile.updated_at = datetime.utcnow()
     db.session.commit()
+    if old_name and display_name(user_id) != old_name:
+        queue_propagation('display_name', user_id, old_name)
     
     return jsonify(profile.to_dict())
 
@@ -253,7 +296,7 @@ def send_event_invitation():
     sender_id = data.get('sender_id')
     recipient_id = data.get('recipient_id')
     event_id = data.get('event_id')
-    message_content = data.get('message', 'You have been invited to an event!')
+    message_content = data.get('message', DEFAULT_INVITATION_MESSAGE)
     
     if not all([sender_id, recipient_id, event_id]):
         return jsonify({'error': 'sender_id, recipient_id, and event_id are required'}), 400
@@ -261,19 +304,68 @@ def send_event_invitation():
     # Verify event exists
     event = Event.query.get_or_404(event_id)
     
-    message = Message(
-        sender_id=sender_id,
-        recipient_id=recipient_id,
-        content=message_content,
-        message_type='event_invite',
-        event_id=event_id
-    )
+    # The message is written by a background job; a client retry with the same Idempotency-Key is deduplicated
+    idempotency_key = request.headers.get('Idempotency-Key')
+    job_id = enqueue_job('send_event_invitation', {
+        'sender_id': sender_id,
+        'recipient_id': recipient_id,
+        'event_id': event_id,
+        'content': message_content
+    }, idempotency_key=idempotency_key)
     
-    db.session.add(message)
+    return jsonify({
+        'message': 'Invitation queued',
+        'job_id': job_id
+    }), 202
+
+
+@social_bp.route('/invitations/bulk', methods=['POST'])
+@cross_origin()
+def send_bulk_invitations():
+    """Invite a list of users and/or whole audiences (friends, past interested attendees) to an event"""
+    data = request.json
+    sender_id = data.get('sender_id')
+    event_id = data.get('event_id')
+    recipient_ids = data.get('recipient_ids', [])
+    audiences = data.get('audiences', [])
+    message_content = data.get('message', DEFAULT_INVITATION_MESSAGE)
+    
+    if not sender_id or not event_id:
+        return jsonify({'error': 'sender_id and event_id are required'}), 400
+    
+    if not isinstance(recipient_ids, list) or not all(isinstance(user_id, int) for user_id in recipient_ids):
+        return jsonify({'error': 'recipient_ids must be a list of user ids'}), 400
+    
+    unknown_audiences = [audience for audience in audiences if audience not in AUDIENCES]
+    if unknown_audiences:
+        return jsonify({'error': f'Unknown audiences: {", ".join(unknown_audiences)}'}), 400
+    
+    if not recipient_ids and not audiences:
+        return jsonify({'error': 'Provide recipient_ids and/or audiences'}), 400
+    
+    event = Event.query.get_or_404(event_id)
+    
+    recipients = resolve_recipients(sender_id, event, recipient_ids, audiences)
+    if len(recipients) > current_app.config.get('BULK_INVITE_SYNC_LIMIT', 1000):
+        # Very large fan-outs are written by a background job so the request returns immediately
+        job_id = enqueue_job('send_bulk_invitations', {
+            'sender_id': sender_id,
+            'event_id': event_id,
+            'recipient_ids': recipient_ids,
+            'audiences': audiences,
+            'content': message_content
+        })
+        return jsonify({
+            'message': 'Invitations queued',
+            'job_id': job_id,
+            'recipients': len(recipients)
+        }), 202
+    
+    invited = send_invitations(sender_id, event, recipients, message_content)
     db.session.commit()
     
     return jsonify({
-        'message': 'Invitation sent successfully',
-        'invitation': message.to_dict()
+        'message': 'Invitations sent successfully',
+        'invited_count': invited,
+        'invited_user_ids': recipients
     }), 201
-
@@ -0,0 +1,15 @@
+from flask import Blueprint, jsonify, request
+from flask_cors import cross_origin
+from src.services.suggest import DEFAULT_LIMIT, MAX_LIMIT, get_suggest_index
+
+suggest_bp = Blueprint('suggest', __name__)
+
+@suggest_bp.route('/suggest', methods=['GET'])
+@cross_origin()
+def suggest():
+    """Get typeahead suggestions from event titles, locations, categories and organizers"""
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', DEFAULT_LIMIT, type=int)
+    if limit is None or not 1 <= limit <= MAX_LIMIT:
+        return jsonify({'error': f'limit must be between 1 and {MAX_LIMIT}'}), 400
+    return jsonify(get_suggest_index().suggest(query, limit))
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Standalone background job worker for Eventa
+Runs job handlers in a separate process when the web app uses EVENTA_JOBS_MODE=external
+
+Usage:
+    python src/run_worker.py --workers 4
+"""
+
+import argparse
+import os
+import signal
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run Eventa background job workers')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('EVENTA_JOBS_WORKERS', '2')))
+    args = parser.parse_args(argv)
+
+    # The web app must not start its own worker threads in this process
+    os.environ['EVENTA_JOBS_MODE'] = 'external'
+    from src.main import app
+
+    pool = app.extensions['jobs']
+    pool.num_workers = args.workers
+    pool.start()
+    print(f"Running {args.workers} job workers against {app.config['JOBS_DATABASE']} (Ctrl+C to stop)")
+
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopped.set())
+    try:
+        while not stopped.wait(5):
+            stats = pool.queue.stats()
+            if stats['depth']['queued']:
+                print(f"queue depth: {stats['depth']} oldest: {stats['oldest_queued_age_seconds']}s")
+    except KeyboardInterrupt:
+        pass
+    pool.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -11,6 +11,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 from src.models.user import db, User
 from src.models.event import Event, RSVP, HelperRequest
 from src.models.social import UserProfile, Friendship, Bookmark
+from src.services.pricing import apply_price
 from datetime import datetime, timedelta
 import random
 
@@ -27,16 +28,17 @@ def seed_users():
         {'username': 'henry_social', 'email': 'henry@example.com'},
     ]
     
+    # Resolve existing users with a single lookup instead of one query per user
+    emails = [user_data['email'] for user_data in users_data]
+    existing_users = {user.email: user for user in User.query.filter(User.email.in_(emails)).all()}
+    
     users = []
     for user_data in users_data:
-        # Check if user already exists
-        existing_user = User.query.filter_by(email=user_data['email']).first()
-        if not existing_user:
+        user = existing_users.get(user_data['email'])
+        if not user:
             user = User(**user_data)
             db.session.add(user)
-            users.append(user)
-        else:
-            users.append(existing_user)
+        users.append(user)
     
     db.session.commit()
     return users
@@ -94,12 +96,16 @@ def seed_user_profiles(users):
         }
     ]
     
+    existing_profiles = {
+        user_id for (user_id,) in db.session.query(UserProfile.user_id).filter(
+            UserProfile.user_id.in_([user.id for user in users])
+        )
+    }
+    
     for i, profile_data in enumerate(profiles_data):
-        if i < len(users):
-            existing_profile = UserProfile.query.filter_by(user_id=users[i].id).first()
-            if not existing_profile:
-                profile = UserProfile(user_id=users[i].id, **profile_data)
-                db.session.add(profile)
+        if i < len(users) and users[i].id not in existing_profiles:
+            profile = UserProfile(user_id=users[i].id, **profile_data)
+            db.session.add(profile)
     
     db.session.commit()
 
@@ -228,20 +234,21 @@ def seed_events(users):
         }
     ]
     
+    titles = [event_data['title'] for event_data in events_data]
+    existing_events = {event.title: event for event in Event.query.filter(Event.title.in_(titles)).all()}
+    
     events = []
     for i, event_data in enumerate(events_data):
         organizer = users[i % len(users)]  # Cycle through users as organizers
         
-        existing_event = Event.query.filter_by(title=event_data['title']).first()
-        if not existing_event:
+        event = existing_events.get(event_data['title'])
+        if not event:
             event = Event(
                 organizer_id=organizer.id,
-                **event_data
+                **apply_price(dict(event_data))
             )
             db.session.add(event)
-            events.append(event)
-        else:
-            events.append(existing_event)
+        events.append(event)
     
     db.session.commit()
     return events
@@ -249,6 +256,9 @@ def seed_events(users):
 def seed_rsvps(users, events):
     """Create sample RSVPs"""
     statuses = ['interested', 'going', 'not_going']
+    existing_rsvps = set(
+        db.session.query(RSVP.user_id, RSVP.event_id).filter(RSVP.event_id.in_([event.id for event in events])).all()
+    )
     
     for event in events:
         # Create RSVPs for random users
@@ -256,8 +266,7 @@ def seed_rsvps(users, events):
         selected_users = random.sample(users, num_rsvps)
         
         for user in selected_users:
-            existing_rsvp = RSVP.query.filter_by(user_id=user.id, event_id=event.id).first()
-            if not existing_rsvp:
+            if (user.id, event.id) not in existing_rsvps:
                 status = random.choice(statuses)
                 rsvp = RSVP(
                     user_id=user.id,
@@ -305,16 +314,16 @@ def seed_helper_requests(events):
     
     # Add helper requests to events that need helpers
     helper_events = [event for event in events if event.helpers_needed]
+    existing_requests = set(
+        db.session.query(HelperRequest.event_id, HelperRequest.title).filter(
+            HelperRequest.event_id.in_([event.id for event in helper_events[:4]])
+        ).all()
+    )
     
     for event in helper_events[:4]:  # Add to first 4 events that need helpers
         for i, req_data in enumerate(helper_requests_data):
             if i < 2:  # Add 2 helper requests per event
-                existing_req = HelperRequest.query.filter_by(
-                    event_id=event.id, 
-                    title=req_data['title']
-                ).first()
-                
-                if not existing_req:
+                if (event.id, req_data['title']) not in existing_requests:
                     helper_request = HelperRequest(
                         event_id=event.id,
                         **req_data
@@ -330,22 +339,19 @@ def seed_friendships(users):
         (0, 1), (0, 2), (1, 3), (2, 4), (3, 5), (4, 6), (5, 7), (6, 0), (7, 1)
     ]
     
+    user_ids = [user.id for user in users]
+    existing_pairs = {
+        frozenset(pair) for pair in db.session.query(Friendship.requester_id, Friendship.addressee_id).filter(
+            Friendship.requester_id.in_(user_ids),
+            Friendship.addressee_id.in_(user_ids)
+        )
+    }
+    
     for requester_idx, addressee_idx in friendship_pairs:
         if requester_idx < len(users) and addressee_idx < len(users):
-            existing = Friendship.query.filter(
-                db.or_(
-                    db.and_(
-                        Friendship.requester_id == users[requester_idx].id,
-                        Friendship.addressee_id == users[addressee_idx].id
-                    ),
-                    db.and_(
-                        Friendship.requester_id == users[addressee_idx].id,
-                        Friendship.addressee_id == users[requester_idx].id
-                    )
-                )
-            ).first()
-            
-            if not existing:
+            pair = frozenset((users[requester_idx].id, users[addressee_idx].id))
+            if pair not in existing_pairs:
+                existing_pairs.add(pair)
                 friendship = Friendship(
                     requester_id=users[requester_idx].id,
                     addressee_id=users[addressee_idx].id,
@@ -357,17 +363,18 @@ def seed_friendships(users):
 
 def seed_bookmarks(users, events):
     """Create sample bookmarks"""
+    existing_bookmarks = set(
+        db.session.query(Bookmark.user_id, Bookmark.event_id).filter(
+            Bookmark.user_id.in_([user.id for user in users[:5]])
+        ).all()
+    )
+    
     for user in users[:5]:  # First 5 users bookmark some events
         num_bookmarks = random.randint(2, 5)
         selected_events = random.sample(events, min(num_bookmarks, len(events)))
         
         for event in selected_events:
-            existing_bookmark = Bookmark.query.filter_by(
-                user_id=user.id, 
-                event_id=event.id
-            ).first()
-            
-            if not existing_bookmark:
+            if (user.id, event.id) not in existing_bookmarks:
                 bookmark = Bookmark(user_id=user.id, event_id=event.id)
                 db.session.add(bookmark)
     
@@ -412,7 +419,10 @@ if __name__ == '__main__':
     from flask import Flask
     
     app = Flask(__name__)
-    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+        'EVENTA_DATABASE_URI',
+        f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+    )
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     
     db.init_app(app)
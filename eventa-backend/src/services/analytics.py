@@ -0,0 +1,149 @@
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import text
+
+from src.jobs.worker import enqueue_job
+from src.models.analytics import EngagementEvent, EventDailyStats, RollupWatermark
+from src.models.event import Event
+from src.models.schema import raise_sequence
+from src.models.user import db
+from src.services.write_buffer import get_write_buffer
+
+VIEW = 'view'
+IMPRESSION = 'impression'
+ROLLUP_NAME = 'event_daily_stats'
+ROLLUP_BATCH_SIZE = 50000
+
+
+def record_engagement(event_id, kind):
+    """Append to the engagement log through the write buffer; costs the request no database write"""
+    get_write_buffer().append(EngagementEvent, {
+        'event_id': event_id,
+        'kind': kind,
+        'occurred_at': datetime.utcnow(),
+    })
+
+
+def record_view(event_id):
+    record_engagement(event_id, VIEW)
+
+
+def record_impression(event_id):
+    record_engagement(event_id, IMPRESSION)
+
+
+def schedule_rollup(flushed):
+    """Write buffer listener: roll up shortly after new log rows land, one pending rollup at a time"""
+    if flushed.get(EngagementEvent.__tablename__):
+        enqueue_job('rollup_engagement', coalesce_key='rollup_engagement',
+                    delay=current_app.config.get('ANALYTICS_ROLLUP_DELAY', 60))
+
+
+def rollup_engagement(batch_size=ROLLUP_BATCH_SIZE):
+    """Fold log rows past the watermark into event_daily_stats; returns the number of rollup rows written
+
+    Each batch moves the watermark with a compare-and-set in the same
+    transaction as the upsert, so every log row is counted exactly once even
+    if two rollups run at the same time.
+    """
+    db.session.execute(
+        text('INSERT OR IGNORE INTO rollup_watermark (name, last_id) VALUES (:name, 0)'), {'name': ROLLUP_NAME}
+    )
+    db.session.commit()
+    folded = 0
+    while True:
+        low = RollupWatermark.query.get(ROLLUP_NAME).last_id
+        high = db.session.execute(
+            text('SELECT MAX(id) FROM (SELECT id FROM engagement_event WHERE id > :low ORDER BY id LIMIT :limit)'),
+            {'low': low, 'limit': batch_size}
+        ).scalar()
+        if high is None:
+            return folded
+
+        claimed = RollupWatermark.query.filter_by(name=ROLLUP_NAME, last_id=low).update(
+            {'last_id': high}, synchronize_session=False
+        )
+        if not claimed:
+            # Another rollup advanced the watermark first
+            db.session.rollback()
+            return folded
+
+        result = db.session.execute(text(
+            "INSERT INTO event_daily_stats (event_id, day, views, impressions) "
+            "SELECT event_id, date(occurred_at) AS day, "
+            "SUM(kind = 'view'), SUM(kind = 'impression') "
+            "FROM engagement_event WHERE id > :low AND id <= :high "
+            "GROUP BY event_id, day "
+            "ON CONFLICT (event_id, day) DO UPDATE SET "
+            "views = views + excluded.views, impressions = impressions + excluded.impressions"
+        ), {'low': low, 'high': high})
+        db.session.commit()
+        folded += result.rowcount
+        db.session.expire_all()
+
+
+def purge_engagement_log(retention_days):
+    """Delete log rows that are both rolled up and older than the retention window"""
+    watermark = RollupWatermark.query.get(ROLLUP_NAME)
+    if watermark is None or retention_days is None:
+        return 0
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    return EngagementEvent.query.filter(
+        EngagementEvent.id <= watermark.last_id,
+        EngagementEvent.occurred_at < cutoff
+    ).delete(synchronize_session=False)
+
+
+def organizer_engagement(organizer_id, days):
+    """Daily views and impressions for an organizer's events, read from the rollups only"""
+    since = (datetime.utcnow().date() - timedelta(days=days - 1)).isoformat()
+    rows = db.session.query(EventDailyStats, Event.title).join(
+        Event, Event.id == EventDailyStats.event_id
+    ).filter(
+        Event.organizer_id == organizer_id,
+        EventDailyStats.day >= since
+    ).order_by(EventDailyStats.event_id, EventDailyStats.day).all()
+
+    events = {}
+    for stats, title in rows:
+        entry = events.get(stats.event_id)
+        if entry is None:
+            entry = events[stats.event_id] = {
+                'event_id': stats.event_id,
+                'title': title,
+                'views': 0,
+                'impressions': 0,
+                'daily': []
+            }
+        entry['views'] += stats.views
+        entry['impressions'] += stats.impressions
+        entry['daily'].append(stats.to_dict())
+
+    return {
+        'organizer_id': organizer_id,
+        'since': since,
+        'days': days,
+        'totals': {
+            'views': sum(entry['views'] for entry in events.values()),
+            'impressions': sum(entry['impressions'] for entry in events.values())
+        },
+        'events': sorted(events.values(), key=lambda entry: entry['views'], reverse=True)
+    }
+
+
+def reserve_rolled_up_ids():
+    """Keep new log ids above the rollup watermark, even once the purge has deleted every row up to it"""
+    watermark = db.session.get(RollupWatermark, ROLLUP_NAME)
+    if watermark is not None:
+        with db.engine.begin() as conn:
+            raise_sequence(conn, EngagementEvent.__tablename__, watermark.last_id)
+
+
+def init_analytics(app):
+    app.config.setdefault('ANALYTICS_ROLLUP_DELAY', 60)
+    app.config.setdefault('ANALYTICS_RETENTION_DAYS', 30)
+    app.config.setdefault('ANALYTICS_IMPRESSION_LIMIT', 50)
+    with app.app_context():
+        reserve_rolled_up_ids()
+    app.extensions['write_buffer'].flush_listeners.append(schedule_rollup)
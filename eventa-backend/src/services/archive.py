@@ -0,0 +1,290 @@
+"""
+Archival of past events and old messages into a separate SQLite database
+
+Hot tables only hold upcoming events and recent messages. Rows are moved in
+chunks through an ATTACHed connection: copy into the archive with INSERT OR
+IGNORE, then delete from the main database only the rows whose identical
+copy is now in the archive, in one transaction. With the default rollback
+journal that commit is atomic across both files. Under WAL it is atomic per
+file, and a move interrupted between them leaves a row in both places, which
+the next run resolves because the copy is idempotent.
+
+Archived ids stay taken: the archived tables are AUTOINCREMENT, and their
+sequences are kept above the highest archived id. A row whose id is already
+in the archive with different values (an id reused before that) is left in
+the main database and logged rather than lost; an event is skipped along
+with its RSVPs, bookmarks and helper requests.
+"""
+
+import functools
+import heapq
+import logging
+import os
+import re
+import threading
+from datetime import date, datetime, timedelta
+
+from flask import current_app, request
+from sqlalchemy import Column, Index, MetaData, Table, create_engine, func, select
+
+from src.models.user import db
+from src.models.schema import add_missing_columns, raise_sequence
+from src.models.event import Event
+from src.models.social import Message
+from src.services.suggest import get_suggest_index
+
+logger = logging.getLogger(__name__)
+
+# Archived alongside each past event: rows that only make sense with it, children first
+EVENT_DEPENDENTS = (
+    ('rsvp', 'event_id IN ({ids})'),
+    ('bookmark', 'event_id IN ({ids})'),
+    ('helper_application', 'helper_request_id IN (SELECT id FROM main.helper_request WHERE event_id IN ({ids}))'),
+    ('helper_request', 'event_id IN ({ids})'),
+)
+ARCHIVED_TABLES = ('event', 'rsvp', 'bookmark', 'helper_application', 'helper_request', 'message')
+ARCHIVE_INDEXES = {
+    'event': ('created_at', 'organizer_id', 'price_cents'),
+    'rsvp': ('event_id', 'user_id'),
+    'bookmark': ('user_id',),
+    'helper_request': ('event_id',),
+    'message': ('sender_id', 'recipient_id', 'created_at'),
+}
+ORDINAL_SUFFIX = re.compile(r'(\d+)(st|nd|rd|th)\b')
+EVENT_DATE_FORMATS = ('%B %d %Y', '%b %d %Y', '%d %B %Y', '%m/%d/%Y')
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_event_date(value):
+    """Parse the free-form event.date column ('2025-05-08', 'Friday, May 8th 2025'), or return None"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        pass
+    if ',' in value and value.split(',', 1)[0].strip().isalpha():
+        # Drop a leading weekday name
+        value = value.split(',', 1)[1]
+    value = ORDINAL_SUFFIX.sub(r'\1', value).replace(',', ' ')
+    value = ' '.join(value.split())
+    for fmt in EVENT_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _last_event_date(row):
+    """An event's date, or for a recurring series its final occurrence (None while it has no end)"""
+    from src.services.recurrence import RecurrenceRule
+
+    start = parse_event_date(row.date)
+    if not row.recurrence_rule or start is None:
+        return start
+    try:
+        return RecurrenceRule.parse(row.recurrence_rule).last_occurrence(start)
+    except ValueError:
+        return None
+
+
+def _chunks(values, size):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class ArchiveStore:
+    """The archive database: a column-for-column copy of the archived tables without constraints"""
+
+    def __init__(self, path):
+        self.path = path
+        self.metadata = MetaData()
+        self.tables = {}
+        for name in ARCHIVED_TABLES:
+            source = db.metadata.tables[name]
+            table = Table(name, self.metadata, *[
+                Column(column.name, column.type, primary_key=column.primary_key) for column in source.columns
+            ])
+            for column_name in ARCHIVE_INDEXES.get(name, ()):
+                Index(f'ix_archive_{name}_{column_name}', table.c[column_name])
+            self.tables[name] = table
+        self._engine = None
+        self._lock = threading.Lock()
+
+    @property
+    def engine(self):
+        with self._lock:
+            if self._engine is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._engine = create_engine(f'sqlite:///{self.path}')
+                self.upgrade_schema()
+        return self._engine
+
+    def upgrade_schema(self):
+        """Create archive tables and add columns the models gained since they were created"""
+        self.metadata.create_all(self._engine)
+        add_missing_columns(self._engine, self.tables.values())
+
+    def rows(self, statement):
+        """Stream rows from the archive"""
+        with self.engine.connect() as conn:
+            yield from conn.execute(statement.execution_options(yield_per=500))
+
+    def reserve_ids(self):
+        """Keep new ids in the main database above every id already archived"""
+        with self.engine.connect() as archive, db.engine.begin() as conn:
+            for name, table in self.tables.items():
+                raise_sequence(conn, name, archive.execute(select(func.max(table.c.id))).scalar())
+
+    def _archived_copy(self, name):
+        """Correlated condition: main.<name>'s current row is in the archive with the same id and values"""
+        matches = ' AND '.join(f'archived.{column.name} IS main.{name}.{column.name}'
+                               for column in db.metadata.tables[name].columns)
+        return f'EXISTS (SELECT 1 FROM archive.{name} AS archived WHERE {matches})'
+
+    def _conflicts(self, conn, name, where):
+        """Ids of rows matching where whose id the archive already holds with other values"""
+        return {row[0] for row in conn.exec_driver_sql(
+            f'SELECT id FROM main.{name} WHERE ({where}) AND NOT {self._archived_copy(name)} '
+            f'AND id IN (SELECT id FROM archive.{name})'
+        )}
+
+    def _move(self, conn, name, where):
+        columns = ', '.join(column.name for column in db.metadata.tables[name].columns)
+        conn.exec_driver_sql(
+            f'INSERT OR IGNORE INTO archive.{name} ({columns}) SELECT {columns} FROM main.{name} WHERE {where}'
+        )
+        conflicts = self._conflicts(conn, name, where)
+        if conflicts:
+            logger.error('Left %d %s rows in place: their ids are archived with other values (%s)',
+                         len(conflicts), name, ', '.join(map(str, sorted(conflicts)[:20])))
+        # Only rows that landed in the archive leave the main database
+        return conn.exec_driver_sql(
+            f'DELETE FROM main.{name} WHERE ({where}) AND {self._archived_copy(name)}'
+        ).rowcount
+
+    def archive(self, event_cutoff, message_cutoff, chunk_size=500):
+        """Move events dated before event_cutoff and messages created before message_cutoff"""
+        self.reserve_ids()
+        counts = {name: 0 for name in ARCHIVED_TABLES}
+        event_table = db.metadata.tables['event']
+        message_table = db.metadata.tables['message']
+
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql('ATTACH DATABASE ? AS archive', (self.path,))
+            try:
+                past_ids = [
+                    row.id for row in conn.execute(
+                        select(event_table.c.id, event_table.c.date, event_table.c.recurrence_rule)
+                    )
+                    if (_last_event_date(row) or event_cutoff) < event_cutoff
+                ]
+                conn.commit()
+                for chunk in _chunks(past_ids, chunk_size):
+                    # An event that can't move keeps its dependents with it
+                    conflicts = self._conflicts(conn, 'event', f"id IN ({', '.join(str(int(i)) for i in chunk)})")
+                    if conflicts:
+                        logger.error('Left %d past events in place: their ids are archived with other values (%s)',
+                                     len(conflicts), ', '.join(map(str, sorted(conflicts)[:20])))
+                        chunk = [event_id for event_id in chunk if event_id not in conflicts]
+                        if not chunk:
+                            continue
+                    ids = ', '.join(str(int(event_id)) for event_id in chunk)
+                    for name, where in EVENT_DEPENDENTS:
+                        counts[name] += self._move(conn, name, where.format(ids=ids))
+                    counts['event'] += self._move(conn, 'event', f'id IN ({ids})')
+                    conn.commit()
+
+                after = 0
+                while True:
+                    ids = [row.id for row in conn.execute(
+                        select(message_table.c.id).where(message_table.c.created_at < message_cutoff,
+                                                         message_table.c.id > after)
+                        .order_by(message_table.c.id).limit(chunk_size)
+                    )]
+                    if not ids:
+                        break
+                    after = ids[-1]
+                    counts['message'] += self._move(conn, 'message', f"id IN ({', '.join(map(str, ids))})")
+                    conn.commit()
+            finally:
+                conn.rollback()
+                conn.exec_driver_sql('DETACH DATABASE archive')
+        return counts
+
+
+def get_archive():
+    return current_app.extensions['archive']
+
+
+def include_past_requested():
+    """Read APIs only touch the archive when the client asks with include_past=1"""
+    return request.args.get('include_past', '').lower() in ('1', 'true')
+
+
+def archived_events(conditions, order_by):
+    """Transient Event objects from the archive matching conditions built on its columns, ordered by the tuple order_by returns"""
+    table = get_archive().tables['event']
+    statement = select(table).where(*conditions(table.c)).order_by(*order_by(table.c))
+    for row in get_archive().rows(statement):
+        yield Event(**row._mapping)
+
+
+def archived_messages(conditions, order_by):
+    table = get_archive().tables['message']
+    statement = select(table).where(*conditions(table.c)).order_by(order_by(table.c))
+    for row in get_archive().rows(statement):
+        yield Message(**row._mapping)
+
+
+def merge_sorted(hot, archived, key, descending):
+    """Merge two streams already sorted by key into one"""
+    return heapq.merge(hot, archived, key=key, reverse=descending)
+
+
+def merge_by_created_at(hot, archived, descending):
+    return merge_sorted(hot, archived, lambda row: row.created_at or datetime.min, descending)
+
+
+def archive_history(now=None):
+    """Move events more than ARCHIVE_EVENT_DAYS past and messages older than ARCHIVE_MESSAGE_DAYS"""
+    # Imported here: calendar feeds render dates with this module's parser
+    from src.services.ical import get_calendar_feeds
+
+    now = now or datetime.utcnow()
+    config = current_app.config
+    counts = get_archive().archive(
+        (now - timedelta(days=config['ARCHIVE_EVENT_DAYS'])).date(),
+        now - timedelta(days=config['ARCHIVE_MESSAGE_DAYS']),
+        config.get('ARCHIVE_CHUNK_SIZE', 500)
+    )
+    if counts['event']:
+        get_suggest_index().invalidate()
+        get_calendar_feeds().clear()
+    return counts
+
+
+def schedule_archive():
+    """Queue the next archival run; inline job mode has no scheduler, so use src/archive_data.py there"""
+    from src.jobs.worker import enqueue_job
+
+    interval = current_app.config['ARCHIVE_INTERVAL']
+    if interval > 0 and current_app.config['JOBS_MODE'] != 'inline':
+        enqueue_job('archive_history', coalesce_key='archive_history', delay=interval)
+
+
+def init_archive(app):
+    app.config.setdefault('ARCHIVE_EVENT_DAYS', 30)
+    app.config.setdefault('ARCHIVE_MESSAGE_DAYS', 365)
+    app.config.setdefault('ARCHIVE_INTERVAL', 24 * 60 * 60)
+    app.extensions['archive'] = ArchiveStore(app.config['ARCHIVE_DATABASE'])
+    if os.path.exists(app.config['ARCHIVE_DATABASE']):
+        with app.app_context():
+            app.extensions['archive'].reserve_ids()
+    if 'jobs' in app.extensions:
+        with app.app_context():
+            schedule_archive()
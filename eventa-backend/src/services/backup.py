@@ -0,0 +1,268 @@
+"""
+Online snapshots of the app database
+
+A snapshot is taken while the app keeps serving. The database runs in WAL
+mode, so one connection holds a read transaction open for the whole copy.
+Writers carry on, appending to the WAL, and the copy is the database exactly
+as of that transaction. Two copy methods are available:
+
+- 'backup' (the default) uses SQLite's online backup API in steps of
+  BACKUP_PAGES_PER_STEP pages with BACKUP_STEP_SLEEP seconds between steps,
+  so the copy never takes the disk for long.
+- 'vacuum' runs VACUUM INTO, which writes a compacted copy in one
+  statement. That is faster and smaller on disk, but cannot be throttled.
+
+The copy and its verification run in a child process lowered by
+BACKUP_NICENESS, so on a busy host request threads get the CPU first.
+
+Without the open read transaction the backup API restarts from the first
+page whenever another connection commits, and would never finish under
+steady writes.
+
+Each snapshot is written under a temporary name, checked with
+PRAGMA integrity_check, and renamed into BACKUP_DIR as app-<UTC time>.db.
+Its manifest, app-<UTC time>.json, records per-table row counts and a
+SHA-256. For 'backup', the row counts are also compared against the source
+inside the same read transaction. Only the newest BACKUP_KEEP snapshots are
+kept. src/restore_backup.py checks a snapshot against its manifest again
+before putting it in place.
+
+Past events and old messages live only in the archive database, so the same
+run copies it too, as archive-<UTC time>.db with its own entry under
+'archive' in the manifest. It is copied after the app database: rows
+archived in between end up in both snapshots rather than in neither.
+"""
+
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy.engine import make_url
+
+from src.middleware.metrics import registry
+
+BACKUP_METHODS = ('backup', 'vacuum')
+SNAPSHOT_PREFIX = 'app-'
+ARCHIVE_PREFIX = 'archive-'
+
+backup_duration = registry.gauge(
+    'eventa_backup_last_duration_seconds', 'Time taken by the last successful database snapshot, verification included')
+backup_size = registry.gauge(
+    'eventa_backup_last_size_bytes', 'Size of the last successful database snapshot, archive copy included')
+backup_timestamp = registry.gauge(
+    'eventa_backup_last_success_timestamp_seconds', 'Unix time the last successful database snapshot finished')
+
+
+class BackupError(Exception):
+    """A snapshot could not be taken or did not verify"""
+
+
+def database_path(uri):
+    """The file behind a sqlite:/// URI, or None for other databases"""
+    url = make_url(uri)
+    if url.get_backend_name() != 'sqlite' or not url.database or url.database == ':memory:':
+        return None
+    return url.database
+
+
+def enable_wal(path):
+    """Switch a database to WAL mode (persistent), so a snapshot's read transaction doesn't block writers"""
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        return conn.execute('PRAGMA journal_mode=WAL').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def table_counts(conn):
+    tables = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+    )]
+    return {table: conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0] for table in tables}
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def verify_snapshot(path, manifest=None):
+    """Integrity-check a snapshot and return its row counts; with a manifest, also compare counts and SHA-256"""
+    if manifest is not None and file_sha256(path) != manifest['sha256']:
+        raise BackupError(f'{path} does not match the SHA-256 in its manifest')
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        problems = [row[0] for row in conn.execute('PRAGMA integrity_check')]
+        if problems != ['ok']:
+            raise BackupError(f"{path} failed integrity_check: {'; '.join(problems[:5])}")
+        counts = table_counts(conn)
+    finally:
+        conn.close()
+    if manifest is not None and counts != manifest['tables']:
+        raise BackupError(f'{path} row counts differ from its manifest')
+    return counts
+
+
+def _copy_with_backup_api(source, target, pages_per_step, step_sleep):
+    """Page-stepped copy of the snapshot seen by source's open read transaction; returns the source's row counts"""
+    destination = sqlite3.connect(target)
+    try:
+        source.execute('BEGIN')
+        # Reading starts the read transaction that pins the snapshot
+        expected = table_counts(source)
+        source.backup(destination, pages=pages_per_step,
+                      progress=lambda status, remaining, total: time.sleep(step_sleep) if step_sleep else None)
+        source.execute('COMMIT')
+        # The copy inherits WAL mode from the source header; a snapshot should be one self-contained file
+        destination.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        destination.close()
+    return expected
+
+
+def _snapshot_name(now, prefix=SNAPSHOT_PREFIX):
+    return f"{prefix}{now.strftime('%Y%m%dT%H%M%SZ')}"
+
+
+def archive_snapshot_path(path):
+    """The archive database copy taken in the same run as the app snapshot at path"""
+    return os.path.join(os.path.dirname(path), ARCHIVE_PREFIX + os.path.basename(path)[len(SNAPSHOT_PREFIX):])
+
+
+def list_snapshots(backup_dir):
+    """Snapshot paths in backup_dir, oldest first"""
+    return sorted(glob.glob(os.path.join(backup_dir, f'{SNAPSHOT_PREFIX}*.db')))
+
+
+def prune_snapshots(backup_dir, keep):
+    removed = []
+    for path in list_snapshots(backup_dir)[:-keep] if keep > 0 else []:
+        for name in (path, path[:-3] + '.json', archive_snapshot_path(path)):
+            if os.path.exists(name):
+                os.remove(name)
+        removed.append(path)
+    return removed
+
+
+def _copy_database(source_path, partial, method, pages_per_step, step_sleep):
+    """Copy the database at source_path to partial and verify it; returns its manifest entry"""
+    started = time.perf_counter()
+    if os.path.exists(partial):
+        os.remove(partial)
+    source = sqlite3.connect(source_path, isolation_level=None, timeout=30)
+    try:
+        if method == 'backup':
+            expected = _copy_with_backup_api(source, partial, pages_per_step, step_sleep)
+        else:
+            source.execute('VACUUM INTO ?', (partial,))
+            expected = None
+        copy_seconds = time.perf_counter() - started
+        counts = verify_snapshot(partial)
+        if expected is not None and counts != expected:
+            raise BackupError('Snapshot row counts differ from the source')
+    except Exception:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    finally:
+        source.close()
+    return {
+        'source': os.path.abspath(source_path),
+        'size_bytes': os.path.getsize(partial),
+        'sha256': file_sha256(partial),
+        'tables': counts,
+        'copy_seconds': round(copy_seconds, 3),
+    }
+
+
+def take_snapshot(source_path, backup_dir, method='backup', pages_per_step=256, step_sleep=0.01, keep=None, now=None,
+                  archive_path=None):
+    """Copy the database at source_path, and the archive database at archive_path if given, into backup_dir,
+    verify them and return the manifest"""
+    if method not in BACKUP_METHODS:
+        raise ValueError(f"method must be one of: {', '.join(BACKUP_METHODS)}")
+    started = time.perf_counter()
+    now = now or datetime.utcnow()
+    os.makedirs(backup_dir, exist_ok=True)
+    path = os.path.join(backup_dir, _snapshot_name(now) + '.db')
+    manifest = {'snapshot': os.path.basename(path), 'method': method, 'created_at': now.isoformat() + 'Z'}
+    manifest.update(_copy_database(source_path, path + '.partial', method, pages_per_step, step_sleep))
+    if archive_path:
+        archive = archive_snapshot_path(path)
+        try:
+            manifest['archive'] = dict(
+                _copy_database(archive_path, archive + '.partial', method, pages_per_step, step_sleep),
+                snapshot=os.path.basename(archive))
+        except Exception:
+            os.remove(path + '.partial')
+            raise
+        os.replace(archive + '.partial', archive)
+    os.replace(path + '.partial', path)
+    manifest['total_seconds'] = round(time.perf_counter() - started, 3)
+    with open(path[:-3] + '.json', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    if keep:
+        prune_snapshots(backup_dir, keep)
+    return manifest
+
+
+def run_backup():
+    """take_snapshot of the app and archive databases with the app's backup settings"""
+    config = current_app.config
+    source_path = database_path(config['SQLALCHEMY_DATABASE_URI'])
+    if source_path is None:
+        raise BackupError('Snapshots need a SQLite database file')
+    archive_path = config.get('ARCHIVE_DATABASE')
+    options = {
+        'method': config['BACKUP_METHOD'],
+        'pages_per_step': config['BACKUP_PAGES_PER_STEP'],
+        'step_sleep': config['BACKUP_STEP_SLEEP'],
+        'keep': config['BACKUP_KEEP'],
+        # Nothing has been archived until the archive job first creates the file
+        'archive_path': archive_path if archive_path and os.path.exists(archive_path) else None,
+    }
+    if config['BACKUP_NICENESS'] > 0 and hasattr(os, 'nice'):
+        # A child at lower CPU priority copies and verifies, so request threads are scheduled ahead of it
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=os.nice, initargs=(config['BACKUP_NICENESS'],)) as pool:
+            manifest = pool.submit(take_snapshot, source_path, config['BACKUP_DIR'], **options).result()
+    else:
+        manifest = take_snapshot(source_path, config['BACKUP_DIR'], **options)
+    backup_duration.set(manifest['total_seconds'])
+    backup_size.set(manifest['size_bytes'] + manifest.get('archive', {}).get('size_bytes', 0))
+    backup_timestamp.set(time.time())
+    return manifest
+
+
+def schedule_backup():
+    """Queue the next snapshot; inline job mode has no scheduler, so use src/backup_database.py there"""
+    from src.jobs.worker import enqueue_job
+
+    interval = current_app.config['BACKUP_INTERVAL']
+    if interval > 0 and current_app.config['JOBS_MODE'] != 'inline':
+        enqueue_job('backup_database', coalesce_key='backup_database', delay=interval)
+
+
+def init_backups(app):
+    app.config.setdefault('BACKUP_METHOD', 'backup')
+    app.config.setdefault('BACKUP_PAGES_PER_STEP', 256)
+    app.config.setdefault('BACKUP_STEP_SLEEP', 0.01)
+    app.config.setdefault('BACKUP_NICENESS', 10)
+    app.config.setdefault('BACKUP_KEEP', 7)
+    app.config.setdefault('BACKUP_INTERVAL', 24 * 60 * 60)
+    for path in (database_path(app.config['SQLALCHEMY_DATABASE_URI']), app.config.get('ARCHIVE_DATABASE')):
+        if path is not None and os.path.exists(path):
+            enable_wal(path)
+    if 'jobs' in app.extensions:
+        with app.app_context():
+            schedule_backup()
@@ -0,0 +1,332 @@
+"""
+Near-duplicate event detection with MinHash signatures and LSH banding
+
+An event's title (character trigrams), location (words) and description
+(word pairs) are hashed into a set of features. NUM_PERM minimum hashes of
+that set form its signature; the share of positions where two signatures
+agree estimates the Jaccard similarity of the two feature sets.
+
+Signatures are split into BANDS bands of ROWS hashes. Each band is hashed,
+together with the event's normalized date, into a bucket stored in the
+event_band table, so only events on the same date that share at least one
+bucket are compared. With 16 bands of 4 rows, pairs at 0.8 similarity share
+a bucket with probability above 0.999, while pairs below 0.3 rarely do.
+Looking up an event costs one indexed query over its 16 buckets whatever
+the table size.
+
+Recurring series and their stored occurrences are left out: occurrences
+are meant to repeat their series.
+"""
+
+import hashlib
+import itertools
+import random
+import re
+import time
+import zlib
+from array import array
+from collections import namedtuple
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import delete, insert, or_, select, text
+
+from src.models.user import db
+from src.models.event import Event
+from src.models.dedup import DuplicateCandidate, EventBand, EventSignature
+from src.services.archive import parse_event_date
+
+try:
+    import numpy
+except ImportError:  # optional; batch signatures are computed one event at a time without it
+    numpy = None
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+PRIME = (1 << 31) - 1
+DEFAULT_THRESHOLD = 0.8
+DESCRIPTION_WORDS = 100
+QUERY_CHUNK_SIZE = 500
+WORD = re.compile(r'\w+')
+# Permutations h(x) = (a * x + b) mod PRIME; fixed so stored signatures stay comparable across runs
+_permutation_rng = random.Random(20250603)
+PERMUTATIONS = [(_permutation_rng.randrange(1, PRIME), _permutation_rng.randrange(PRIME)) for _ in range(NUM_PERM)]
+if numpy is not None:
+    _A = numpy.array([a for a, _ in PERMUTATIONS], dtype=numpy.uint64)[:, None]
+    _B = numpy.array([b for _, b in PERMUTATIONS], dtype=numpy.uint64)[:, None]
+# Fields read from each event, in the order sign() takes them
+SIGNED_COLUMNS = (Event.id, Event.title, Event.description, Event.location, Event.date)
+# Rows moved to the kept event on merge: (table, column that must stay unique per event, or None)
+MERGED_ROWS = (
+    ('rsvp', 'user_id'),
+    ('bookmark', 'user_id'),
+    ('event_daily_stats', 'day'),
+    ('helper_request', None),
+    ('message', None),
+    ('engagement_event', None),
+)
+# Counters added into the kept event's row when both events have a row for the same unique value
+MERGED_SUMS = {
+    'event_daily_stats': ('views', 'impressions'),
+}
+
+Signed = namedtuple('Signed', 'event_id signature date_key buckets')
+
+
+def _words(value):
+    return WORD.findall((value or '').lower())
+
+
+def _chunks(values, size=QUERY_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def event_features(title, description, location):
+    """Hashed features of an event's text; never empty"""
+    title = ' '.join(_words(title))
+    features = {'t' + title[i:i + 3] for i in range(max(1, len(title) - 2))}
+    features.update('l' + word for word in _words(location))
+    words = _words(description)[:DESCRIPTION_WORDS]
+    features.update('d' + ' '.join(words[i:i + 2]) for i in range(len(words) - 1))
+    return sorted({zlib.crc32(feature.encode('utf-8')) % PRIME for feature in features})
+
+
+def date_key(value):
+    """The event date normalized so '2025-05-08' and 'Thursday, May 8th 2025' agree"""
+    day = parse_event_date(value)
+    return day.isoformat() if day else ' '.join(_words(value))
+
+
+def minhash(features):
+    return [min((a * x + b) % PRIME for x in features) for a, b in PERMUTATIONS]
+
+
+def minhash_batch(feature_lists):
+    """Signatures for many feature lists at once; vectorized with numpy when it is installed"""
+    if numpy is None or not feature_lists:
+        return [minhash(features) for features in feature_lists]
+    lengths = numpy.fromiter((len(features) for features in feature_lists), dtype=numpy.int64, count=len(feature_lists))
+    values = numpy.fromiter(itertools.chain.from_iterable(feature_lists), dtype=numpy.uint64, count=int(lengths.sum()))
+    offsets = numpy.concatenate(([0], numpy.cumsum(lengths)[:-1]))
+    # a, x < 2^31, so a * x + b stays well inside uint64
+    hashes = (_A * values[None, :] + _B) % PRIME
+    return numpy.minimum.reduceat(hashes, offsets, axis=1).T.tolist()
+
+
+def band_buckets(signature, key):
+    buckets = []
+    prefix = key.encode('utf-8') + b'\0'
+    for band in range(BANDS):
+        digest = hashlib.blake2b(prefix + array('I', signature[band * ROWS:(band + 1) * ROWS]).tobytes(),
+                                 digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, 'big', signed=True))
+    return buckets
+
+
+def sign(rows):
+    """Signed records for (id, title, description, location, date) rows"""
+    signatures = minhash_batch([event_features(row[1], row[2], row[3]) for row in rows])
+    signed = []
+    for row, signature in zip(rows, signatures):
+        key = date_key(row[4])
+        signed.append(Signed(row[0], signature, key, band_buckets(signature, key)))
+    return signed
+
+
+def similarity(first, second):
+    return sum(1 for a, b in zip(first, second) if a == b) / NUM_PERM
+
+
+def eligible(event):
+    return not event.recurrence_rule and event.series_id is None
+
+
+def dedup_threshold():
+    return current_app.config.get('DEDUP_THRESHOLD', DEFAULT_THRESHOLD)
+
+
+def remove_signatures(event_ids):
+    for chunk in _chunks(event_ids):
+        db.session.execute(delete(EventBand).where(EventBand.event_id.in_(chunk)))
+        db.session.execute(delete(EventSignature).where(EventSignature.event_id.in_(chunk)))
+
+
+def forget_event(event_id):
+    """Drop a deleted event's signature and its pairs still awaiting review"""
+    remove_signatures([event_id])
+    db.session.execute(delete(DuplicateCandidate).where(
+        or_(DuplicateCandidate.event_id == event_id, DuplicateCandidate.duplicate_of_id == event_id),
+        DuplicateCandidate.status == 'pending'
+    ))
+
+
+def store_signatures(signed):
+    """Replace the stored signature and buckets of each signed event"""
+    if not signed:
+        return
+    remove_signatures([record.event_id for record in signed])
+    now = datetime.utcnow()
+    db.session.execute(insert(EventSignature), [
+        {'event_id': record.event_id, 'signature': array('I', record.signature).tobytes(),
+         'date_key': record.date_key, 'updated_at': now}
+        for record in signed
+    ])
+    db.session.execute(insert(EventBand), [
+        {'band': band, 'bucket': bucket, 'event_id': record.event_id}
+        for record in signed for band, bucket in enumerate(record.buckets)
+    ])
+
+
+def similar_events(signed, threshold):
+    """Stored events at least threshold similar to each signed event: {event id: [(other id, similarity)]}"""
+    wanted = {}
+    for record in signed:
+        for band, bucket in enumerate(record.buckets):
+            wanted.setdefault((band, bucket), []).append(record.event_id)
+    pairs = set()
+    for chunk in _chunks({bucket for _, bucket in wanted}):
+        for band, bucket, other_id in db.session.execute(
+            select(EventBand.band, EventBand.bucket, EventBand.event_id).where(EventBand.bucket.in_(chunk))
+        ):
+            for event_id in wanted.get((band, bucket), ()):
+                if other_id != event_id:
+                    pairs.add((event_id, other_id))
+
+    signatures = {}
+    for chunk in _chunks({other_id for _, other_id in pairs}):
+        # The join skips signatures left behind by events that were archived or deleted elsewhere
+        for other_id, blob in db.session.execute(
+            select(EventSignature.event_id, EventSignature.signature).join(
+                Event, Event.id == EventSignature.event_id).where(EventSignature.event_id.in_(chunk))
+        ):
+            signatures[other_id] = array('I', blob)
+    own = {record.event_id: record.signature for record in signed}
+    matches = {}
+    for event_id, other_id in pairs:
+        if other_id in signatures:
+            score = similarity(own[event_id], signatures[other_id])
+            if score >= threshold:
+                matches.setdefault(event_id, []).append((other_id, score))
+    for found in matches.values():
+        found.sort(key=lambda match: (-match[1], match[0]))
+    return matches
+
+
+def flag_duplicates(matches):
+    """Record each matched pair once, newer event first; pairs already reviewed keep their status"""
+    rows = {}
+    for event_id, found in matches.items():
+        for other_id, score in found:
+            pair = (max(event_id, other_id), min(event_id, other_id))
+            rows[pair] = {'event_id': pair[0], 'duplicate_of_id': pair[1], 'similarity': score,
+                          'status': 'pending', 'created_at': datetime.utcnow()}
+    if not rows:
+        return 0
+    result = db.session.execute(insert(DuplicateCandidate.__table__).prefix_with('OR IGNORE'), list(rows.values()))
+    return result.rowcount
+
+
+def check_event(event, threshold=None):
+    """Index a created or edited event and flag the events it nearly duplicates
+
+    Returns [(other event id, similarity)], most similar first. The caller commits.
+    """
+    if not eligible(event):
+        remove_signatures([event.id])
+        return []
+    signed = sign([(event.id, event.title, event.description, event.location, event.date)])
+    store_signatures(signed)
+    matches = similar_events(signed, threshold or dedup_threshold())
+    flag_duplicates(matches)
+    return matches.get(event.id, [])
+
+
+def find_duplicates(event, threshold=None):
+    """Events similar to one event without indexing it or flagging anything"""
+    if not eligible(event):
+        return []
+    signed = sign([(event.id, event.title, event.description, event.location, event.date)])
+    return similar_events(signed, threshold or dedup_threshold()).get(event.id, [])
+
+
+def scan_duplicates(threshold=None, rebuild=False, chunk_size=1000, log=None):
+    """Sign every event that has no signature yet (every event with rebuild) and flag duplicates among all events
+
+    Events are read in id order, chunk_size at a time; each chunk is signed in
+    one vectorized pass, stored, looked up against the band index and
+    committed. Run with rebuild after changing the feature extraction.
+    """
+    threshold = threshold or dedup_threshold()
+    started = time.perf_counter()
+    stats = {'signed': 0, 'flagged': 0, 'vectorized': numpy is not None}
+    if rebuild:
+        db.session.execute(delete(EventBand))
+        db.session.execute(delete(EventSignature))
+    else:
+        for table in ('event_band', 'event_signature'):
+            db.session.execute(text(f'DELETE FROM {table} WHERE event_id NOT IN (SELECT id FROM event)'))
+    db.session.commit()
+
+    query = select(*SIGNED_COLUMNS).where(Event.recurrence_rule.is_(None), Event.series_id.is_(None))
+    if not rebuild:
+        query = query.outerjoin(EventSignature, EventSignature.event_id == Event.id).where(
+            EventSignature.event_id.is_(None))
+    last_id = 0
+    while True:
+        rows = db.session.execute(query.where(Event.id > last_id).order_by(Event.id).limit(chunk_size)).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        signed = sign(rows)
+        store_signatures(signed)
+        stats['flagged'] += flag_duplicates(similar_events(signed, threshold))
+        db.session.commit()
+        stats['signed'] += len(signed)
+        if log:
+            log(f"  signed {stats['signed']} events, {stats['flagged']} duplicate pairs flagged")
+    stats['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+    return stats
+
+
+def merge_events(keep_id, duplicate_id):
+    """Move RSVPs, bookmarks, helper requests, invitations and stats to the kept event and delete the duplicate
+
+    A user with an RSVP or bookmark on both events keeps the one on the kept
+    event; daily stats for a day both events have are added together. The
+    caller commits.
+    """
+    params = {'keep': keep_id, 'duplicate': duplicate_id}
+    for table, unique in MERGED_ROWS:
+        if unique:
+            if table in MERGED_SUMS:
+                sums = ', '.join(
+                    f'{column} = {column} + (SELECT duplicate.{column} FROM {table} AS duplicate '
+                    f'WHERE duplicate.event_id = :duplicate AND duplicate.{unique} = {table}.{unique})'
+                    for column in MERGED_SUMS[table]
+                )
+                db.session.execute(text(
+                    f'UPDATE {table} SET {sums} WHERE event_id = :keep '
+                    f'AND {unique} IN (SELECT {unique} FROM {table} WHERE event_id = :duplicate)'
+                ), params)
+            db.session.execute(text(
+                f'UPDATE {table} SET event_id = :keep WHERE event_id = :duplicate '
+                f'AND {unique} NOT IN (SELECT {unique} FROM {table} WHERE event_id = :keep)'
+            ), params)
+            db.session.execute(text(f'DELETE FROM {table} WHERE event_id = :duplicate'), params)
+        else:
+            db.session.execute(text(f'UPDATE {table} SET event_id = :keep WHERE event_id = :duplicate'), params)
+    remove_signatures([duplicate_id])
+    now = datetime.utcnow()
+    db.session.execute(DuplicateCandidate.__table__.update().where(
+        DuplicateCandidate.event_id.in_((keep_id, duplicate_id)),
+        DuplicateCandidate.duplicate_of_id.in_((keep_id, duplicate_id))
+    ).values(status='merged', resolved_at=now))
+    # Other pairs involving the deleted event have nothing left to review
+    db.session.execute(delete(DuplicateCandidate).where(
+        or_(DuplicateCandidate.event_id == duplicate_id, DuplicateCandidate.duplicate_of_id == duplicate_id),
+        DuplicateCandidate.status == 'pending'
+    ))
+    db.session.execute(delete(Event).where(Event.id == duplicate_id))
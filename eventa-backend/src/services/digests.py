@@ -0,0 +1,317 @@
+"""
+Personalized event digests, generated in bulk
+
+A digest lists new public events in the user's interest categories and
+events in the coming days that their accepted friends are going to, leaving
+out events the user has already RSVP'd to or organizes.
+
+Nothing is computed per user against the database. The parent process reads
+the period's new events (top DIGEST_ITEMS per category) and upcoming events
+once. Users are then split into id ranges that a process pool works through;
+each range is answered with three set-based queries (users with profiles,
+friends' RSVPs to upcoming events grouped per user, and the range's own
+RSVPs), and its digests are written as one JSON Lines file in the outbox:
+
+    <outbox>/<frequency>-<as_of>/digests-<first id>-<last id>.jsonl
+    <outbox>/<frequency>-<as_of>/summary.json
+
+Files are written under a temporary name and renamed, so a sender reading the
+outbox never sees a partial file, and re-running a period overwrites it.
+
+notification_preferences is a JSON object; {"digest": "weekly"} (the default),
+"daily" or "off" picks which runs include the user.
+"""
+
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import create_engine, text
+
+from src.services.archive import parse_event_date
+
+DIGEST_FREQUENCIES = {'daily': 1, 'weekly': 7}
+DIGEST_PREFERENCES = ('daily', 'weekly', 'off')
+DEFAULT_DIGEST = 'weekly'
+DIGEST_ITEMS = 5
+
+NEW_EVENTS_SQL = text(
+    "SELECT id, title, date, time, location, category, organizer_id, attendees_count FROM event "
+    "WHERE created_at >= :since AND created_at < :until AND visibility = 'public' "
+    "AND recurrence_rule IS NULL AND series_id IS NULL"
+)
+# ISO dates are range-filtered in SQL; free-form dates are parsed afterwards
+UPCOMING_EVENTS_SQL = text(
+    "SELECT id, title, date, time, location, category, organizer_id, attendees_count FROM event "
+    "WHERE visibility = 'public' AND recurrence_rule IS NULL "
+    "AND (date BETWEEN :start AND :end OR date NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*')"
+)
+USERS_SQL = text(
+    "SELECT user.id, user.username, user.email, user_profile.display_name, user_profile.interests, "
+    "user_profile.notification_preferences FROM user "
+    "LEFT JOIN user_profile ON user_profile.user_id = user.id "
+    "WHERE user.id BETWEEN :first AND :last"
+)
+FRIENDS_GOING_SQL = text(
+    "WITH friend AS ("
+    " SELECT requester_id AS user_id, addressee_id AS friend_id FROM friendship"
+    " WHERE status = 'accepted' AND requester_id BETWEEN :first AND :last"
+    " UNION ALL"
+    " SELECT addressee_id, requester_id FROM friendship"
+    " WHERE status = 'accepted' AND addressee_id BETWEEN :first AND :last"
+    "), upcoming AS (SELECT value AS event_id FROM json_each(:event_ids)) "
+    "SELECT friend.user_id, rsvp.event_id, COUNT(*) AS friends_going "
+    "FROM friend "
+    "JOIN rsvp ON rsvp.user_id = friend.friend_id AND rsvp.status = 'going' "
+    "JOIN upcoming ON upcoming.event_id = rsvp.event_id "
+    "WHERE NOT EXISTS (SELECT 1 FROM rsvp AS own WHERE own.user_id = friend.user_id AND own.event_id = rsvp.event_id) "
+    "GROUP BY friend.user_id, rsvp.event_id"
+)
+OWN_RSVPS_SQL = text(
+    "SELECT user_id, event_id FROM rsvp "
+    "WHERE user_id BETWEEN :first AND :last AND event_id IN (SELECT value FROM json_each(:event_ids))"
+)
+
+# Per worker process: engine, shared context and output directory, set by _init_worker
+_worker = {}
+
+
+def digest_preference(value):
+    """The digest setting in a notification_preferences JSON string, or None when it is unreadable"""
+    if not value:
+        return DEFAULT_DIGEST
+    try:
+        preferences = json.loads(value)
+    except ValueError:
+        return None
+    setting = preferences.get('digest', DEFAULT_DIGEST) if isinstance(preferences, dict) else None
+    return setting if setting in DIGEST_PREFERENCES else None
+
+
+def _summary(row, event_date):
+    return {
+        'id': row.id,
+        'title': row.title,
+        'date': event_date.isoformat(),
+        'time': row.time,
+        'location': row.location,
+        'category': row.category,
+    }
+
+
+def digest_context(conn, as_of, frequency):
+    """What every user's digest is picked from: new events per category and upcoming events"""
+    days = DIGEST_FREQUENCIES[frequency]
+    since = datetime.combine(as_of - timedelta(days=days), datetime.min.time())
+    until = datetime.combine(as_of, datetime.min.time())
+    window_end = as_of + timedelta(days=days)
+
+    by_category = {}
+    events = {}
+    for row in conn.execute(NEW_EVENTS_SQL, {'since': since, 'until': until}):
+        event_date = parse_event_date(row.date)
+        if event_date is None or event_date < as_of:
+            continue
+        events[row.id] = dict(_summary(row, event_date), organizer_id=row.organizer_id)
+        by_category.setdefault((row.category or '').lower(), []).append((-(row.attendees_count or 0), row.id))
+    # A user gets at most DIGEST_ITEMS events, so no category needs more candidates than that
+    new_by_category = {category: [event_id for _, event_id in sorted(ranked)[:DIGEST_ITEMS]]
+                       for category, ranked in by_category.items()}
+    # Order of new events across categories: most attended first, then oldest id
+    new_rank = {event_id: rank for rank, (_, event_id) in enumerate(sorted(
+        entry for ranked in by_category.values() for entry in sorted(ranked)[:DIGEST_ITEMS]
+    ))}
+    new_ids = sorted(new_rank)
+
+    upcoming = []
+    for row in conn.execute(UPCOMING_EVENTS_SQL, {'start': as_of.isoformat(), 'end': window_end.isoformat() + '~'}):
+        event_date = parse_event_date(row.date)
+        if event_date is not None and as_of <= event_date < window_end:
+            events.setdefault(row.id, dict(_summary(row, event_date), organizer_id=row.organizer_id))
+            upcoming.append(row.id)
+
+    return {
+        'as_of': as_of.isoformat(),
+        'frequency': frequency,
+        'events': {event_id: events[event_id] for event_id in set(new_ids) | set(upcoming)},
+        'new_by_category': new_by_category,
+        'new_rank': new_rank,
+        'new_ids': json.dumps(new_ids),
+        'upcoming_ids': json.dumps(sorted(upcoming)),
+    }
+
+
+def build_digest(user, context, friends_going, own_rsvps):
+    """One user's digest, or None when there is nothing to tell them"""
+    events = context['events']
+    interests = [interest.strip().lower() for interest in (user.interests or '').split(',') if interest.strip()]
+    candidates = {event_id for interest in interests for event_id in context['new_by_category'].get(interest, ())}
+    new_events = sorted(
+        (event_id for event_id in candidates
+         if event_id not in own_rsvps and events[event_id]['organizer_id'] != user.id),
+        key=context['new_rank'].get
+    )[:DIGEST_ITEMS]
+    plans = sorted(
+        ((event_id, count) for event_id, count in friends_going if events[event_id]['organizer_id'] != user.id),
+        key=lambda plan: (-plan[1], events[plan[0]]['date'], plan[0])
+    )[:DIGEST_ITEMS]
+    if not new_events and not plans:
+        return None
+
+    def public(event_id):
+        return {key: value for key, value in events[event_id].items() if key != 'organizer_id'}
+
+    return {
+        'user_id': user.id,
+        'email': user.email,
+        'name': user.display_name or user.username,
+        'frequency': context['frequency'],
+        'as_of': context['as_of'],
+        'new_events': [public(event_id) for event_id in new_events],
+        'friends_plans': [dict(public(event_id), friends_going=count) for event_id, count in plans],
+    }
+
+
+def _init_worker(database_uri, context, run_dir):
+    _worker['engine'] = create_engine(database_uri)
+    _worker['context'] = context
+    _worker['run_dir'] = run_dir
+
+
+def _digest_range(first, last):
+    """Write the digests for users first..last and return counts"""
+    context = _worker['context']
+    started = time.perf_counter()
+    counts = {'users': 0, 'digests': 0, 'empty': 0, 'opted_out': 0}
+    with _worker['engine'].connect() as conn:
+        params = {'first': first, 'last': last}
+        users = conn.execute(USERS_SQL, params).all()
+        friends_going = {}
+        for row in conn.execute(FRIENDS_GOING_SQL, dict(params, event_ids=context['upcoming_ids'])):
+            friends_going.setdefault(row.user_id, []).append((row.event_id, row.friends_going))
+        own_rsvps = {}
+        for row in conn.execute(OWN_RSVPS_SQL, dict(params, event_ids=context['new_ids'])):
+            own_rsvps.setdefault(row.user_id, set()).add(row.event_id)
+
+    path = os.path.join(_worker['run_dir'], f'digests-{first:09d}-{last:09d}.jsonl')
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        for user in users:
+            counts['users'] += 1
+            if digest_preference(user.notification_preferences) != context['frequency']:
+                counts['opted_out'] += 1
+                continue
+            digest = build_digest(user, context, friends_going.get(user.id, ()), own_rsvps.get(user.id, ()))
+            if digest is None:
+                counts['empty'] += 1
+                continue
+            f.write(json.dumps(digest, separators=(',', ':')) + '\n')
+            counts['digests'] += 1
+    os.replace(path + '.tmp', path)
+    counts['seconds'] = time.perf_counter() - started
+    return counts
+
+
+def generate_digests(database_uri, outbox, as_of=None, frequency='weekly', workers=None, chunk_size=5000, log=None):
+    """Write every user's digest for the period ending at as_of to the outbox and return timings and counts
+
+    workers=1 runs in this process; otherwise user ranges are spread over a
+    spawned process pool (spawn, so it is safe from threaded servers).
+    """
+    started = time.perf_counter()
+    as_of = as_of or date.today()
+    if frequency not in DIGEST_FREQUENCIES:
+        raise ValueError(f"frequency must be one of: {', '.join(DIGEST_FREQUENCIES)}")
+    workers = workers or os.cpu_count() or 1
+
+    engine = create_engine(database_uri)
+    with engine.connect() as conn:
+        context = digest_context(conn, as_of, frequency)
+        first_id, last_id = conn.execute(text('SELECT MIN(id), MAX(id) FROM user')).one()
+    engine.dispose()
+    context_seconds = time.perf_counter() - started
+
+    run_dir = os.path.join(outbox, f"{frequency}-{as_of.isoformat()}")
+    os.makedirs(run_dir, exist_ok=True)
+    ranges = [(start, min(start + chunk_size - 1, last_id))
+              for start in range(first_id or 1, (last_id or 0) + 1, chunk_size)]
+
+    totals = {'users': 0, 'digests': 0, 'empty': 0, 'opted_out': 0}
+    chunk_seconds = []
+
+    def collect(counts):
+        chunk_seconds.append(counts.pop('seconds'))
+        for key, value in counts.items():
+            totals[key] += value
+        if log:
+            log(f"  {len(chunk_seconds)}/{len(ranges)} ranges, {totals['digests']} digests "
+                f"({time.perf_counter() - started:.1f}s)")
+
+    if workers == 1:
+        _init_worker(database_uri, context, run_dir)
+        for first, last in ranges:
+            collect(_digest_range(first, last))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker, initargs=(database_uri, context, run_dir)) as pool:
+            for counts in pool.map(_digest_range, *zip(*ranges)) if ranges else ():
+                collect(counts)
+
+    stats = dict(
+        totals,
+        as_of=as_of.isoformat(),
+        frequency=frequency,
+        workers=workers,
+        chunk_size=chunk_size,
+        ranges=len(ranges),
+        new_events=len(json.loads(context['new_ids'])),
+        upcoming_events=len(json.loads(context['upcoming_ids'])),
+        context_seconds=round(context_seconds, 3),
+        slowest_range_seconds=round(max(chunk_seconds, default=0), 3),
+        elapsed_seconds=round(time.perf_counter() - started, 3),
+        outbox=run_dir,
+    )
+    with open(os.path.join(run_dir, 'summary.json'), 'w') as f:
+        json.dump(stats, f, indent=2, sort_keys=True)
+    return stats
+
+
+def run_digests(as_of=None, frequency='weekly'):
+    """generate_digests with the app's database, outbox and pool settings"""
+    config = current_app.config
+    return generate_digests(
+        config['SQLALCHEMY_DATABASE_URI'],
+        config['DIGEST_OUTBOX'],
+        as_of=as_of,
+        frequency=frequency,
+        workers=config.get('DIGEST_WORKERS'),
+        chunk_size=config.get('DIGEST_CHUNK_SIZE', 5000),
+    )
+
+
+def digest_coalesce_key(frequency):
+    # The weekly run keeps the key it had before daily runs existed, so an already queued run is reused
+    return 'generate_digests' if frequency == 'weekly' else f'generate_digests:{frequency}'
+
+
+def schedule_digests(frequency=None):
+    """Queue the next run of one frequency, or of each; inline job mode has no scheduler, so use src/generate_digests.py there"""
+    from src.jobs.worker import enqueue_job
+
+    if current_app.config['JOBS_MODE'] == 'inline':
+        return
+    for name in [frequency] if frequency else DIGEST_FREQUENCIES:
+        interval = current_app.config['DIGEST_INTERVALS'][name]
+        if interval > 0:
+            enqueue_job('generate_digests', {'frequency': name}, coalesce_key=digest_coalesce_key(name), delay=interval)
+
+
+def init_digests(app):
+    app.config.setdefault('DIGEST_INTERVALS', {'daily': 24 * 60 * 60, 'weekly': 7 * 24 * 60 * 60})
+    app.config.setdefault('DIGEST_CHUNK_SIZE', 5000)
+    if 'jobs' in app.extensions:
+        with app.app_context():
+            schedule_digests()
@@ -0,0 +1,116 @@
+from collections import namedtuple
+from datetime import date, timedelta
+
+from flask import request
+from sqlalchemy import func, select
+
+from src.models.user import db
+from src.models.event import Event
+from src.services.archive import get_archive, parse_event_date
+
+DATE_BUCKETS = ('past', 'this_week', 'this_month', 'later', 'undated')
+FacetRow = namedtuple('FacetRow', 'category date is_free helpers_needed count')
+
+
+class FacetSelection:
+    """The facet filters picked in a request, as SQL conditions and as a test on grouped rows"""
+
+    def __init__(self, category=None, price_filter=None, helpers_needed=None):
+        self.category = category if category and category != 'all' else None
+        self.price_filter = price_filter if price_filter in ('free', 'paid') else None
+        self.helpers_needed = helpers_needed == 'true'
+
+    def conditions(self, columns):
+        filters = []
+        if self.category:
+            filters.append(columns.category.ilike(f'%{self.category}%'))
+        if self.helpers_needed:
+            filters.append(columns.helpers_needed == True)
+        if self.price_filter == 'free':
+            filters.append(columns.price_cents == 0)
+        elif self.price_filter == 'paid':
+            filters.append(columns.price_cents > 0)
+        return filters
+
+    def matches(self, group):
+        """Which selected facets a grouped row passes, mirroring conditions(): (category, price, helpers_needed)"""
+        category = not self.category or bool(group.category) and self.category.lower() in group.category.lower()
+        # Unparsed (NULL) prices match neither price filter in SQL
+        price = not self.price_filter or (
+            group.is_free is not None and bool(group.is_free) == (self.price_filter == 'free')
+        )
+        helpers = not self.helpers_needed or bool(group.helpers_needed)
+        return category, price, helpers
+
+
+def date_bucket(value, today):
+    day = parse_event_date(value)
+    if day is None:
+        return 'undated'
+    if day < today:
+        return 'past'
+    if day <= today + timedelta(days=6):
+        return 'this_week'
+    if day <= today + timedelta(days=30):
+        return 'this_month'
+    return 'later'
+
+
+def _grouped(columns, conditions):
+    is_free = (columns.price_cents == 0).label('is_free')
+    return select(
+        columns.category, columns.date, is_free, columns.helpers_needed, func.count().label('count')
+    ).where(*conditions).group_by(columns.category, columns.date, is_free, columns.helpers_needed)
+
+
+def occurrence_groups(occurrences):
+    """Grouped-row stand-ins for generated occurrences of recurring series, one per occurrence"""
+    for occurrence in occurrences:
+        is_free = None if occurrence.price_cents is None else occurrence.price_cents == 0
+        yield FacetRow(occurrence.category, occurrence.date, is_free, occurrence.helpers_needed, 1)
+
+
+def event_facets(base_conditions, selection, include_past=False, today=None, occurrences=()):
+    """Facet counts for a listing in one grouped pass over the events matching base_conditions
+
+    base_conditions(columns) holds every filter except the facets themselves.
+    Rows are grouped by the facet columns, and each facet is counted over the
+    groups that pass the other selected facets, so picking a category still
+    shows how many events the other categories would have. Dates are free-form
+    text, so they are bucketed per group after the query. Generated occurrences
+    of recurring series are not rows, so they are passed in and counted as well.
+    """
+    today = today or date.today()
+    groups = list(db.session.execute(_grouped(Event, base_conditions(Event))))
+    if include_past:
+        table = get_archive().tables['event']
+        groups.extend(get_archive().rows(_grouped(table.c, base_conditions(table.c))))
+    groups.extend(occurrence_groups(occurrences))
+
+    facets = {
+        'category': {},
+        'price': {'free': 0, 'paid': 0},
+        'helpers_needed': {'true': 0, 'false': 0},
+        'date': {bucket: 0 for bucket in DATE_BUCKETS},
+        'total': 0
+    }
+    buckets = {}
+    for group in groups:
+        category, price, helpers = selection.matches(group)
+        if price and helpers and group.category:
+            facets['category'][group.category] = facets['category'].get(group.category, 0) + group.count
+        if category and helpers and group.is_free is not None:
+            facets['price']['free' if group.is_free else 'paid'] += group.count
+        if category and price:
+            facets['helpers_needed']['true' if group.helpers_needed else 'false'] += group.count
+            if helpers:
+                if group.date not in buckets:
+                    buckets[group.date] = date_bucket(group.date, today)
+                facets['date'][buckets[group.date]] += group.count
+                facets['total'] += group.count
+    return facets
+
+
+def facets_requested():
+    """Listings include facet counts when the client asks with facets=1"""
+    return request.args.get('facets', '').lower() in ('1', 'true')
@@ -0,0 +1,333 @@
+"""
+Cached iCalendar feeds of the events a user is going to or has bookmarked
+
+Calendar apps poll a subscription every few minutes, and almost every poll
+finds nothing new. A feed is therefore built from two caches:
+
+- which events are in a user's feed, read with one query over rsvp or
+  bookmark and dropped when that user RSVPs or (un)bookmarks;
+- the rendered VEVENT text of each event, shared by every feed that lists
+  it and dropped when the event, or an occurrence of its series, changes.
+
+An assembled feed keeps its body and an ETag (a hash of the body), so a
+poll with a matching If-None-Match gets a 304 without touching the
+database. Rebuilding a feed after an invalidation only renders the events
+that are not already cached.
+
+Like the suggestion index, the caches live in process memory. Writes made
+by other processes (imports, job workers, other app instances) are picked
+up when a feed's entry expires after CALENDAR_CACHE_SECONDS; the ETag only
+changes if the rebuilt body does.
+"""
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from src.models.user import db
+from src.models.event import Event, RSVP
+from src.models.social import Bookmark
+from src.services.archive import parse_event_date
+from src.services.recurrence import WEEKDAYS, RecurrenceRule, series_exdates
+
+FEEDS = {
+    'going': 'Events I\'m going to',
+    'bookmarks': 'My bookmarked events',
+}
+PRODID = '-//Eventa//Eventa Calendar Feed//EN'
+EVENT_COLUMNS = (Event.id, Event.title, Event.description, Event.date, Event.time, Event.location, Event.category,
+                 Event.price, Event.recurrence_rule, Event.recurrence_exdates, Event.series_id, Event.occurrence_date,
+                 Event.created_at, Event.updated_at)
+CLOCK = re.compile(r'(\d{1,2})(?::(\d{2}))?\s*([AaPp][Mm])?')
+
+
+def _clock(match):
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), match.group(3)
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem.lower() == 'pm' else 0)
+    if hour > 23 or minute > 59:
+        return None
+    return hour, minute
+
+
+def parse_event_times(value):
+    """Start and end (hour, minute) from the free-form time column ('19:00', '7:00 PM - 11:00 PM')
+
+    Either is None when it can't be read; an event without a start time is
+    rendered as an all-day event.
+    """
+    if not value:
+        return None, None
+    parts = value.split('-', 1)
+    start = CLOCK.fullmatch(parts[0].strip())
+    if start is None:
+        return None, None
+    end = CLOCK.fullmatch(parts[1].strip()) if len(parts) > 1 else None
+    return _clock(start), _clock(end) if end else None
+
+
+def _escape(value):
+    return (value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def _fold(line):
+    """Split a content line into 75-octet pieces as RFC 5545 requires"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line
+    pieces = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        # Never split inside a multi-byte character
+        while cut < len(encoded) and encoded[cut] & 0xC0 == 0x80:
+            cut -= 1
+        pieces.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+        limit = 74
+    return '\r\n '.join(pieces)
+
+
+def _utc(value):
+    return (value or datetime(1970, 1, 1)).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _starts(day, times):
+    """DTSTART value and parameters for a day at the event's start time, or all day"""
+    start, end = times
+    if start is None:
+        return ';VALUE=DATE', day.strftime('%Y%m%d'), None
+    begins = datetime(day.year, day.month, day.day, *start)
+    ends = None
+    if end is not None:
+        ends = datetime(day.year, day.month, day.day, *end)
+        if ends <= begins:
+            # '10:00 PM - 2:00 AM' ends the next morning
+            ends += timedelta(days=1)
+    return '', begins.strftime('%Y%m%dT%H%M%S'), ends and ends.strftime('%Y%m%dT%H%M%S')
+
+
+def _rrule(rule, timed):
+    parts = [f'FREQ={rule.freq}']
+    if rule.interval != 1:
+        parts.append(f'INTERVAL={rule.interval}')
+    if rule.count is not None:
+        parts.append(f'COUNT={rule.count}')
+    if rule.until is not None:
+        # UNTIL has to match DTSTART's type; a timed series runs to the end of its last day
+        parts.append(f"UNTIL={rule.until.strftime('%Y%m%d')}{'T235959' if timed else ''}")
+    if rule.bydays:
+        parts.append('BYDAY=' + ','.join(f"{ordinal or ''}{WEEKDAYS[weekday]}" for ordinal, weekday in rule.bydays))
+    if rule.monthdays:
+        parts.append('BYMONTHDAY=' + ','.join(str(day) for day in rule.monthdays))
+    return ';'.join(parts)
+
+
+def render_vevent(event, recurrence_id=None, uid_id=None):
+    """The VEVENT lines for one event row, or [] when its date can't be read"""
+    day = parse_event_date(event.occurrence_date or event.date)
+    if day is None:
+        return []
+    times = parse_event_times(event.time)
+    value_type, starts, ends = _starts(day, times)
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:event-{uid_id or event.id}@eventa',
+        f'DTSTAMP:{_utc(event.updated_at or event.created_at)}',
+        f'LAST-MODIFIED:{_utc(event.updated_at or event.created_at)}',
+        f'DTSTART{value_type}:{starts}',
+    ]
+    if ends:
+        lines.append(f'DTEND:{ends}')
+    if recurrence_id is not None:
+        lines.append(f'RECURRENCE-ID{value_type}:{_starts(recurrence_id, times)[1]}')
+    elif event.recurrence_rule:
+        try:
+            rule = RecurrenceRule.parse(event.recurrence_rule)
+        except ValueError:
+            rule = None
+        if rule is not None:
+            lines.append(f'RRULE:{_rrule(rule, times[0] is not None)}')
+            for exdate in sorted(series_exdates(event)):
+                lines.append(f'EXDATE{value_type}:{_starts(exdate, times)[1]}')
+    lines.append(f'SUMMARY:{_escape(event.title)}')
+    if event.description:
+        lines.append(f'DESCRIPTION:{_escape(event.description)}')
+    if event.location:
+        lines.append(f'LOCATION:{_escape(event.location)}')
+    if event.category:
+        lines.append(f'CATEGORIES:{_escape(event.category)}')
+    lines.append('END:VEVENT')
+    return [_fold(line) for line in lines]
+
+
+class CalendarFeeds:
+    def __init__(self, max_age=300, max_feeds=10000, max_events=50000):
+        self.max_age = max_age
+        self.max_feeds = max_feeds
+        self.max_events = max_events
+        self._members = {}  # (user_id, feed) -> event ids in the feed
+        self._feeds = OrderedDict()  # (user_id, feed) -> (body, etag, built at, event ids), least recently used first
+        self._events = OrderedDict()  # event id -> rendered VEVENT text, least recently used first
+        self._occurrences = {}  # series id -> ids of its cached occurrence rows
+        self._listed_in = {}  # event id -> feeds built with it
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _drop_feed(self, key):
+        cached = self._feeds.pop(key, None)
+        if cached is not None:
+            for event_id in cached[3]:
+                feeds = self._listed_in.get(event_id)
+                if feeds is not None:
+                    feeds.discard(key)
+                    if not feeds:
+                        del self._listed_in[event_id]
+
+    def invalidate_user(self, user_id):
+        """The user's RSVPs or bookmarks changed"""
+        with self._lock:
+            self._generation += 1
+            for feed in FEEDS:
+                self._members.pop((user_id, feed), None)
+                self._drop_feed((user_id, feed))
+
+    def invalidate_event(self, event_id, series_id=None):
+        """An event changed; pass series_id when it is a stored occurrence of that series"""
+        with self._lock:
+            self._generation += 1
+            event_ids = {event_id} | self._occurrences.pop(event_id, set())
+            if series_id is not None:
+                event_ids.add(series_id)
+            for changed in event_ids:
+                self._events.pop(changed, None)
+                for key in self._listed_in.pop(changed, ()):
+                    # Re-read membership too, in case the event was deleted
+                    self._members.pop(key, None)
+                    self._drop_feed(key)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._members.clear()
+            self._feeds.clear()
+            self._events.clear()
+            self._occurrences.clear()
+            self._listed_in.clear()
+
+    def _member_ids(self, user_id, feed):
+        if feed == 'going':
+            query = db.session.query(Event.id, Event.series_id).join(RSVP, RSVP.event_id == Event.id).filter(
+                RSVP.user_id == user_id, RSVP.status == 'going')
+        else:
+            query = db.session.query(Event.id, Event.series_id).join(Bookmark, Bookmark.event_id == Event.id).filter(
+                Bookmark.user_id == user_id)
+        rows = query.all()
+        listed = {row.id for row in rows}
+        # An occurrence is already in the feed as part of its series
+        return tuple(sorted(row.id for row in rows if row.series_id not in listed))
+
+    def _render(self, event_ids):
+        """VEVENT text for events not in the cache: one query for the rows, one for overridden occurrences"""
+        rendered = {}
+        rows = db.session.query(*EVENT_COLUMNS).filter(Event.id.in_(event_ids)).all() if event_ids else []
+        series_ids = [row.id for row in rows if row.recurrence_rule]
+        overrides = {}
+        if series_ids:
+            for row in db.session.query(*EVENT_COLUMNS).filter(
+                Event.series_id.in_(series_ids), Event.occurrence_overrides.isnot(None)
+            ):
+                overrides.setdefault(row.series_id, []).append(row)
+        occurrences = {}
+        for row in rows:
+            lines = render_vevent(row)
+            for occurrence in overrides.get(row.id, ()):
+                day = parse_event_date(occurrence.occurrence_date)
+                if day is not None:
+                    lines += render_vevent(occurrence, recurrence_id=day, uid_id=row.id)
+                occurrences.setdefault(row.id, set()).add(occurrence.id)
+            if row.series_id is not None:
+                occurrences.setdefault(row.series_id, set()).add(row.id)
+            rendered[row.id] = '\r\n'.join(lines) + '\r\n' if lines else ''
+        return rendered, occurrences
+
+    def feed(self, user_id, feed):
+        """(body, etag) for one user's feed, rebuilt only from what changed since it was last served"""
+        key = (user_id, feed)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._feeds.get(key)
+            if cached is not None and now - cached[2] < self.max_age:
+                self._feeds.move_to_end(key)
+                return cached[0], cached[1]
+            if cached is not None:
+                # Expired: re-read membership and events in case another process changed them
+                self._members.pop(key, None)
+                for event_id in cached[3]:
+                    self._events.pop(event_id, None)
+                self._drop_feed(key)
+            generation = self._generation
+            members = self._members.get(key)
+        if members is None:
+            members = self._member_ids(user_id, feed)
+        with self._lock:
+            missing = [event_id for event_id in members if event_id not in self._events]
+        rendered, occurrences = self._render(missing)
+
+        with self._lock:
+            chunks = []
+            for event_id in members:
+                text = rendered.get(event_id)
+                if text is None:
+                    text = self._events.get(event_id)
+                    if text is not None:
+                        self._events.move_to_end(event_id)
+                chunks.append(text or '')
+            body = ''.join([
+                'BEGIN:VCALENDAR\r\n',
+                'VERSION:2.0\r\n',
+                f'PRODID:{PRODID}\r\n',
+                'CALSCALE:GREGORIAN\r\n',
+                'METHOD:PUBLISH\r\n',
+                f'{_fold("X-WR-CALNAME:" + _escape(FEEDS[feed]))}\r\n',
+                *chunks,
+                'END:VCALENDAR\r\n',
+            ])
+            etag = hashlib.sha1(body.encode('utf-8')).hexdigest()[:20]
+            if generation == self._generation:
+                # Nothing was invalidated while this feed was being read, so it can be cached
+                self._members[key] = members
+                for event_id, text in rendered.items():
+                    self._events[event_id] = text
+                for series_id, ids in occurrences.items():
+                    self._occurrences.setdefault(series_id, set()).update(ids)
+                for event_id in members:
+                    self._listed_in.setdefault(event_id, set()).add(key)
+                self._feeds[key] = (body, etag, now, members)
+                self._feeds.move_to_end(key)
+                while len(self._feeds) > self.max_feeds:
+                    evicted = next(iter(self._feeds))
+                    self._drop_feed(evicted)
+                    self._members.pop(evicted, None)
+                while len(self._events) > self.max_events:
+                    self._events.popitem(last=False)
+            return body, etag
+
+
+def get_calendar_feeds():
+    return current_app.extensions['calendar_feeds']
+
+
+def init_calendar_feeds(app):
+    app.extensions['calendar_feeds'] = CalendarFeeds(
+        max_age=app.config.get('CALENDAR_CACHE_SECONDS', 300),
+        max_feeds=app.config.get('CALENDAR_CACHE_SIZE', 10000),
+    )
@@ -0,0 +1,142 @@
+import hashlib
+import io
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Display size name -> target width in pixels
+VARIANT_SIZES = {
+    'thumb': 320,
+    'card': 640,
+    'detail': 1280,
+}
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+ALLOWED_SOURCE_FORMATS = {'JPEG', 'PNG', 'WEBP', 'GIF'}
+MEDIA_URL_PREFIX = '/media/'
+MEDIA_URL_PATTERN = re.compile(r'^/media/(?P<digest>[0-9a-f]{64})\.(?P<ext>jpg|png|webp|gif)$')
+VARIANT_NAME_PATTERN = re.compile(r'^(?P<digest>[0-9a-f]{64})-(?P<size>[a-z]+)\.(?P<ext>webp|jpeg)$')
+SOURCE_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif'}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class InvalidImageError(ValueError):
+    pass
+
+
+def original_filename(digest, source_format):
+    return f'{digest}.{SOURCE_EXTENSIONS[source_format]}'
+
+
+def variant_filename(digest, size, fmt):
+    return f'{digest}-{size}.{fmt}'
+
+
+def media_path(media_root, filename):
+    """Files are sharded by the first two hex digits of their content hash"""
+    return os.path.join(media_root, filename[:2], filename)
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def store_original(media_root, data):
+    """Validate and store an uploaded image under its SHA-256, returning (digest, filename)"""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            source_format = image.format
+            image.verify()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError) as exc:
+        raise InvalidImageError('File is not a readable image') from exc
+    if source_format not in ALLOWED_SOURCE_FORMATS:
+        raise InvalidImageError(f'Unsupported image format: {source_format}')
+
+    digest = hashlib.sha256(data).hexdigest()
+    filename = original_filename(digest, source_format)
+    path = media_path(media_root, filename)
+    if not os.path.exists(path):
+        _write_atomic(path, data)
+    return digest, filename
+
+
+def render_variant(source_path, media_root, digest, size, fmt):
+    """Resize one original to one display size and format; safe to call repeatedly"""
+    target = media_path(media_root, variant_filename(digest, size, fmt))
+    if os.path.exists(target):
+        return target
+    pil_format, options = VARIANT_FORMATS[fmt]
+    with Image.open(source_path) as image:
+        image = ImageOps.exif_transpose(image)
+        width = VARIANT_SIZES[size]
+        if image.width > width:
+            image = image.resize((width, round(image.height * width / image.width)), Image.Resampling.LANCZOS)
+        if pil_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        elif image.mode == 'P':
+            image = image.convert('RGBA')
+        buffer = io.BytesIO()
+        image.save(buffer, pil_format, **options)
+    _write_atomic(target, buffer.getvalue())
+    return target
+
+
+def render_all_variants(source_path, media_root, digest):
+    """Worker entry point: render every size and format for one upload"""
+    return [render_variant(source_path, media_root, digest, size, fmt)
+            for size in VARIANT_SIZES for fmt in VARIANT_FORMATS]
+
+
+def get_executor(max_workers=2):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Spawned, not forked: the web process already runs job worker and write buffer threads
+            _executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+
+def schedule_variants(media_root, filename, max_workers=2):
+    """Render variants in the worker pool without blocking the upload request"""
+    digest = filename.split('.', 1)[0]
+    return get_executor(max_workers).submit(
+        render_all_variants, media_path(media_root, filename), media_root, digest
+    )
+
+
+def find_original(media_root, digest):
+    for ext in SOURCE_EXTENSIONS.values():
+        path = media_path(media_root, f'{digest}.{ext}')
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def image_variant_urls(image_url):
+    """Per display size URLs for an event image
+
+    Uploaded images get resized WebP and JPEG variants; external URLs cannot be
+    resized, so every size points at the original.
+    """
+    if not image_url:
+        return None
+    match = MEDIA_URL_PATTERN.match(image_url)
+    if not match:
+        return {size: {'original': image_url} for size in VARIANT_SIZES}
+    digest = match.group('digest')
+    return {
+        size: {fmt: f'{MEDIA_URL_PREFIX}{variant_filename(digest, size, fmt)}' for fmt in VARIANT_FORMATS}
+        for size in VARIANT_SIZES
+    }
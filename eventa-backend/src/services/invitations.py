@@ -0,0 +1,100 @@
+from datetime import date, datetime
+
+from sqlalchemy import insert, select, union
+
+from src.models.user import User, db
+from src.models.event import Event, RSVP
+from src.models.social import Friendship, Message
+from src.services.archive import get_archive, parse_event_date
+
+AUDIENCES = ('friends', 'past_interested')
+DEFAULT_INVITATION_MESSAGE = 'You have been invited to an event!'
+INSERT_BATCH_SIZE = 5000
+
+
+def friends_of(user_id):
+    """Select the ids of a user's accepted friends"""
+    return select(
+        db.case((Friendship.requester_id == user_id, Friendship.addressee_id), else_=Friendship.requester_id)
+    ).where(
+        Friendship.status == 'accepted',
+        db.or_(Friendship.requester_id == user_id, Friendship.addressee_id == user_id)
+    )
+
+
+def past_event_ids(organizer_id, today=None):
+    """Ids of the organizer's events dated before today; event.date is free-form, so it's parsed here"""
+    today = today or date.today()
+    rows = db.session.execute(select(Event.id, Event.date).where(Event.organizer_id == organizer_id))
+    return [row.id for row in rows if (parse_event_date(row.date) or today) < today]
+
+
+def interested_in_past_events(organizer_id):
+    """Select users who RSVP'd interested to the organizer's events that have already taken place"""
+    return select(RSVP.user_id).where(
+        RSVP.event_id.in_(past_event_ids(organizer_id)),
+        RSVP.status == 'interested'
+    )
+
+
+def interested_in_archived_events(organizer_id):
+    """Ids of users who RSVP'd interested to the organizer's archived events, which are all past"""
+    archive = get_archive()
+    rsvp, event = archive.tables['rsvp'], archive.tables['event']
+    statement = select(rsvp.c.user_id).join(event, event.c.id == rsvp.c.event_id).where(
+        event.c.organizer_id == organizer_id,
+        rsvp.c.status == 'interested'
+    ).distinct()
+    return {row.user_id for row in archive.rows(statement)}
+
+
+def already_invited(event_id):
+    return select(Message.recipient_id).where(Message.event_id == event_id, Message.message_type == 'event_invite')
+
+
+def resolve_recipients(sender_id, event, recipient_ids=(), audiences=()):
+    """Resolve every recipient in one query, excluding the sender, unknown users and anyone already invited"""
+    sources = []
+    if recipient_ids:
+        sources.append(select(User.id).where(User.id.in_(set(recipient_ids))))
+    if 'friends' in audiences:
+        sources.append(friends_of(sender_id))
+    if 'past_interested' in audiences:
+        sources.append(interested_in_past_events(sender_id))
+        archived = interested_in_archived_events(sender_id)
+        if archived:
+            sources.append(select(User.id).where(User.id.in_(archived)))
+    if not sources:
+        return []
+
+    candidates = (union(*sources) if len(sources) > 1 else sources[0]).subquery()
+    candidate_id = candidates.c[0]
+    query = select(candidate_id).where(
+        candidate_id != sender_id,
+        candidate_id.not_in(already_invited(event.id))
+    ).order_by(candidate_id)
+    return [row[0] for row in db.session.execute(query)]
+
+
+def send_invitations(sender_id, event, recipient_ids, content=DEFAULT_INVITATION_MESSAGE):
+    """Insert one event_invite message per recipient with batched executemany"""
+    now = datetime.utcnow()
+    rows = [{
+        'sender_id': sender_id,
+        'recipient_id': recipient_id,
+        'content': content,
+        'message_type': 'event_invite',
+        'event_id': event.id,
+        'is_read': False,
+        'created_at': now
+    } for recipient_id in recipient_ids]
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        db.session.execute(insert(Message), rows[start:start + INSERT_BATCH_SIZE])
+    return len(rows)
+
+
+def fan_out_invitations(sender_id, event, recipient_ids=(), audiences=(), content=DEFAULT_INVITATION_MESSAGE):
+    """Resolve and invite recipients, returning the ids that were invited"""
+    recipients = resolve_recipients(sender_id, event, recipient_ids, audiences)
+    send_invitations(sender_id, event, recipients, content)
+    return recipients
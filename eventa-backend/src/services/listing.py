@@ -0,0 +1,129 @@
+"""
+The event listing behind GET /api/events
+
+The threaded view (src/routes/events.py) and the async read path
+(src/asgi.py) both parse the request into an EventListing and run the
+statements it builds, so the two modes reject the same arguments and list
+the same events in the same order.
+"""
+
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import select
+
+from src.models.user import db
+from src.models.event import Event
+from src.services.analytics import record_impression
+from src.services.facets import FacetSelection
+from src.services.pricing import parse_amount
+from src.services.recurrence import requested_window
+from src.services.visibility import event_visibility
+
+# sort argument -> (ORDER BY built on a column namespace, key for merging archived rows, descending)
+# Price orders follow the price_cents index (ties by id, its rowid order); unpriced events sort last
+EVENT_SORTS = {
+    'newest': (lambda columns: (columns.created_at.desc(),),
+               lambda event: event.created_at or datetime.min, True),
+    'price': (lambda columns: (columns.price_cents.asc().nulls_last(), columns.id),
+              lambda event: (event.price_cents is None, event.price_cents or 0, event.id), False),
+    'price_desc': (lambda columns: (columns.price_cents.desc().nulls_last(), columns.id.desc()),
+                   lambda event: (event.price_cents is None, -(event.price_cents or 0), -event.id), False),
+}
+
+
+class EventListing:
+    """The filters, occurrence window and order of one listing request
+
+    Conditions are built against a column namespace so the same filters apply
+    to the archive. Raises ValueError with a message for the client when an
+    argument is invalid.
+    """
+
+    def __init__(self, args, viewer_id):
+        self.search = args.get('search')
+        self.location = args.get('location')
+        self.currency = args.get('currency')
+        self.sort = args.get('sort', 'newest')
+        if self.sort not in EVENT_SORTS:
+            raise ValueError(f"sort must be one of: {', '.join(EVENT_SORTS)}")
+        self.price_range = {}
+        for arg in ('min_price', 'max_price'):
+            if args.get(arg):
+                try:
+                    self.price_range[arg] = parse_amount(args[arg])
+                except ValueError:
+                    raise ValueError(f'{arg} must be a non-negative number')
+        self.selection = FacetSelection(
+            category=args.get('category'),
+            price_filter=args.get('price_filter'),  # free, paid
+            helpers_needed=args.get('helpers_needed')
+        )
+        self.viewer_id = viewer_id
+        self.window_start, self.window_end = requested_window(args)
+        self.order_by, self.merge_key, self.descending = EVENT_SORTS[self.sort]
+
+    def matching(self, columns, materialize=False):
+        filters = [event_visibility(columns, self.viewer_id, materialize)]
+
+        if self.search:
+            filters.append(
+                db.or_(
+                    columns.title.ilike(f'%{self.search}%'),
+                    columns.description.ilike(f'%{self.search}%'),
+                    columns.location.ilike(f'%{self.search}%')
+                )
+            )
+
+        if self.location:
+            filters.append(columns.location.ilike(f'%{self.location}%'))
+
+        # Amounts are in major units of the event's own currency, compared as cents on the price_cents index
+        if 'min_price' in self.price_range:
+            filters.append(columns.price_cents >= self.price_range['min_price'])
+        if 'max_price' in self.price_range:
+            filters.append(columns.price_cents <= self.price_range['max_price'])
+        if self.currency:
+            filters.append(columns.currency == self.currency.upper())
+        return filters
+
+    def base_conditions(self, columns, materialize=False):
+        # Series rows are expanded into occurrences; stored occurrences are listed inside the window only
+        return self.matching(columns, materialize) + [
+            columns.recurrence_rule.is_(None),
+            db.or_(columns.series_id.is_(None),
+                   columns.occurrence_date.between(self.window_start.isoformat(), self.window_end.isoformat()))
+        ]
+
+    def conditions(self, columns, materialize=False):
+        return self.base_conditions(columns, materialize) + self.selection.conditions(columns)
+
+    def events_query(self):
+        """Select the listed event rows, in listing order, streamed 500 at a time"""
+        return select(Event).where(*self.conditions(Event)).order_by(*self.order_by(Event)).execution_options(
+            yield_per=500)
+
+    def series_query(self, selected=True):
+        """Select the recurring series to expand; with selected=False the facet selection is not applied"""
+        conditions = self.selection.conditions(Event) if selected else []
+        return select(Event).where(*self.matching(Event), *conditions, Event.recurrence_rule.isnot(None))
+
+    def sort_occurrences(self, occurrences):
+        return sorted(occurrences, key=self.merge_key, reverse=self.descending)
+
+    def serializer(self):
+        """Event -> dict for the response; the first ANALYTICS_IMPRESSION_LIMIT search results count as impressions
+
+        The listing is not paginated, so without the cap one broad search would log a row for every matching event.
+        """
+        if not self.search:
+            return Event.to_dict
+        remaining = current_app.config.get('ANALYTICS_IMPRESSION_LIMIT', 50)
+
+        def serialize(event):
+            nonlocal remaining
+            if remaining > 0:
+                remaining -= 1
+                record_impression(event.id)
+            return event.to_dict()
+        return serialize
@@ -0,0 +1,89 @@
+from datetime import date
+
+from sqlalchemy import func
+
+from src.models.user import db
+from src.models.event import Event, RSVP, HelperRequest, HelperApplication
+from src.models.social import Bookmark, Message
+from src.services.archive import parse_event_date
+
+RSVP_STATUSES = ('going', 'interested', 'not_going')
+
+
+def _counts_by_event(query):
+    return {event_id: count for event_id, count in query}
+
+
+def organized_event_summaries(organizer_id):
+    """Status counts for every event an organizer owns
+
+    Runs a fixed number of grouped queries no matter how many events the
+    organizer has; each aggregate is restricted to the organizer's events
+    through a subquery rather than fetched per event.
+    """
+    events = db.session.query(
+        Event.id, Event.title, Event.date, Event.time, Event.location, Event.category,
+        Event.visibility, Event.attendees_count
+    ).filter(Event.organizer_id == organizer_id).all()
+    if not events:
+        return []
+    # event.date is free-form text, so it is ordered by the date it names; unreadable dates go last
+    events.sort(key=lambda event: (parse_event_date(event.date) is None, parse_event_date(event.date) or date.min,
+                                   event.time or '', event.id))
+
+    owned = db.session.query(Event.id).filter(Event.organizer_id == organizer_id).scalar_subquery()
+
+    rsvp_counts = {}
+    for event_id, status, count in db.session.query(RSVP.event_id, RSVP.status, func.count()).filter(
+        RSVP.event_id.in_(owned)
+    ).group_by(RSVP.event_id, RSVP.status):
+        rsvp_counts.setdefault(event_id, {})[status] = count
+
+    bookmark_counts = _counts_by_event(db.session.query(Bookmark.event_id, func.count()).filter(
+        Bookmark.event_id.in_(owned)
+    ).group_by(Bookmark.event_id))
+
+    invitation_counts = _counts_by_event(db.session.query(Message.event_id, func.count()).filter(
+        Message.event_id.in_(owned),
+        Message.message_type == 'event_invite'
+    ).group_by(Message.event_id))
+
+    # Accepted applications fill a request's slots, but never beyond the number it asked for
+    accepted = db.session.query(
+        HelperApplication.helper_request_id.label('helper_request_id'),
+        func.count().label('accepted')
+    ).filter(
+        HelperApplication.status == 'accepted',
+        HelperApplication.helper_request_id.in_(
+            db.session.query(HelperRequest.id).filter(HelperRequest.event_id.in_(owned)).scalar_subquery())
+    ).group_by(HelperApplication.helper_request_id).subquery()
+    helper_slots = {
+        event_id: (needed or 0, filled or 0)
+        for event_id, needed, filled in db.session.query(
+            HelperRequest.event_id,
+            func.sum(HelperRequest.helpers_needed),
+            func.sum(func.min(func.coalesce(accepted.c.accepted, 0), HelperRequest.helpers_needed))
+        ).outerjoin(accepted, accepted.c.helper_request_id == HelperRequest.id).filter(
+            HelperRequest.event_id.in_(owned)
+        ).group_by(HelperRequest.event_id)
+    }
+
+    summaries = []
+    for event in events:
+        counts = rsvp_counts.get(event.id, {})
+        needed, filled = helper_slots.get(event.id, (0, 0))
+        summaries.append({
+            'event_id': event.id,
+            'title': event.title,
+            'date': event.date,
+            'time': event.time,
+            'location': event.location,
+            'category': event.category,
+            'visibility': event.visibility,
+            'attendees_count': event.attendees_count,
+            'rsvps': {status: counts.get(status, 0) for status in RSVP_STATUSES},
+            'bookmark_count': bookmark_counts.get(event.id, 0),
+            'helper_slots': {'needed': needed, 'filled': filled},
+            'invitation_count': invitation_counts.get(event.id, 0)
+        })
+    return summaries
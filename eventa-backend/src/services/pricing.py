@@ -0,0 +1,110 @@
+import re
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import text
+
+DEFAULT_CURRENCY = 'AUD'
+CURRENCY_SYMBOLS = (
+    ('AU$', 'AUD'), ('A$', 'AUD'), ('US$', 'USD'), ('NZ$', 'NZD'), ('C$', 'CAD'),
+    ('$', DEFAULT_CURRENCY), ('€', 'EUR'), ('£', 'GBP'), ('¥', 'JPY'),
+)
+CURRENCY_CODES = {'AUD', 'USD', 'NZD', 'CAD', 'EUR', 'GBP', 'JPY'}
+FREE_WORDS = {'free', 'free entry', 'no charge'}
+NUMBER = r'\d+(?:[.,]\d+)*'
+MARKER = '|'.join([re.escape(symbol) for symbol, _ in CURRENCY_SYMBOLS] +
+                  [rf'\b{code}\b' for code in sorted(CURRENCY_CODES)])
+NUMBERS = re.compile(NUMBER)
+# An amount with a currency symbol or code right before or after it
+PRICED = re.compile(rf'(?P<before>{MARKER})\s*(?P<amount>{NUMBER})|(?P<number>{NUMBER})\s*(?P<after>{MARKER})')
+# What may sit between the two ends of a range such as '$10-$20' or '10 to 20 EUR'
+RANGE_GAP = re.compile(rf'\s*(?:{MARKER})?\s*(?:-|–|TO)\s*(?:{MARKER})?\s*')
+PLAIN = re.compile(r'\d+(?:\.\d{1,2})?')
+THOUSANDS_COMMA = re.compile(r'\d{1,3}(?:,\d{3})+(?:\.\d{1,2})?')
+DECIMAL_COMMA = re.compile(r'(?:\d{1,3}(?:\.\d{3})+|\d+),\d{1,2}')
+
+
+def _decimal(amount):
+    """Read one number, or return None when its separators could mean more than one thing
+
+    '1,250.50' has a thousands comma; '7,50' and '1.000,50' have a decimal
+    comma; '25.999' is neither a price in cents nor clearly a thousands group.
+    """
+    if PLAIN.fullmatch(amount):
+        return Decimal(amount)
+    if THOUSANDS_COMMA.fullmatch(amount):
+        return Decimal(amount.replace(',', ''))
+    if DECIMAL_COMMA.fullmatch(amount):
+        return Decimal(amount.replace('.', '').replace(',', '.'))
+    return None
+
+
+def _currency(marker):
+    if marker in CURRENCY_CODES:
+        return marker
+    return dict(CURRENCY_SYMBOLS)[marker]
+
+
+def parse_price(value):
+    """Parse a display price ('Free', '$25', 'A$12.50', '10 EUR', '$10-$20') into (cents, currency)
+
+    The amount is the one written next to the currency symbol or code; a range
+    uses its first amount. Without a currency, the string must hold a single
+    amount or a single range. Returns (None, None) when the amount can't be read
+    unambiguously, as with '2 for 30' or '25.999'.
+    """
+    if value is None:
+        return None, None
+    value = value.strip()
+    if value.lower() in FREE_WORDS:
+        return 0, DEFAULT_CURRENCY
+    upper = value.upper()
+    numbers = list(NUMBERS.finditer(upper))
+    priced = PRICED.search(upper)
+    if priced:
+        currency = _currency(priced.group('before') or priced.group('after'))
+        start = priced.start('amount') if priced.group('before') else priced.start('number')
+        index = next(i for i, number in enumerate(numbers) if number.start() == start)
+    elif len(numbers) == 1:
+        currency, index = DEFAULT_CURRENCY, 0
+    elif len(numbers) == 2 and RANGE_GAP.fullmatch(upper, numbers[0].end(), numbers[1].start()):
+        currency, index = DEFAULT_CURRENCY, 0
+    else:
+        return None, None
+    # '10-20 EUR' names its currency after the range's second amount
+    while index > 0 and RANGE_GAP.fullmatch(upper, numbers[index - 1].end(), numbers[index].start()):
+        index -= 1
+    amount = _decimal(numbers[index].group())
+    if amount is None:
+        return None, None
+    return int(amount * 100), currency
+
+
+def parse_amount(value):
+    """Parse a min_price/max_price argument in major units into cents, or raise ValueError"""
+    try:
+        amount = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(value)
+    if not amount.is_finite() or amount < 0:
+        raise ValueError(value)
+    return int(amount * 100)
+
+
+def apply_price(values):
+    """Fill price_cents and currency in an event row dict from its price string"""
+    if 'price' in values:
+        values['price_cents'], values['currency'] = parse_price(values['price'])
+    return values
+
+
+def backfill_event_prices(conn, table='event'):
+    """Set price_cents and currency on existing rows, one UPDATE per distinct price string"""
+    prices = [row[0] for row in conn.execute(text(f'SELECT DISTINCT price FROM {table} WHERE price IS NOT NULL'))]
+    updates = []
+    for price in prices:
+        cents, currency = parse_price(price)
+        if cents is not None:
+            updates.append({'price': price, 'cents': cents, 'currency': currency})
+    if updates:
+        conn.execute(text(f'UPDATE {table} SET price_cents = :cents, currency = :currency WHERE price = :price'), updates)
+    return len(updates)
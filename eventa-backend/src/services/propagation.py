@@ -0,0 +1,93 @@
+"""
+Denormalized copies, kept in step with their source in the background
+
+Some values are copied onto other rows so reads need no join, such as a
+user's display name on the events they organize (Event.organizer_name).
+The request that changes the source only queues a propagate_copies job. The
+job rewrites the copies in batches of PROPAGATION_BATCH_SIZE rows, each in
+its own short transaction, so the request stays fast and other writers wait
+at most one batch.
+
+A row counts as a copy only while it still holds the value being replaced,
+so an organizer name typed in by hand is left alone. The job reads the
+source's current value when it runs. Runs coalesced while queued, or run out
+of order, therefore still finish at the latest value.
+"""
+
+from flask import current_app
+from sqlalchemy import update
+
+from src.models.user import User, db
+from src.models.event import Event
+from src.models.social import UserProfile
+from src.services.archive import get_archive
+from src.services.suggest import get_suggest_index
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def display_name(user_id):
+    """The name shown for a user: their profile's display name, else their username"""
+    name = db.session.query(UserProfile.display_name).filter_by(user_id=user_id).scalar()
+    if name:
+        return name
+    return db.session.query(User.username).filter_by(id=user_id).scalar()
+
+
+def _refresh_suggestions(event_ids):
+    index = get_suggest_index()
+    if index.built:
+        for event in Event.query.filter(Event.id.in_(event_ids)):
+            index.update_event(event)
+
+
+# Source -> (function(source id) returning its current value,
+#            [(model, column holding the source id, column holding the copy, function(ids) run after each batch)])
+DENORMALIZED_COPIES = {
+    'display_name': (display_name, [(Event, 'organizer_id', 'organizer_name', _refresh_suggestions)]),
+}
+
+
+def queue_propagation(source, source_id, old_value):
+    """Queue rewriting the copies of a source value that was just changed from old_value"""
+    from src.jobs.worker import enqueue_job
+
+    # A queued run keeps the oldest old_value, which is what unpropagated copies still hold
+    return enqueue_job('propagate_copies', {'source': source, 'source_id': source_id, 'old_value': old_value},
+                       coalesce_key=f'propagate_copies:{source}:{source_id}')
+
+
+def propagate_copies(source, source_id, old_value, batch_size=None):
+    """Replace copies still holding old_value with the source's current value and return how many changed"""
+    current_value, copies = DENORMALIZED_COPIES[source]
+    new_value = current_value(source_id)
+    if not new_value or new_value == old_value:
+        return 0
+    batch_size = batch_size or current_app.config.get('PROPAGATION_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+
+    updated = 0
+    for model, key, column, after_batch in copies:
+        key_column, copy_column = getattr(model, key), getattr(model, column)
+        # Rewritten rows stop matching, so each pass picks up the next batch
+        while True:
+            ids = [row.id for row in db.session.query(model.id).filter(
+                key_column == source_id, copy_column == old_value
+            ).order_by(model.id).limit(batch_size)]
+            if not ids:
+                break
+            db.session.execute(
+                update(model).where(model.id.in_(ids), copy_column == old_value).values({column: new_value})
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            updated += len(ids)
+            if after_batch:
+                after_batch(ids)
+
+        archived = get_archive().tables.get(model.__tablename__)
+        if archived is not None:
+            with get_archive().engine.begin() as conn:
+                conn.execute(archived.update().where(
+                    archived.c[key] == source_id, archived.c[column] == old_value
+                ).values({column: new_value}))
+    return updated
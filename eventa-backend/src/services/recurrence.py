@@ -0,0 +1,346 @@
+"""
+Recurring event series
+
+A series is one Event row with a recurrence_rule, an RFC 5545 RRULE subset:
+
+    FREQ=DAILY|WEEKLY|MONTHLY  INTERVAL=n  COUNT=n  UNTIL=YYYYMMDD
+    BYDAY=MO,WE (weekly)  BYDAY=2TU,-1FR (monthly)  BYMONTHDAY=1,15,-1 (monthly)
+
+The series' date is the first occurrence (DTSTART). Occurrences are never
+stored: they are generated on demand, jumping straight to the requested
+window unless the rule is bounded by COUNT. An occurrence becomes an Event
+row of its own (series_id + occurrence_date) only when it is overridden or
+someone RSVPs to it; cancelled dates are kept in recurrence_exdates.
+"""
+
+import calendar
+from datetime import date, timedelta
+
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from src.models.user import db
+from src.models.event import Event
+from src.services.archive import parse_event_date
+
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY')
+MAX_COUNT = 1000
+MAX_WINDOW_DAYS = 366
+# Series fields an occurrence copies when it is materialized; overridable per occurrence
+OCCURRENCE_FIELDS = ('title', 'description', 'time', 'location', 'price', 'price_cents', 'currency', 'image_url',
+                     'category', 'organizer_name', 'helpers_needed', 'visibility')
+
+
+def _weekday(code):
+    if code not in WEEKDAYS:
+        raise ValueError(f'Unknown weekday: {code}')
+    return WEEKDAYS.index(code)
+
+
+def _month_days(year, month, monthdays, bydays):
+    """Days of one month matching BYMONTHDAY or ordinal BYDAY, ascending"""
+    last = calendar.monthrange(year, month)[1]
+    days = set()
+    for day in monthdays:
+        day = day if day > 0 else last + day + 1
+        if 1 <= day <= last:
+            days.add(day)
+    for ordinal, weekday in bydays:
+        matching = [day for day in range(1, last + 1) if date(year, month, day).weekday() == weekday]
+        if ordinal == 0:
+            days.update(matching)
+        elif -len(matching) <= ordinal <= len(matching):
+            days.add(matching[ordinal - 1 if ordinal > 0 else ordinal])
+    return [date(year, month, day) for day in sorted(days)]
+
+
+class RecurrenceRule:
+    def __init__(self, freq, interval=1, count=None, until=None, bydays=(), monthdays=()):
+        self.freq = freq
+        self.interval = interval
+        self.count = count
+        self.until = until
+        self.bydays = tuple(bydays)  # (ordinal, weekday); ordinal 0 means every such weekday
+        self.monthdays = tuple(monthdays)
+
+    @classmethod
+    def parse(cls, text):
+        """Parse 'FREQ=WEEKLY;BYDAY=TU;COUNT=10', raising ValueError with a readable message"""
+        parts = {}
+        for part in (text or '').upper().removeprefix('RRULE:').split(';'):
+            if not part.strip():
+                continue
+            key, _, value = part.partition('=')
+            parts[key.strip()] = value.strip()
+
+        freq = parts.pop('FREQ', None)
+        if freq not in FREQUENCIES:
+            raise ValueError(f"FREQ must be one of: {', '.join(FREQUENCIES)}")
+        try:
+            interval = int(parts.pop('INTERVAL', 1))
+            count = int(parts['COUNT']) if 'COUNT' in parts else None
+            monthdays = [int(day) for day in parts['BYMONTHDAY'].split(',')] if 'BYMONTHDAY' in parts else []
+        except ValueError:
+            raise ValueError('INTERVAL, COUNT and BYMONTHDAY must be integers')
+        parts.pop('COUNT', None)
+        parts.pop('BYMONTHDAY', None)
+        if interval < 1:
+            raise ValueError('INTERVAL must be at least 1')
+        if count is not None and not 1 <= count <= MAX_COUNT:
+            raise ValueError(f'COUNT must be between 1 and {MAX_COUNT}')
+        if any(day == 0 or not -31 <= day <= 31 for day in monthdays):
+            raise ValueError('BYMONTHDAY values must be between 1 and 31 or -31 and -1')
+
+        until = None
+        if 'UNTIL' in parts:
+            value = parts.pop('UNTIL')[:8]
+            try:
+                until = date(int(value[:4]), int(value[4:6]), int(value[6:8]))
+            except ValueError:
+                raise ValueError('UNTIL must be a date like 20251231')
+        if count is not None and until is not None:
+            raise ValueError('COUNT and UNTIL cannot both be set')
+
+        bydays = []
+        for code in filter(None, parts.pop('BYDAY', '').split(',')):
+            ordinal = code[:-2]
+            try:
+                bydays.append((int(ordinal) if ordinal not in ('', '+') else 0, _weekday(code[-2:])))
+            except ValueError:
+                raise ValueError(f'Invalid BYDAY value: {code}')
+        if freq != 'MONTHLY' and (monthdays or any(ordinal for ordinal, _ in bydays)):
+            raise ValueError('BYMONTHDAY and ordinal BYDAY are only supported with FREQ=MONTHLY')
+        if freq == 'DAILY' and bydays:
+            raise ValueError('BYDAY is not supported with FREQ=DAILY')
+        if parts:
+            raise ValueError(f"Unsupported rule parts: {', '.join(sorted(parts))}")
+        return cls(freq, interval, count, until, bydays, monthdays)
+
+    def _periods(self, start, first_period):
+        """(first day of the period, candidate dates in it) for every period from first_period on"""
+        period = first_period
+        if self.freq == 'DAILY':
+            while True:
+                day = start + timedelta(days=period * self.interval)
+                yield day, [day]
+                period += 1
+        elif self.freq == 'WEEKLY':
+            weekdays = sorted({weekday for _, weekday in self.bydays} or {start.weekday()})
+            week = start - timedelta(days=start.weekday())
+            while True:
+                monday = week + timedelta(weeks=period * self.interval)
+                yield monday, [monday + timedelta(days=weekday) for weekday in weekdays]
+                period += 1
+        else:
+            monthdays, bydays = self.monthdays, self.bydays
+            if not monthdays and not bydays:
+                monthdays = (start.day,)
+            base = start.year * 12 + start.month - 1
+            while True:
+                year, month = divmod(base + period * self.interval, 12)
+                yield date(year, month + 1, 1), _month_days(year, month + 1, monthdays, bydays)
+                period += 1
+
+    def _first_period(self, start, window_start):
+        """The period containing window_start, so unbounded rules skip everything before the window"""
+        if self.count is not None or window_start <= start:
+            return 0
+        if self.freq == 'DAILY':
+            return (window_start - start).days // self.interval
+        if self.freq == 'WEEKLY':
+            week = start - timedelta(days=start.weekday())
+            return (window_start - week).days // (7 * self.interval)
+        months = (window_start.year * 12 + window_start.month) - (start.year * 12 + start.month)
+        return months // self.interval
+
+    def occurrences(self, start, window_start, window_end, exdates=()):
+        """Occurrence dates between window_start and window_end inclusive, ascending"""
+        end = min(window_end, self.until) if self.until else window_end
+        seen = 0
+        try:
+            for period_start, dates in self._periods(start, self._first_period(start, window_start)):
+                if period_start > end:
+                    return
+                for day in dates:
+                    if day < start:
+                        continue
+                    seen += 1
+                    if (self.count is not None and seen > self.count) or day > end:
+                        return
+                    if day >= window_start and day not in exdates:
+                        yield day
+        except (OverflowError, ValueError):
+            # Ran past the last representable date
+            return
+
+    def last_occurrence(self, start):
+        """The final occurrence date, or None for a series without COUNT or UNTIL"""
+        if self.count is None and self.until is None:
+            return None
+        last = None
+        for day in self.occurrences(start, start, self.until or date.max):
+            last = day
+        return last
+
+
+def parse_day(value):
+    """Parse a YYYY-MM-DD argument, or raise ValueError"""
+    return date.fromisoformat(value)
+
+
+def series_start(series):
+    return parse_event_date(series.date)
+
+
+def series_rule(series):
+    return RecurrenceRule.parse(series.recurrence_rule)
+
+
+def series_exdates(series):
+    return {date.fromisoformat(value) for value in (series.recurrence_exdates or '').split(',') if value}
+
+
+def validate_series(rule_text, date_text):
+    """Error message for a rule or start date that can't define a series, or None"""
+    try:
+        RecurrenceRule.parse(rule_text)
+    except ValueError as error:
+        return f'Invalid recurrence_rule: {error}'
+    if parse_event_date(date_text) is None:
+        return 'A recurring event needs a date like 2025-06-03'
+    return None
+
+
+def occurrence_dates(series, window_start, window_end):
+    start = series_start(series)
+    if start is None:
+        return []
+    return list(series_rule(series).occurrences(start, window_start, window_end, series_exdates(series)))
+
+
+def is_occurrence(series, day):
+    return day in occurrence_dates(series, day, day)
+
+
+def occurrence_event(series, day):
+    """A transient Event for an occurrence nobody has overridden or RSVP'd to; it keeps the series id"""
+    occurrence = Event(**{field: getattr(series, field) for field in OCCURRENCE_FIELDS})
+    occurrence.id = series.id
+    occurrence.date = day.isoformat()
+    occurrence.organizer_id = series.organizer_id
+    occurrence.attendees_count = 0
+    occurrence.series_id = series.id
+    occurrence.occurrence_date = day.isoformat()
+    occurrence.created_at = series.created_at
+    occurrence.updated_at = series.updated_at
+    return occurrence
+
+
+def stored_occurrences_query(series_list, window_start, window_end):
+    """Select (series_id, occurrence_date) of the series' occurrences already stored as rows in the window"""
+    return select(Event.series_id, Event.occurrence_date).where(
+        Event.series_id.in_([series.id for series in series_list]),
+        Event.occurrence_date.between(window_start.isoformat(), window_end.isoformat())
+    )
+
+
+def generated_occurrences(series_list, stored, window_start, window_end):
+    """Occurrences of every series within the window except the (series_id, occurrence_date) pairs in stored"""
+    occurrences = []
+    for series in series_list:
+        for day in occurrence_dates(series, window_start, window_end):
+            if (series.id, day.isoformat()) not in stored:
+                occurrences.append(occurrence_event(series, day))
+    return occurrences
+
+
+def expand_series(series_list, window_start, window_end):
+    """Occurrences of every series within the window, with stored occurrences left to the caller's query
+
+    One query finds the occurrences already stored as rows so they are not
+    generated a second time; cost is per series plus per occurrence in the
+    window, never per occurrence over the series' whole life.
+    """
+    if not series_list:
+        return []
+    stored = set(db.session.execute(stored_occurrences_query(series_list, window_start, window_end)).tuples())
+    return generated_occurrences(series_list, stored, window_start, window_end)
+
+
+def stored_occurrence(series, day):
+    return Event.query.filter_by(series_id=series.id, occurrence_date=day.isoformat()).first()
+
+
+def materialize_occurrence(series, day):
+    """The occurrence's own Event row, created from the series on first use"""
+    occurrence = stored_occurrence(series, day)
+    if occurrence is not None:
+        return occurrence
+    occurrence = occurrence_event(series, day)
+    occurrence.id = None
+    db.session.add(occurrence)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another request stored it first
+        db.session.rollback()
+        occurrence = stored_occurrence(series, day)
+    return occurrence
+
+
+def override_occurrence(series, day, data):
+    """Apply per-occurrence changes, remembering which fields no longer follow the series"""
+    occurrence = materialize_occurrence(series, day)
+    overrides = set(filter(None, (occurrence.occurrence_overrides or '').split(',')))
+    for field in OCCURRENCE_FIELDS:
+        if field in data:
+            setattr(occurrence, field, data[field])
+            overrides.add(field)
+    occurrence.occurrence_overrides = ','.join(sorted(overrides)) or None
+    db.session.commit()
+    return occurrence
+
+
+def cancel_occurrence(series, day):
+    """Exclude a date from the series and drop its stored row, RSVPs included"""
+    exdates = series_exdates(series) | {day}
+    series.recurrence_exdates = ','.join(sorted(value.isoformat() for value in exdates))
+    occurrence = stored_occurrence(series, day)
+    if occurrence is not None:
+        db.session.delete(occurrence)
+    db.session.commit()
+
+
+def propagate_series_update(series, fields):
+    """Copy changed series fields to stored occurrences that have not overridden them"""
+    fields = [field for field in fields if field in OCCURRENCE_FIELDS]
+    if not fields:
+        return
+    for occurrence in Event.query.filter_by(series_id=series.id):
+        overrides = set((occurrence.occurrence_overrides or '').split(','))
+        for field in fields:
+            if field not in overrides:
+                setattr(occurrence, field, getattr(series, field))
+
+
+def delete_series_occurrences(series):
+    for occurrence in Event.query.filter_by(series_id=series.id):
+        db.session.delete(occurrence)
+
+
+def requested_window(args):
+    """The from/to date window occurrences are expanded in; defaults to the next RECURRENCE_WINDOW_DAYS days"""
+    today = date.today()
+    try:
+        window_start = parse_day(args['from']) if args.get('from') else today
+        window_end = (parse_day(args['to']) if args.get('to')
+                      else window_start + timedelta(days=current_app.config.get('RECURRENCE_WINDOW_DAYS', 60)))
+    except ValueError:
+        raise ValueError('from and to must be dates like 2025-06-03')
+    if window_end < window_start:
+        raise ValueError('to must not be before from')
+    if (window_end - window_start).days > MAX_WINDOW_DAYS:
+        raise ValueError(f'The from/to window can span at most {MAX_WINDOW_DAYS} days')
+    return window_start, window_end
@@ -0,0 +1,173 @@
+"""
+In-memory prefix index for search-box suggestions
+
+Every public event contributes its title, location, category and organizer
+name. Each distinct value is stored once per word in a sorted list of
+(lowercased text from that word on, type, value), so a prefix lookup is a
+bisect followed by a scan over the matching range. Values are ranked by the
+number of events they appear on.
+
+The index is built from the database on the first lookup and kept current
+by the event write routes. It lives in process memory: writes made by other
+processes (bulk imports, job workers, other app instances) show up after
+rebuild() or a restart.
+"""
+
+import bisect
+import heapq
+import threading
+
+from flask import current_app
+
+from src.models.event import Event
+from src.models.user import db
+
+SUGGEST_FIELDS = (
+    ('title', 'title'),
+    ('location', 'location'),
+    ('category', 'category'),
+    ('organizer', 'organizer_name'),
+)
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 25
+CACHE_SIZE = 4096
+
+
+def _normalize(text):
+    return ' '.join(text.lower().split())
+
+
+def _keys(value):
+    """The value's text from each word start, so 'jaz' finds 'Summer Jazz Night'"""
+    text = _normalize(value)
+    keys = [text]
+    position = text.find(' ')
+    while position != -1:
+        keys.append(text[position + 1:])
+        position = text.find(' ', position + 1)
+    return keys
+
+
+def _terms(event):
+    if event.visibility != 'public':
+        return ()
+    terms = []
+    for kind, attribute in SUGGEST_FIELDS:
+        value = getattr(event, attribute)
+        if value and value.strip():
+            terms.append((kind, value.strip()))
+    return tuple(terms)
+
+
+class SuggestIndex:
+    def __init__(self):
+        self._entries = []  # sorted (key, kind, value)
+        self._counts = {}  # (kind, value) -> number of events
+        self._events = {}  # event id -> terms it contributed
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self.built = False
+
+    def _add(self, term):
+        count = self._counts.get(term, 0)
+        self._counts[term] = count + 1
+        if count == 0:
+            kind, value = term
+            for key in _keys(value):
+                bisect.insort(self._entries, (key, kind, value))
+
+    def _remove(self, term):
+        count = self._counts.get(term, 0)
+        if count > 1:
+            self._counts[term] = count - 1
+            return
+        self._counts.pop(term, None)
+        kind, value = term
+        for key in _keys(value):
+            entry = (key, kind, value)
+            position = bisect.bisect_left(self._entries, entry)
+            if position < len(self._entries) and self._entries[position] == entry:
+                del self._entries[position]
+
+    def rebuild(self):
+        """Load every public event's terms from the database"""
+        events = {}
+        counts = {}
+        query = db.session.query(Event.id, *[getattr(Event, attribute) for _, attribute in SUGGEST_FIELDS]).filter(
+            Event.visibility == 'public'
+        ).yield_per(1000)
+        for row in query:
+            terms = tuple(
+                (kind, value.strip()) for (kind, _), value in zip(SUGGEST_FIELDS, row[1:]) if value and value.strip()
+            )
+            events[row.id] = terms
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+        entries = sorted((key, kind, value) for kind, value in counts for key in _keys(value))
+        with self._lock:
+            self._entries, self._counts, self._events = entries, counts, events
+            self._cache = {}
+            self.built = True
+
+    def invalidate(self):
+        """Rebuild from the database on the next lookup, after changes made outside the write routes"""
+        self.built = False
+
+    def update_event(self, event):
+        """Replace what an event contributes after it is created or edited"""
+        if not self.built:
+            return
+        terms = _terms(event)
+        with self._lock:
+            previous = self._events.pop(event.id, ())
+            if previous == terms:
+                self._events[event.id] = terms
+                return
+            for term in previous:
+                self._remove(term)
+            for term in terms:
+                self._add(term)
+            if terms:
+                self._events[event.id] = terms
+            self._cache = {}
+
+    def remove_event(self, event_id):
+        if not self.built:
+            return
+        with self._lock:
+            for term in self._events.pop(event_id, ()):
+                self._remove(term)
+            self._cache = {}
+
+    def suggest(self, prefix, limit=DEFAULT_LIMIT):
+        """The limit most common values with a word starting with prefix"""
+        prefix = _normalize(prefix)
+        if not prefix:
+            return []
+        if not self.built:
+            with self._build_lock:
+                if not self.built:
+                    self.rebuild()
+        cache_key = (prefix, limit)
+        with self._lock:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                return cached
+            start = bisect.bisect_left(self._entries, (prefix,))
+            end = bisect.bisect_left(self._entries, (prefix + '\uffff',), start)
+            matches = {(kind, value) for _, kind, value in self._entries[start:end]}
+            top = heapq.nsmallest(limit, matches, key=lambda term: (-self._counts[term], term[1].lower(), term[0]))
+            results = [{'text': value, 'type': kind, 'count': self._counts[(kind, value)]} for kind, value in top]
+            if len(self._cache) >= CACHE_SIZE:
+                self._cache = {}
+            self._cache[cache_key] = results
+            return results
+
+
+def get_suggest_index():
+    return current_app.extensions['suggest']
+
+
+def init_suggest(app):
+    app.extensions['suggest'] = SuggestIndex()
@@ -0,0 +1,78 @@
+"""
+Who can see what, expressed as SQL predicates
+
+Events:
+- public: everyone
+- private: the organizer, the organizer's accepted friends and invitees
+- invite-only: the organizer and invitees
+
+Profiles (UserProfile.privacy_level):
+- public: everyone
+- friends_only: the user and their accepted friends
+- private: the user only
+
+Predicates are built against a column namespace (the model class, or an
+archive table's .c) and use uncorrelated subqueries on the indexed
+friendship and message columns, so filtering stays inside the listing query.
+An anonymous viewer gets exactly the old visibility == 'public' filter.
+"""
+
+from flask import request
+from sqlalchemy import select
+
+from src.models.user import db
+from src.models.social import Message
+from src.services.invitations import friends_of
+
+
+def viewer_id_from_request():
+    """The user the request is made on behalf of (?viewer_id=), or None for anonymous reads"""
+    return request.args.get('viewer_id', type=int)
+
+
+def invited_event_ids(user_id):
+    """Select the ids of events a user has been invited to"""
+    return select(Message.event_id).where(
+        Message.recipient_id == user_id,
+        Message.message_type == 'event_invite',
+        Message.event_id.isnot(None)
+    )
+
+
+def event_visibility(columns, viewer_id, materialize=False):
+    """Predicate for events viewer_id may see
+
+    With materialize=True the friend and invitation subqueries are resolved
+    first and passed as literal id lists, for tables in another database (the
+    archive) that cannot reach the friendship and message tables.
+    """
+    public = columns.visibility == 'public'
+    if viewer_id is None:
+        return public
+
+    friends = friends_of(viewer_id)
+    invited = invited_event_ids(viewer_id)
+    if materialize:
+        friends = [row[0] for row in db.session.execute(friends)]
+        invited = [row[0] for row in db.session.execute(invited)]
+
+    return db.or_(
+        public,
+        columns.organizer_id == viewer_id,
+        # An invitation to a recurring series covers its stored occurrences
+        db.and_(columns.visibility.in_(('private', 'invite-only')),
+                db.or_(columns.id.in_(invited), columns.series_id.in_(invited))),
+        db.and_(columns.visibility == 'private', columns.organizer_id.in_(friends))
+    )
+
+
+def profile_visibility(columns, viewer_id):
+    """Predicate for profiles viewer_id may read"""
+    public = db.or_(columns.privacy_level == 'public', columns.privacy_level.is_(None))
+    if viewer_id is None:
+        return public
+    return db.or_(
+        public,
+        columns.user_id == viewer_id,
+        db.and_(columns.privacy_level == 'friends_only', columns.user_id.in_(friends_of(viewer_id)))
+    )
@@ -0,0 +1,284 @@
+"""
+Write-behind buffering for small, frequent updates
+
+Only writes whose loss is harmless go through the buffer:
+
+- read receipts are idempotent, and the client marks the message read again
+  the next time it is opened;
+- attendee recounts are derived from the rsvp table, so a lost recount is
+  repaired by the next RSVP to that event (or by recount_attendees(conn));
+- counters are commutative, and are meant for approximate figures such as
+  view counts;
+- appended rows (the engagement log) are measurements where a lost batch
+  only makes the figures slightly low.
+
+Pending writes live only in process memory. A clean shutdown flushes them
+(atexit), but if the process is killed, up to one flush interval or
+max_pending operations are lost. Nothing is ever applied twice, and because
+every operation is idempotent or commutative, buffers in several processes
+can flush in any order.
+
+Each kind of write (read receipts, recounts, increments, and appends to each
+table) is applied in its own transaction. A kind whose transaction fails is
+put back and retried with the next flush; after max_attempts failures in a
+row it is dropped with an error logged, so one write that can never succeed
+doesn't hold up the others or grow the buffer without bound. Flushing never
+raises into the request that triggered it.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from flask import current_app
+from sqlalchemy import bindparam, insert, text, update
+
+from src.middleware.metrics import registry
+from src.models.user import db
+
+logger = logging.getLogger(__name__)
+
+FLUSH_CHUNK_SIZE = 500
+
+buffered_writes = registry.counter(
+    'eventa_write_buffer_operations_total', 'Operations accepted by the write-behind buffer', ('kind',))
+dropped_writes = registry.counter(
+    'eventa_write_buffer_dropped_total', 'Buffered operations dropped after repeatedly failing to flush', ('kind',))
+flush_duration = registry.histogram(
+    'eventa_write_buffer_flush_seconds', 'Time spent applying one batch of buffered writes')
+
+
+def _chunks(values, size=FLUSH_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def recount_attendees(conn, event_ids=None):
+    """Recompute event.attendees_count from going RSVPs, for some events or all of them"""
+    if event_ids is None:
+        chunks = [None]
+    else:
+        chunks = list(_chunks(sorted(event_ids)))
+    for chunk in chunks:
+        where = '' if chunk is None else ' AND event_id IN :ids'
+        params = {} if chunk is None else {'ids': chunk}
+        reset = text('UPDATE event SET attendees_count = 0' + ('' if chunk is None else ' WHERE id IN :ids'))
+        recount = text(
+            "UPDATE event SET attendees_count = going.total "
+            "FROM (SELECT event_id, COUNT(*) AS total FROM rsvp WHERE status = 'going'" + where +
+            " GROUP BY event_id) AS going "
+            "WHERE going.event_id = event.id"
+        )
+        if chunk is not None:
+            reset = reset.bindparams(bindparam('ids', expanding=True))
+            recount = recount.bindparams(bindparam('ids', expanding=True))
+        conn.execute(reset, params)
+        conn.execute(recount, params)
+
+
+class WriteBuffer:
+    """Coalesces idempotent and commutative writes and applies them in batched transactions
+
+    With interval=0 every operation is written through immediately, which is
+    how these writes behaved before buffering.
+    """
+
+    def __init__(self, app, interval=0.5, max_pending=1000, max_attempts=5):
+        self.app = app
+        self.interval = interval
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        # kind -> flushes in a row that failed to apply it
+        self._failures = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        # Called as listener(flushed) with the number of rows written per kind, after each successful flush
+        self.flush_listeners = []
+        self._reset()
+
+    def _reset(self):
+        self._read_messages = set()
+        self._recount_events = set()
+        self._increments = defaultdict(int)
+        self._appends = defaultdict(list)
+        self._pending = 0
+
+    def _added(self, kind):
+        buffered_writes.inc(kind=kind)
+        if self.interval <= 0:
+            self.flush()
+        elif self._pending >= self.max_pending:
+            self._wakeup.set()
+
+    def mark_read(self, message_id):
+        with self._lock:
+            if message_id not in self._read_messages:
+                self._read_messages.add(message_id)
+                self._pending += 1
+        self._added('mark_read')
+
+    def recount_attendees(self, event_id):
+        with self._lock:
+            if event_id not in self._recount_events:
+                self._recount_events.add(event_id)
+                self._pending += 1
+        self._added('recount_attendees')
+
+    def increment(self, model, column, row_id, amount=1):
+        """Add amount to model.column for one row; increments to the same row are summed"""
+        key = (model.__table__, column, row_id)
+        with self._lock:
+            if key not in self._increments:
+                self._pending += 1
+            self._increments[key] += amount
+        self._added('increment')
+
+    def append(self, model, row):
+        """Insert row (a dict of column values) into model's table with the next flush"""
+        with self._lock:
+            self._appends[model.__table__].append(row)
+            self._pending += 1
+        self._added('append')
+
+    def __len__(self):
+        return self._pending
+
+    def _take(self):
+        with self._lock:
+            taken = (self._read_messages, self._recount_events, self._increments, self._appends)
+            self._reset()
+        return taken
+
+    def _restore(self, read_messages, recount_events, increments, appends):
+        """Put a failed batch back so the next flush retries it"""
+        with self._lock:
+            self._read_messages |= read_messages
+            self._recount_events |= recount_events
+            for key, amount in increments.items():
+                self._increments[key] += amount
+            for table, rows in appends.items():
+                self._appends[table][:0] = rows
+            self._pending = (len(self._read_messages) + len(self._recount_events) + len(self._increments)
+                             + sum(len(rows) for rows in self._appends.values()))
+
+    def _batches(self, read_messages, recount_events, increments, appends):
+        """(kind, operation count, apply(conn), what to restore on failure) for each kind with pending writes"""
+        batches = []
+        if read_messages:
+            def mark_read(conn):
+                message = db.metadata.tables['message']
+                for chunk in _chunks(sorted(read_messages)):
+                    conn.execute(update(message).where(message.c.id.in_(chunk)).values(is_read=True))
+            batches.append(('mark_read', len(read_messages), mark_read, (read_messages, set(), {}, {})))
+
+        if increments:
+            def increment(conn):
+                by_column = defaultdict(list)
+                for (table, column, row_id), amount in increments.items():
+                    if amount:
+                        by_column[(table, column)].append({'row_id': row_id, 'amount': amount})
+                for (table, column), rows in by_column.items():
+                    conn.execute(
+                        update(table).where(table.c.id == bindparam('row_id'))
+                        .values({column: table.c[column] + bindparam('amount')}),
+                        rows
+                    )
+            batches.append(('increment', len(increments), increment, (set(), set(), increments, {})))
+
+        if recount_events:
+            batches.append(('recount_attendees', len(recount_events),
+                            lambda conn: recount_attendees(conn, recount_events),
+                            (set(), recount_events, {}, {})))
+
+        for table, rows in appends.items():
+            batches.append((table.name, len(rows), lambda conn, table=table, rows=rows: conn.execute(insert(table), rows),
+                            (set(), set(), {}, {table: rows})))
+        return batches
+
+    def _failed(self, kind, count, pending):
+        """Put a failed kind back for the next flush, or drop it once it has failed max_attempts times"""
+        attempts = self._failures.get(kind, 0) + 1
+        if attempts >= self.max_attempts:
+            self._failures.pop(kind, None)
+            dropped_writes.inc(count, kind=kind)
+            logger.exception('Dropping %d buffered %s writes after %d failed flushes', count, kind, attempts)
+        else:
+            self._failures[kind] = attempts
+            self._restore(*pending)
+            logger.exception('Flushing %d buffered %s writes failed (attempt %d of %d); will retry',
+                             count, kind, attempts, self.max_attempts)
+
+    def flush(self):
+        """Apply everything pending, one transaction per kind; returns the number of operations written"""
+        with self._flush_lock:
+            batches = self._batches(*self._take())
+            if not batches:
+                return 0
+            flushed = {}
+            start = time.perf_counter()
+            for kind, count, apply, pending in batches:
+                try:
+                    with self.app.app_context(), db.engine.begin() as conn:
+                        apply(conn)
+                except Exception:
+                    self._failed(kind, count, pending)
+                    continue
+                self._failures.pop(kind, None)
+                flushed[kind] = count
+            if flushed:
+                flush_duration.observe(time.perf_counter() - start)
+
+        if flushed:
+            for listener in self.flush_listeners:
+                try:
+                    with self.app.app_context():
+                        listener(flushed)
+                except Exception:
+                    logger.exception('Write buffer flush listener %r failed', listener)
+        return sum(flushed.values())
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Write buffer flush failed')
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='eventa-write-buffer', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout=5):
+        """Stop the flusher and write out whatever is still pending"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+
+def get_write_buffer():
+    return current_app.extensions['write_buffer']
+
+
+def init_write_buffer(app):
+    app.config.setdefault('WRITE_BUFFER_INTERVAL', 0.5)
+    app.config.setdefault('WRITE_BUFFER_MAX_PENDING', 1000)
+    app.config.setdefault('WRITE_BUFFER_MAX_ATTEMPTS', 5)
+    buffer = WriteBuffer(app, app.config['WRITE_BUFFER_INTERVAL'], app.config['WRITE_BUFFER_MAX_PENDING'],
+                         app.config['WRITE_BUFFER_MAX_ATTEMPTS'])
+    app.extensions['write_buffer'] = buffer
+    buffer.start()
+    return buffer
@@ -6,11 +6,11 @@ class ApiService {
   async request(endpoint, options = {}) {
     const url = `${API_BASE_URL}${endpoint}`
     const config = {
+      ...options,
       headers: {
         'Content-Type': 'application/json',
         ...options.headers,
       },
-      ...options,
     }
 
     if (config.body && typeof config.body === 'object') {
@@ -33,6 +33,30 @@ class ApiService {
     }
   }
 
+  // Batch API: run several GET requests in one round trip
+  async batch(requests) {
+    const result = await this.request('/batch', {
+      method: 'POST',
+      body: { requests },
+    })
+    return Object.fromEntries(result.responses.map(({ id, status, body }) => [id, { status, body }]))
+  }
+
+  async getDashboard(userId) {
+    const responses = await this.batch([
+      { id: 'events', path: `/events?viewer_id=${userId}` },
+      { id: 'trending', path: `/events/trending?viewer_id=${userId}` },
+      { id: 'categories', path: '/events/categories' },
+      { id: 'bookmarks', path: `/bookmarks/${userId}` },
+      { id: 'friends', path: `/friends/${userId}` },
+      { id: 'friendRequests', path: `/friends/requests/${userId}` },
+      { id: 'profile', path: `/profile/${userId}?viewer_id=${userId}` },
+    ])
+    return Object.fromEntries(
+      Object.entries(responses).map(([id, { status, body }]) => [id, status < 400 ? body : null])
+    )
+  }
+
   // Events API
   async getEvents(filters = {}) {
     const params = new URLSearchParams()
@@ -49,8 +73,9 @@ class ApiService {
     return this.request(endpoint)
   }
 
-  async getEvent(eventId) {
-    return this.request(`/events/${eventId}`)
+  async getEvent(eventId, viewerId = null) {
+    const params = viewerId ? `?viewer_id=${viewerId}` : ''
+    return this.request(`/events/${eventId}${params}`)
   }
 
   async createEvent(eventData) {
@@ -60,23 +85,51 @@ class ApiService {
     })
   }
 
-  async updateEvent(eventId, eventData) {
+  // Pass the version the event was loaded at to fail with 412 instead of overwriting someone else's edit
+  async updateEvent(eventId, eventData, version) {
     return this.request(`/events/${eventId}`, {
       method: 'PUT',
       body: eventData,
+      headers: version != null ? { 'If-Match': `"${version}"` } : {},
     })
   }
 
-  async deleteEvent(eventId) {
+  async deleteEvent(eventId, version) {
     return this.request(`/events/${eventId}`, {
       method: 'DELETE',
+      headers: version != null ? { 'If-Match': `"${version}"` } : {},
     })
   }
 
-  async rsvpEvent(eventId, userId, status) {
+  async rsvpEvent(eventId, userId, status, occurrenceDate = null) {
+    const body = { user_id: userId, status }
+    if (occurrenceDate) {
+      body.occurrence_date = occurrenceDate
+    }
     return this.request(`/events/${eventId}/rsvp`, {
       method: 'POST',
-      body: { user_id: userId, status },
+      body,
+    })
+  }
+
+  async getEventOccurrences(eventId, from = null, to = null) {
+    const params = new URLSearchParams()
+    if (from) params.append('from', from)
+    if (to) params.append('to', to)
+    const query = params.toString()
+    return this.request(`/events/${eventId}/occurrences${query ? `?${query}` : ''}`)
+  }
+
+  async updateEventOccurrence(eventId, occurrenceDate, changes) {
+    return this.request(`/events/${eventId}/occurrences/${occurrenceDate}`, {
+      method: 'PUT',
+      body: changes,
+    })
+  }
+
+  async cancelEventOccurrence(eventId, occurrenceDate) {
+    return this.request(`/events/${eventId}/occurrences/${occurrenceDate}`, {
+      method: 'DELETE',
     })
   }
 
@@ -84,14 +137,44 @@ class ApiService {
     return this.request(`/events/${eventId}/rsvps`)
   }
 
-  async getTrendingEvents() {
-    return this.request('/events/trending')
+  async getTrendingEvents(viewerId = null) {
+    const params = viewerId ? `?viewer_id=${viewerId}` : ''
+    return this.request(`/events/trending${params}`)
+  }
+
+  async getEventDuplicates(eventId) {
+    return this.request(`/events/${eventId}/duplicates`)
+  }
+
+  async getDuplicates(status = 'pending', limit = 50) {
+    return this.request(`/duplicates?status=${status}&limit=${limit}`)
+  }
+
+  async mergeDuplicate(candidateId, keepEventId = null) {
+    return this.request(`/duplicates/${candidateId}/merge`, {
+      method: 'POST',
+      body: keepEventId ? { keep_event_id: keepEventId } : {},
+    })
+  }
+
+  async dismissDuplicate(candidateId) {
+    return this.request(`/duplicates/${candidateId}/dismiss`, {
+      method: 'POST',
+    })
+  }
+
+  async getSuggestions(query, limit = 8) {
+    return this.request(`/suggest?q=${encodeURIComponent(query)}&limit=${limit}`)
   }
 
   async getCategories() {
     return this.request('/events/categories')
   }
 
+  async getOrganizedEventsSummary(userId) {
+    return this.request(`/users/${userId}/organized-events/summary`)
+  }
+
   async getHelperRequests(eventId) {
     return this.request(`/events/${eventId}/helpers`)
   }
@@ -190,14 +273,20 @@ class ApiService {
     return this.request(`/bookmarks/${userId}`)
   }
 
+  // Subscription URL for calendar apps; feed is 'going' or 'bookmarks'
+  getCalendarFeedUrl(userId, feed = 'going') {
+    return `${API_BASE_URL}/calendar/${userId}/${feed}.ics`
+  }
+
   async removeBookmark(bookmarkId) {
     return this.request(`/bookmarks/${bookmarkId}`, {
       method: 'DELETE',
     })
   }
 
-  async getUserProfile(userId) {
-    return this.request(`/profile/${userId}`)
+  async getUserProfile(userId, viewerId = null) {
+    const params = viewerId ? `?viewer_id=${viewerId}` : ''
+    return this.request(`/profile/${userId}${params}`)
   }
 
   async updateUserProfile(userId, profileData) {
@@ -218,6 +307,19 @@ class ApiService {
       },
     })
   }
+
+  async sendBulkInvitations(senderId, eventId, { recipientIds = [], audiences = [], message } = {}) {
+    return this.request('/invitations/bulk', {
+      method: 'POST',
+      body: {
+        sender_id: senderId,
+        event_id: eventId,
+        recipient_ids: recipientIds,
+        audiences,
+        message,
+      },
+    })
+  }
 }
 
 // Create and export a singleton instance